@@ -1,11 +1,13 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import json
 import base64
 import os
 import traceback
 from urllib import request, parse
 from datetime import datetime
-from run_top import DualSerialHandler
+from cells import CellPool, load_cells
+import tracing
+from tracing import span
 from cozepy import COZE_CN_BASE_URL
 from cozepy import Coze, TokenAuth, Message, ChatEventType
 
@@ -24,6 +26,7 @@ PORT = 8000  # 服务端口
 HTML_FILE = "contact2.html"  # 前端文件名
 MAX_RETRIES = 2  # 识别重试次数
 TIMEOUT = 15  # 接口超时时间(秒)
+CELLS_FILE = None  # 工作单元登记文件，None 时使用 cells.py 中的 CELLS_PATH（不存在时为单个默认单元）
 
 
 # ================ 初始化 ================
@@ -33,6 +36,9 @@ HTML_PATH = os.path.join(CURRENT_DIR, HTML_FILE)
 # 初始化Coze客户端
 coze = Coze(auth=TokenAuth(token=COZE_API_TOKEN), base_url=COZE_API_BASE)
 
+# 每个工作单元（机械臂 + 摄像头）一个工作进程，所有请求共用（设备在各进程启动时连接）
+pool = None
+
 # 打印启动信息
 print(f"===== 服务配置 =====")
 print(f"前端文件: {HTML_PATH}")
@@ -73,6 +79,7 @@ def get_current_date_info():
 
 
 # ================ 百度语音识别 ================
+@span("baidu_token")
 @handle_errors
 def get_baidu_token():
     url = "https://aip.baidubce.com/oauth/2.0/token"
@@ -104,6 +111,7 @@ def get_baidu_token():
         raise Exception(f"令牌获取失败: {str(e)}")
 
 
+@span("baidu_stt")
 @handle_errors
 def baidu_stt(audio_bytes):
     """百度语音识别核心逻辑，支持空结果重试"""
@@ -160,6 +168,7 @@ def baidu_stt(audio_bytes):
 
 
 # ================ Coze智能体调用 ================
+@span("query_coze")
 @handle_errors
 def query_coze(text):
     """调用Coze智能体生成回复"""
@@ -256,6 +265,36 @@ class ServerHandler(BaseHTTPRequestHandler):
     # 处理GET请求（返回前端页面）
     def do_GET(self):
         try:
+            # 状态查询：机械臂执行指令期间也立即返回
+            if self.path == "/status":
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.end_headers()
+                self.wfile.write(json.dumps(pool.status(), ensure_ascii=False).encode('utf-8'))
+                return
+
+            # Prometheus 指标：本进程（语音识别、智能体）与各工作单元（检测、逆解、串口、抓取步骤）的耗时直方图
+            if self.path == "/metrics":
+                body = tracing.render([({}, tracing.snapshot())] + pool.metrics())
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.end_headers()
+                self.wfile.write(body.encode('utf-8'))
+                return
+
+            # 最近的 trace（环形缓冲区），用于事后分析；/traces?n=20 只取最近 20 条
+            if self.path.split("?")[0] == "/traces":
+                query = parse.parse_qs(parse.urlparse(self.path).query)
+                n = int(query["n"][0]) if "n" in query else None
+                traces = {"agent": tracing.recent(n), "cells": pool.traces(n)}
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.end_headers()
+                self.wfile.write(json.dumps(traces, ensure_ascii=False).encode('utf-8'))
+                return
+
             # 仅支持根路径和前端文件请求
             if self.path == "/" or self.path == f"/{HTML_FILE}":
                 if not os.path.exists(HTML_PATH):
@@ -281,8 +320,12 @@ class ServerHandler(BaseHTTPRequestHandler):
             log(f"GET请求处理错误: {str(e)}")
             self.send_error(500, f"服务器错误: {str(e)}")
 
-    # 处理语音交互请求
+    # 处理语音交互请求（识别、智能体与转发指令记为一条 trace）
     def do_POST(self):
+        with span("voice_request"):
+            self._handle_voice()
+
+    def _handle_voice(self):
         try:
             if self.path != "/stt":
                 self.send_error(404, "接口未找到")
@@ -344,9 +387,10 @@ class ServerHandler(BaseHTTPRequestHandler):
                 raise Exception(f"Coze智能体回复异常: {coze_reply}")
 
             # ================ 关键部分：保留DualSerialHandler调用 ================
-            # 将识别文本和回复传递给handle_new_command
-            handler = DualSerialHandler()  # 创建实例
-            handler.handle_new_command(cmd='111', keyword=coze_reply)  # 调用方法
+            # 按识别文本和回复中的关键词选择工作单元，由该单元进程内的handle_new_command处理
+            # 指令进入该单元的调度队列后立即返回，不等待机械臂执行完
+            cell = pool.route(recognized_text, coze_reply)
+            queued = pool.command(cell.name, '111', keyword=coze_reply, source="http")
             # =================================================================
 
             # 构造响应
@@ -354,6 +398,8 @@ class ServerHandler(BaseHTTPRequestHandler):
                 "status": "success",
                 "user_text": recognized_text,
                 "reply": coze_reply,
+                "cell": cell.name,
+                "command": queued,
                 "device_info": {
                     "mic_id": MIC_DEVICE_ID,
                     "speaker_id": SPEAKER_DEVICE_ID
@@ -389,8 +435,9 @@ class ServerHandler(BaseHTTPRequestHandler):
 
 # ================ 启动服务 ================
 if __name__ == "__main__":
+    pool = CellPool(load_cells(CELLS_FILE)).start()  # 启动时各单元并行连接并预热，之后所有请求共用
     try:
-        server = HTTPServer(("0.0.0.0", PORT), ServerHandler)
+        server = ThreadingHTTPServer(("0.0.0.0", PORT), ServerHandler)  # 语音请求处理期间也能查询状态
         log(f"服务启动成功")
         server.serve_forever()
     except KeyboardInterrupt:
@@ -399,3 +446,5 @@ if __name__ == "__main__":
     except Exception as e:
         log(f"服务启动失败: {str(e)}")
         log(traceback.format_exc())
+    finally:
+        pool.close()
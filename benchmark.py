@@ -0,0 +1,1299 @@
+"""性能基准测试脚本
+
+用法示例：
+    python benchmark.py detector --video desk.mp4 --n 50
+    python benchmark.py decode --tensors outputs.npz --video desk.mp4
+    python benchmark.py backends --video desk.mp4 --intra-threads 4
+    python benchmark.py preprocess --video desk.mp4 --n 3000
+    python benchmark.py pipeline --objects 5 --video desk.mp4
+    python benchmark.py gate --video desk.mp4 --n 200 --motion-every 20
+    python benchmark.py replay --recording desk.rec --labels labels/ --min-fps 5
+    python benchmark.py kinematics --n 10000
+    python benchmark.py workspace --n 10000
+    python benchmark.py program --n 3
+    python benchmark.py recipes --n 10000
+    python benchmark.py protocol --n 2000 --corrupt 0.01
+    python benchmark.py window --n 200 --exec-ms 20 --drop 0.01
+    python benchmark.py cycle --objects 3 --rate 1
+    python benchmark.py devices --n 5 --rate 20
+    python benchmark.py dispatch --objects 6 --rate 20
+    python benchmark.py cells --cells 1 2 4 --objects 4 --rate 20
+    python benchmark.py tracing --n 100000 --rate 20
+    python benchmark.py cells --cells 1 2 --video desk.mp4 --weights best_1.onnx
+    python benchmark.py session --objects 3 --rate 20 --runs 3
+    python benchmark.py session --recording flights/flight-20250101-120000-1234.rec --time-scale 0.1
+    python benchmark.py schedule --scenes 5 --objects 6
+    python benchmark.py schedule --recording desk.rec --weights best_1.onnx
+    python benchmark.py variants --models best_1.onnx best_1_int8_dyn.onnx --labels frames/
+"""
+import argparse
+import functools
+import glob
+import math
+import multiprocessing
+import os
+import pty
+import random
+import resource
+import select
+import statistics
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+import cells
+import detect_new1
+import devices
+import kinematics
+import recipes
+import recorder
+import replay
+import run_1
+import run_top
+import workspace
+from calib import pixel_to_robot
+from recorder import RecordReader
+from detect_new1 import (ENGINES, Detector, Letterbox, create_engine, load_net, open_capture,
+                         postprocess, postprocess_reference)
+import scara_1
+import tracing
+from scara_1 import MAX_SPEED, STEPS_PER_UNIT, SCARAController
+from sim_arm import VirtualArm, atol, move_time
+
+
+def _summary(name, samples):
+    """打印耗时统计（毫秒）"""
+    samples = sorted(samples)
+    n = len(samples)
+    p95 = samples[min(n - 1, int(n * 0.95))]
+    print(f"{name:<16} n={n:<5} mean={statistics.mean(samples) * 1000:8.2f}ms "
+          f"p50={statistics.median(samples) * 1000:8.2f}ms p95={p95 * 1000:8.2f}ms")
+
+
+def legacy_detect(weights_path, source):
+    """旧版 detect_camera() 的流程：每次调用都重新加载模型、打开并释放摄像头"""
+    net = load_net(weights_path)
+    cap = open_capture(source)
+    ret, frame = cap.read()
+    cap.release()
+    if not ret or frame is None:
+        raise IOError("无法获取摄像头图像")
+    blob = cv2.dnn.blobFromImage(
+        frame, 1 / 255.0, (detect_new1.INPUT_W, detect_new1.INPUT_H), swapRB=True, crop=False)
+    net.setInput(blob)
+    outputs = net.forward(net.getUnconnectedOutLayersNames())
+    return postprocess(outputs, frame.shape[1], frame.shape[0])
+
+
+def bench_detector(args):
+    """对比旧版每次调用开销与常驻 Detector 的单次检测延迟"""
+    legacy = []
+    for _ in range(args.n):
+        t0 = time.perf_counter()
+        legacy_detect(args.weights, args.video)
+        legacy.append(time.perf_counter() - t0)
+
+    persistent = []
+    t0 = time.perf_counter()
+    # 关闭场景门控：静止录像上几乎都是缓存命中，测不到单次推理的耗时
+    with Detector(args.weights, args.video, scene_gate=False) as det:
+        startup = time.perf_counter() - t0
+        for _ in range(args.n):
+            t0 = time.perf_counter()
+            det.detect()
+            persistent.append(time.perf_counter() - t0)
+
+    _summary("legacy", legacy)
+    _summary("persistent", persistent)
+    print(f"Detector 启动耗时: {startup * 1000:.2f}ms")
+
+
+def _record_tensors(path, weights, video, n):
+    """用真实模型跑录像，把原始输出张量保存下来供离线对比"""
+    outputs = []
+    with Detector(weights, video) as det:
+        for _ in range(n):
+            frame = det.read(fresh=True)
+            blob = cv2.dnn.blobFromImage(
+                frame, 1 / 255.0, (det.input_w, det.input_h), swapRB=True, crop=False)
+            outputs.append(np.array(det.engine.forward(blob)[0]))
+        size = frame.shape[1], frame.shape[0]
+        input_size = det.input_w, det.input_h
+    np.savez_compressed(path, outputs=np.stack(outputs), size=np.array(size), input_size=np.array(input_size))
+    print(f"已保存 {n} 帧输出张量到 {path}")
+
+
+def bench_decode(args):
+    """向量化解码与逐行解码的等价性校验和耗时对比"""
+    if not os.path.exists(args.tensors):
+        if not args.video:
+            raise SystemExit(f"{args.tensors} 不存在，请用 --video 先录制输出张量")
+        _record_tensors(args.tensors, args.weights, args.video, args.n)
+    data = np.load(args.tensors)
+    orig_w, orig_h = (int(v) for v in data["size"])
+    input_w, input_h = (int(v) for v in data["input_size"])
+
+    vec, ref = [], []
+    for out in data["outputs"]:
+        t0 = time.perf_counter()
+        a = postprocess([out], orig_w, orig_h, input_w, input_h)
+        vec.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        b = postprocess_reference([out], orig_w, orig_h, input_w, input_h)
+        ref.append(time.perf_counter() - t0)
+        if a != b:
+            raise SystemExit(f"结果不一致:\n向量化: {a}\n逐行:   {b}")
+
+    print(f"{len(vec)} 帧输出结果完全一致")
+    _summary("loop", ref)
+    _summary("vectorized", vec)
+
+
+def _sample_frames(video, n):
+    """从录像中取 n 帧；不给录像时用随机图像"""
+    frames = []
+    if video:
+        cap = open_capture(video)
+        while len(frames) < n:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    rng = np.random.default_rng(0)
+    while len(frames) < n:
+        frames.append(rng.integers(0, 255, (detect_new1.FRAME_H, detect_new1.FRAME_W, 3), np.uint8))
+    return frames
+
+
+def bench_backends(args):
+    """各推理后端的CPU延迟与吞吐量"""
+    frames = _sample_frames(args.video, args.n)
+    backends = args.backends or list(ENGINES)
+    for backend in backends:
+        kwargs = {}
+        if backend == "onnxruntime":
+            kwargs = dict(intra_threads=args.intra_threads, inter_threads=args.inter_threads,
+                          graph_opt=args.graph_opt)
+        try:
+            engine = create_engine(backend, args.weights, **kwargs)
+        except RuntimeError as e:
+            print(f"{backend:<16} 跳过: {e}")
+            continue
+        blobs = [cv2.dnn.blobFromImage(f, 1 / 255.0, engine.input_size, swapRB=True, crop=False)
+                 for f in frames]
+        for blob in blobs[:args.warmup]:
+            engine.forward(blob)
+
+        samples = []
+        start = time.perf_counter()
+        for blob in blobs:
+            t0 = time.perf_counter()
+            engine.forward(blob)
+            samples.append(time.perf_counter() - t0)
+        wall = time.perf_counter() - start
+        _summary(backend, samples)
+        print(f"{'':<16} 吞吐量 {len(samples) / wall:.2f} 帧/秒")
+
+
+def bench_preprocess(args):
+    """预处理耗时与每帧堆内存分配：blobFromImage 拉伸 vs 复用缓冲区的 Letterbox"""
+    frames = _sample_frames(args.video, min(args.n, 64))
+    size = (detect_new1.INPUT_W, detect_new1.INPUT_H)
+    letterbox = Letterbox(*size)
+    candidates = {
+        "blobFromImage": lambda f: cv2.dnn.blobFromImage(f, 1 / 255.0, size, swapRB=True, crop=False),
+        "letterbox": letterbox,
+    }
+    for name, func in candidates.items():
+        func(frames[0])
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        times, allocated = [], 0
+        tracemalloc.start()
+        for i in range(args.n):
+            frame = frames[i % len(frames)]
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            t0 = time.perf_counter()
+            func(frame)
+            times.append(time.perf_counter() - t0)
+            allocated += tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        _summary(name, times)
+        print(f"{'':<16} 平均每帧分配 {allocated / args.n / 1024:.1f}KB，"
+              f"峰值RSS增长 {(rss_after - rss_before) / 1024:.1f}MB")
+
+
+def bench_gate(args):
+    """场景变化门控的缓存命中率与平均检测延迟（每隔若干次检测模拟一次机械臂运动）"""
+    for scene_gate in (False, True):
+        with Detector(args.weights, args.video, scene_gate=scene_gate) as det:
+            times = []
+            for i in range(args.n):
+                if args.motion_every and i % args.motion_every == 0:
+                    det.invalidate_cache()
+                t0 = time.perf_counter()
+                det.detect()
+                times.append(time.perf_counter() - t0)
+            _summary("gated" if scene_gate else "ungated", times)
+            if det.gate:
+                print(f"{'':<16} {det.gate.stats()}")
+
+
+def _scalar_ik(x, y, l1=kinematics.L1, l2=kinematics.L2):
+    """原 SCARAController.inverse_kinematics 的逐点实现（只有肘部向下的解）"""
+    r = math.hypot(x, y)
+    if not (abs(l1 - l2) <= r <= l1 + l2):
+        return None
+    cos_theta2 = max(min((r ** 2 - l1 ** 2 - l2 ** 2) / (2 * l1 * l2), 1), -1)
+    theta2 = math.acos(cos_theta2)
+    theta1 = math.atan2(y, x) - math.atan2(l2 * math.sin(theta2), l1 + l2 * cos_theta2)
+    return math.degrees(theta1), math.degrees(theta2)
+
+
+def bench_kinematics(args):
+    """批量正逆解与逐点逆解的耗时对比"""
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-400, 400, args.n)
+    y = rng.uniform(-400, 400, args.n)
+
+    scalar, batch_ik, batch_fk = [], [], []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        ref = [_scalar_ik(a, b) for a, b in zip(x, y)]
+        scalar.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        result = kinematics.inverse_kinematics(x, y)
+        batch_ik.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        fx, fy = kinematics.forward_kinematics(result.theta1, result.theta2)
+        batch_fk.append(time.perf_counter() - t0)
+
+    mask = result.reachable
+    err = np.hypot(fx - x[:, None], fy - y[:, None])[mask].max()
+    ref_theta2 = np.array([r[1] if r else np.nan for r in ref])
+    print(f"{args.n} 个点：可达 {mask.sum()}，两种构型满足限位 {result.within_limits.sum(axis=0).tolist()}，"
+          f"正解回代最大误差 {err:.2e}mm，"
+          f"与逐点解的 theta2 最大差 {np.nanmax(np.abs(ref_theta2 - result.theta2[:, 0])):.2e}°")
+    _summary("scalar IK", scalar)
+    _summary("batch IK (x2)", batch_ik)
+    _summary("batch FK (x2)", batch_fk)
+
+
+def bench_workspace(args):
+    """工作空间地图：生成/内存映射加载耗时，查表与逐点逆解判断可达的耗时与一致性"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bench_workspace.npy")
+    t0 = time.perf_counter()
+    grid, params, ik = workspace.build(seeds=True)
+    build_time = time.perf_counter() - t0
+    workspace.save(path, grid, params, ik)
+    try:
+        t0 = time.perf_counter()
+        ws = workspace.Workspace.load(path)
+        load_time = time.perf_counter() - t0
+    finally:
+        for p in workspace._paths(path):
+            if os.path.exists(p):
+                os.remove(p)
+    print(f"生成 {build_time * 1000:.1f}ms，内存映射加载 {load_time * 1000:.2f}ms")
+
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-400, 400, args.n)
+    y = rng.uniform(-400, 400, args.n)
+    arm = SimArm()
+
+    def ik_reachable(a, b):
+        try:
+            arm.inverse_kinematics(a, b)
+            return True
+        except ValueError:
+            return False
+
+    t0 = time.perf_counter()
+    ref = np.array([ik_reachable(a, b) for a, b in zip(x, y)])
+    ik_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    got = np.array([ws.reachable(a, b) for a, b in zip(x, y)])
+    lookup_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    snapped = [ws.snap(a, b) for a, b in zip(x, y)]
+    snap_time = time.perf_counter() - t0
+    rescued = sum(s is not None for s in snapped) - got.sum()
+    print(f"{args.n} 个点：逆解可达 {ref.sum()}，查表可达 {got.sum()}（误判可达 {(got & ~ref).sum()}，"
+          f"边界收缩漏判 {(ref & ~got).sum()}），吸附后可抓取 {got.sum() + rescued}")
+    print(f"逐点逆解 {ik_time / args.n * 1e6:.2f}us/点，查表 {lookup_time / args.n * 1e6:.2f}us/点，"
+          f"查表+吸附 {snap_time / args.n * 1e6:.2f}us/点")
+
+
+def load_labeled_frames(label_dir):
+    """读取标注帧目录：图片与同名 .txt（YOLO格式：类别 cx cy w h，坐标归一化）"""
+    samples = []
+    for path in sorted(glob.glob(os.path.join(label_dir, "*.jpg")) + glob.glob(os.path.join(label_dir, "*.png"))):
+        txt = os.path.splitext(path)[0] + ".txt"
+        if not os.path.exists(txt):
+            continue
+        frame = cv2.imread(path)
+        samples.append((frame, read_yolo_labels(txt, frame.shape[1], frame.shape[0])))
+    return samples
+
+
+def read_yolo_labels(txt, w, h):
+    """读取YOLO格式标注，返回 [(类别, x1, y1, x2, y2), ...]（像素坐标）"""
+    labels = []
+    with open(txt) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            cls_id, cx, cy, bw, bh = int(parts[0]), *map(float, parts[1:5])
+            labels.append((detect_new1.CLASS_NAMES[cls_id],
+                           (cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h))
+    return labels
+
+
+def match_detections(result, labels):
+    """按置信度贪心匹配：检测中心落在同类别标注框内即为命中，返回 (tp, fp, fn)"""
+    unmatched = list(labels)
+    tp = 0
+    for name, cx, cy, _ in sorted(result, key=lambda r: -r[3]):
+        hit = next((gt for gt in unmatched
+                    if gt[0] == name and gt[1] <= cx <= gt[3] and gt[2] <= cy <= gt[4]), None)
+        if hit:
+            unmatched.remove(hit)
+            tp += 1
+    return tp, len(result) - tp, len(unmatched)
+
+
+def bench_replay(args):
+    """回放录制文件，统计各阶段延迟、FPS、峰值内存，可选对照标注计算精确率/召回率
+
+    无需摄像头，可在CI中运行；指定 --min-fps / --max-p95-ms 时不达标以非零状态退出。
+    """
+    stages = ["capture", "preprocess", "forward", "decode", "nms", "total"]
+    samples = {stage: [] for stage in stages}
+    tp = fp = fn = 0
+    labelled = 0
+    with RecordReader(args.recording) as reader, \
+            Detector(args.weights, source=None, backend=args.backend, scene_gate=False) as det:
+        n = reader.frame_count()
+        if not n:
+            raise SystemExit(f"{args.recording} 中没有帧")
+        for i in range(min(args.warmup, n)):
+            det.infer(reader.frame(i))
+
+        start = time.perf_counter()
+        for i in range(n):
+            t0 = time.perf_counter()
+            frame = reader.frame(i)
+            capture = time.perf_counter() - t0
+            timings = {}
+            result = det.infer(frame, timings)
+            samples["capture"].append(capture)
+            for stage, value in timings.items():
+                samples[stage].append(value)
+            samples["total"].append(time.perf_counter() - t0)
+
+            txt = os.path.join(args.labels, f"{i:06d}.txt") if args.labels else None
+            if txt and os.path.exists(txt):
+                a, b, c = match_detections(result, read_yolo_labels(txt, frame.shape[1], frame.shape[0]))
+                tp, fp, fn = tp + a, fp + b, fn + c
+                labelled += 1
+        wall = time.perf_counter() - start
+
+    fps = n / wall
+    print(f"{n} 帧，{fps:.2f} FPS，峰值RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f}MB")
+    print(f"{'阶段':<12}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for stage in stages:
+        values = sorted(samples[stage])
+        pct = [values[min(len(values) - 1, int(len(values) * q))] * 1000 for q in (0.5, 0.95, 0.99)]
+        print(f"{stage:<12}{pct[0]:10.2f}{pct[1]:10.2f}{pct[2]:10.2f}")
+    if labelled:
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        print(f"标注帧 {labelled} 帧，精确率 {precision:.3f}，召回率 {recall:.3f}")
+
+    total = sorted(samples["total"])
+    p95 = total[min(len(total) - 1, int(len(total) * 0.95))] * 1000
+    if args.min_fps and fps < args.min_fps:
+        raise SystemExit(f"FPS {fps:.2f} 低于要求 {args.min_fps}")
+    if args.max_p95_ms and p95 > args.max_p95_ms:
+        raise SystemExit(f"p95 延迟 {p95:.2f}ms 超过要求 {args.max_p95_ms}ms")
+
+
+def bench_variants(args):
+    """各模型变体的延迟与精确率/召回率"""
+    samples = load_labeled_frames(args.labels)
+    if not samples:
+        raise SystemExit(f"{args.labels} 中没有带标注的图片")
+    print(f"{'模型':<32}{'输入':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'精确率':>8}{'召回率':>8}")
+    for model in args.models:
+        with Detector(model, source=None, backend=args.backend) as det:
+            for frame, _ in samples[:args.warmup]:
+                det.infer(frame)
+            times = []
+            tp = fp = fn = 0
+            for frame, labels in samples:
+                t0 = time.perf_counter()
+                result = det.infer(frame)
+                times.append(time.perf_counter() - t0)
+                a, b, c = match_detections(result, labels)
+                tp, fp, fn = tp + a, fp + b, fn + c
+            size = f"{det.input_w}x{det.input_h}"
+        times.sort()
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        print(f"{os.path.basename(model):<32}{size:>9}{statistics.median(times) * 1000:10.2f}"
+              f"{times[min(len(times) - 1, int(len(times) * 0.95))] * 1000:10.2f}"
+              f"{precision:8.3f}{recall:8.3f}")
+
+
+# 固件中的步数换算与默认运动参数（见 v0_1.ino）
+MOVE_SETTLE = 0.4  # 每次 data[0]==2 运动后的 delay(100) + delay(300)
+SERIAL_ROUND_TRIP = 0.005  # 一条指令的串口发送、固件解析与 DONE 回复耗时（估计值）
+
+
+class SimDesk:
+    """模拟桌面：物体以像素坐标保存，夹爪在物体处闭合即视为取走"""
+
+    def __init__(self, objects, fail_rate=0.0, seed=0):
+        self.objects = [list(o) for o in objects]
+        self.fail_rate = fail_rate  # 抓取失败（物体留在原处）的概率
+        self._rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.first_empty_time = None
+
+    @staticmethod
+    def random_objects(n, seed=0):
+        rng = random.Random(seed)
+        names = ["pen", "eraser", "sharpener", "paper"]
+        return [[rng.choice(names), rng.randint(300, 1100), rng.randint(100, 650)] for _ in range(n)]
+
+    def detect(self):
+        with self.lock:
+            result = [[name, px, py, 0.9] for name, px, py in self.objects]
+        if not result and self.first_empty_time is None:
+            self.first_empty_time = time.perf_counter()
+        return result
+
+    def grasp(self, x, y):
+        """在机械臂坐标 (x, y) 处抓取，移除最近的物体"""
+        with self.lock:
+            if not self.objects or self._rng.random() < self.fail_rate:
+                return
+            nearest = min(self.objects, key=lambda o: math.hypot(
+                *np.subtract(pixel_to_robot(o[1], o[2]), (x, y))))
+            self.objects.remove(nearest)
+
+
+class SimArm(SCARAController):
+    """不连接串口的模拟机械臂，按固件的梯形速度曲线和舵机延时计算每条指令耗时"""
+
+    def __init__(self, desk=None, time_scale=1.0):
+        self.L1 = 228.0
+        self.L2 = 156.5
+        self._init_state()
+        self.ser = None
+        self.debug_mode = False
+        self.desk = desk
+        self.time_scale = time_scale
+        self.joints = [0, 0, 0, 100]
+        self.gripper = 0
+        self.program = []
+        self.round_trips = 0
+        self.busy = 0.0  # 复位之后各指令的累计模拟耗时（秒）
+        self.last_move_end = None
+        self.home_end = None
+
+    def is_connected(self):
+        return True
+
+    def _move(self, target, gripper, speed, accel, settle_always):
+        """运动到目标关节位置，返回耗时；夹爪在桌面高度闭合时从模拟桌面取走物体"""
+        speed = min(speed, MAX_SPEED) if speed > 0 else MAX_SPEED
+        duration = max(move_time((t - c) * k, speed, accel)
+                       for t, c, k in zip(target, self.joints, STEPS_PER_UNIT))
+        if settle_always or gripper != self.gripper:
+            duration += MOVE_SETTLE
+        if self.desk and gripper == 105 and self.gripper != 105 and target[3] == 0:
+            self.desk.grasp(*self.forward_kinematics(target[0], target[1]))
+        self.joints, self.gripper = list(target), gripper
+        return duration
+
+    def _done(self, cmd_id):
+        self.last_move_end = time.perf_counter()
+        if cmd_id == 1:
+            self.home_end = self.last_move_end
+        if cmd_id in (1, 2, 5):
+            self._notify_motion()
+
+    def send_cmd(self, cmd_id, params=None, timeout=10):
+        params = [int(p) for p in (params or [])] + [0] * 9
+        duration = SERIAL_ROUND_TRIP
+        if cmd_id == 2:
+            duration += self._move(params[1:5], params[5], params[6], params[7], True)
+        elif cmd_id == 1:
+            duration += 5.0
+        elif cmd_id == 3:
+            self.program.append(params[1:8])
+        elif cmd_id == 4:
+            self.program = []
+        if cmd_id != 1:
+            self.busy += duration
+        time.sleep(duration * self.time_scale)
+        self.round_trips += 1
+        self._done(cmd_id)
+        return True
+
+    def send_cmds(self, cmds, timeout=10):
+        return all(self.send_cmd(cmd_id, params, timeout) for cmd_id, params in cmds)
+
+    def _run_program(self, speed, accel, on_progress, timeout):
+        self.round_trips += 1
+        self.busy += SERIAL_ROUND_TRIP
+        time.sleep(SERIAL_ROUND_TRIP * self.time_scale)
+        for i, point in enumerate(self.program):
+            duration = self._move(point[:4], point[4], point[5] or speed, point[6] or accel, False)
+            self.busy += duration
+            time.sleep(duration * self.time_scale)
+            if on_progress:
+                on_progress(i)
+        self._done(5)
+        return True
+
+    def close(self):
+        pass
+
+
+def bench_recipes(args):
+    """每次抓取前准备运动指令的耗时：全部路径点重新逆解 vs 编译好的模板只解物体坐标"""
+    t0 = time.perf_counter()
+    templates = recipes.compile_recipes()
+    print(f"编译 {len(templates)} 个配方 {(time.perf_counter() - t0) * 1000:.2f}ms")
+    arm = SimArm()
+    rng = np.random.default_rng(args.seed)
+    points = [(x, y) for x, y in rng.uniform((100, 100), (300, 300), (args.n, 2))
+              if workspace.get_workspace().reachable(x, y)]
+    names = list(templates)
+    steps = [step for step in templates[names[0]].steps if step[1] is not None]
+
+    def waypoints(name, x, y):
+        # 原来的做法：按笛卡尔路径点逐周期重新逆解全部位姿
+        drop, home = templates[name].drop, recipes.HOME_POSE
+        pose = {recipes.OBJECT: (x, y), recipes.DROP: drop[:2], recipes.HOME: home[:2]}
+        return [(*pose[p], z, 0, g) for _, p, z, g, _, _ in steps]
+
+    results = {}
+    for label, prepare in [("solve-all", lambda i, x, y: arm._solve_waypoints(waypoints(names[i % 4], x, y))),
+                           ("template", lambda i, x, y: templates[names[i % 4]].moves(x, y))]:
+        samples = []
+        for i, (x, y) in enumerate(points):
+            t0 = time.perf_counter()
+            results.setdefault(label, []).append(prepare(i, x, y))
+            samples.append(time.perf_counter() - t0)
+        _summary(label, samples)
+    same = all(a == [m for _, m, _, _ in b if m is not None]
+               for a, b in zip(results["solve-all"], results["template"]))
+    print(f"两种方式生成的关节指令{'完全一致' if same else '不一致'}（{len(points)} 个物体位置）")
+
+
+def bench_program(args):
+    """单次抓取放置周期：逐步发送（优化前后）vs 一次上传程序，各运动段统一参数 vs 分段参数"""
+    profiles = dict(scara_1.MOTION_PROFILES)
+    uniform = {name: (5000, 3000) for name in profiles}  # 原来所有运动都用的默认值
+    variants = [("per-move(raw)", False, False, uniform), ("per-move", False, True, uniform),
+                ("program", True, True, uniform), ("program+profiles", True, True, profiles)]
+    try:
+        for name, use_program, optimize, variant_profiles in variants:
+            scara_1.OPTIMIZE_MOVES = optimize
+            scara_1.MOTION_PROFILES.update(variant_profiles)
+            arm = SimArm(time_scale=args.time_scale)
+            times = []
+            for _ in range(args.n):
+                arm.round_trips = 0
+                arm.saved_round_trips = 0
+                t0 = time.perf_counter()
+                run_1.pick_and_place(arm, 150, 250, "pen", use_program=use_program)
+                times.append((time.perf_counter() - t0) / args.time_scale)
+            _summary(name, times)
+            print(f"{'':<16} 每周期串口往返 {arm.round_trips} 次，省去 {arm.saved_round_trips} 条运动")
+            print(f"{'':<16} 每周期各运动段: "
+                  f"{run_1.format_segment_times({k: v / args.n / args.time_scale for k, v in arm.segment_times.items()})}")
+    finally:
+        scara_1.OPTIMIZE_MOVES = True
+        scara_1.MOTION_PROFILES.update(profiles)
+
+
+class LoopbackFirmware(threading.Thread):
+    """pty 另一端的最小固件：按两种协议解析指令并立即回复（不运动）
+
+    corrupt 为每条指令被篡改一个比特的概率，用于模拟串口干扰；executed 记录实际执行的指令。
+    exec_time 为每条指令的执行时间（期间不读串口，与固件相同），drop 为丢失 DONE 回复的概率。
+    """
+
+    def __init__(self, fd, corrupt=0.0, seed=0, exec_time=0.0, drop=0.0):
+        super().__init__(daemon=True)
+        self.fd = fd
+        self.corrupt = corrupt
+        self.exec_time = exec_time
+        self.drop = drop
+        self.executed = []  # [[指令编号, 9 个参数], ...]
+        self._rng = random.Random(seed)
+        self._running = True
+
+    def _maybe_corrupt(self, buf, start, end):
+        if end > start and self._rng.random() < self.corrupt:
+            buf[self._rng.randrange(start, end)] ^= 1 << self._rng.randrange(8)
+
+    def _handle(self, buf):
+        """处理缓冲区中完整的指令，返回是否还需要更多数据"""
+        if buf[0] == scara_1.FRAME_SYNC[0]:
+            if len(buf) < 6 or len(buf) < 6 + buf[5] + 2:
+                return True
+            end = 6 + buf[5] + 2
+            frame = bytearray(buf[:end])
+            del buf[:end]
+            self._maybe_corrupt(frame, 6, end - 2)
+            seq = frame[4]
+            if scara_1.crc16(bytes(frame[2:-2])) != int.from_bytes(frame[-2:], "little"):
+                os.write(self.fd, scara_1.encode_frame(scara_1.FRAME_NACK, seq, bytes([1])))
+                return False
+            os.write(self.fd, scara_1.encode_frame(scara_1.FRAME_ACK, seq))
+            cmd_id, params = scara_1.decode_cmd(bytes(frame[6:-2]))
+            self._execute([cmd_id] + params, scara_1.encode_frame(scara_1.FRAME_DONE, seq))
+            return False
+        nl = buf.find(b"\n")
+        if nl < 0:
+            return True
+        line = bytearray(buf[:nl])
+        del buf[:nl + 1]
+        self._maybe_corrupt(line, 0, len(line))
+        fields = (line.decode(errors="replace").split(",") + ["0"] * 10)[:10]
+        self._execute([atol(f) for f in fields], b"DONE\r\n")
+        return False
+
+    def _execute(self, cmd, done):
+        self.executed.append(cmd)
+        if self.exec_time:
+            time.sleep(self.exec_time)
+        if self._rng.random() >= self.drop:
+            os.write(self.fd, done)
+
+    def run(self):
+        buf = bytearray()
+        while self._running:
+            if not select.select([self.fd], [], [], 0.05)[0]:
+                continue
+            try:
+                buf += os.read(self.fd, 4096)
+            except OSError:
+                return
+            while buf and not self._handle(buf):
+                pass
+
+    def stop(self):
+        self._running = False
+
+
+def bench_protocol(args):
+    """pty 回环上 ASCII 与二进制协议的单条指令往返延迟、吞吐量与抗干扰能力"""
+    rng = random.Random(args.seed)
+    cmds = [[2, 0, rng.randint(-89, 180), rng.randint(-164, 164), rng.randint(-90, 90),
+             rng.randint(0, 100), rng.choice((0, 105)), 5000, 3000, 0] for _ in range(args.n)]
+    for protocol in (scara_1.PROTO_ASCII, scara_1.PROTO_BINARY):
+        master, slave = pty.openpty()
+        firmware = LoopbackFirmware(master, args.corrupt, args.seed)
+        firmware.start()
+        arm = SCARAController(os.ttyname(slave), protocol=protocol)
+        times = []
+        t_start = time.perf_counter()
+        for cmd in cmds:
+            t0 = time.perf_counter()
+            arm.send_cmd(cmd[0], cmd[1:], timeout=2)
+            times.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - t_start
+        resends = arm.resends
+        firmware.stop()
+        arm.close()
+        firmware.join()
+        os.close(master)
+        os.close(slave)
+
+        if protocol == scara_1.PROTO_ASCII:
+            sent = sum(len(",".join(map(str, c))) + 1 for c in cmds) / len(cmds)
+            received = len(b"DONE\r\n")
+        else:
+            sent = len(scara_1.encode_cmd(0, 0, [0] * 9))
+            received = 2 * len(scara_1.encode_frame(scara_1.FRAME_ACK, 0))
+        wrong = sum(a != b for a, b in zip(firmware.executed, cmds)) + abs(len(firmware.executed) - len(cmds))
+        _summary(protocol, times)
+        # pty 没有波特率限制，线路时间按 115200 波特率（每字节 10 位）另行估算
+        print(f"{'':<16} 吞吐 {len(cmds) / elapsed:.0f} 条/s，每条指令发送 {sent:.1f} 字节、回复 {received} 字节"
+              f"（115200 波特率下约 {(sent + received) * 10 / 115200 * 1000:.2f}ms），"
+              f"重发 {resends} 次，执行了错误参数的指令 {wrong} 条")
+
+
+def bench_window(args):
+    """指令窗口：固件每条指令执行 exec_ms 时，指令之间的空闲间隔；丢失 DONE 时按超时返回而不是卡死"""
+    for window in (1, 2):
+        master, slave = pty.openpty()
+        firmware = LoopbackFirmware(master, seed=args.seed, exec_time=args.exec_ms / 1000, drop=args.drop)
+        firmware.start()
+        arm = SCARAController(os.ttyname(slave), window=window)
+        t0 = time.perf_counter()
+        futures = [arm.submit_cmd(scara_1.CMD_MOVE, [0, 10, 20, 0, 100, 0, 5000, 3000], timeout=args.timeout)
+                   for _ in range(args.n)]
+        failed = 0
+        for future in futures:
+            try:
+                future.result()
+            except (TimeoutError, IOError):
+                failed += 1
+        elapsed = time.perf_counter() - t0
+        arm.close()
+        firmware.stop()
+        firmware.join()
+        os.close(master)
+        os.close(slave)
+        gap = (elapsed - args.n * args.exec_ms / 1000 - failed * args.timeout) / args.n
+        print(f"window={window}  总耗时 {elapsed:.2f}s，每条指令平均空闲间隔 {gap * 1000:.2f}ms，"
+              f"超时 {failed} 条（每条按 {args.timeout}s 超时后继续）")
+
+
+def bench_cycle(args):
+    """虚拟机械臂（伪终端 + 固件时序）上用真实的 SCARAController 跑 run_1.run 自动清理"""
+    desk = SimDesk(SimDesk.random_objects(args.objects, args.seed), args.fail_rate, args.seed)
+    gripper = [0]
+
+    def on_gripper(value, joints):
+        # 夹爪在桌面高度闭合时取走该位置的物体
+        if value == 105 and gripper[0] != 105 and abs(joints[3]) < 1:
+            desk.grasp(*kinematics.forward_kinematics(joints[0], joints[1]))
+        gripper[0] = value
+
+    with VirtualArm(rate=args.rate, on_gripper=on_gripper) as sim:
+        arm = SCARAController(sim.port, protocol=args.protocol)
+        t0, sim_t0 = time.perf_counter(), sim.clock.elapsed
+        inferences = run_1.run(SimpleNamespace(current_command=None), arm=arm, detect=desk.detect)
+        wall, simulated = time.perf_counter() - t0, sim.clock.elapsed - sim_t0
+        arm.close()
+    picked = args.objects - len(desk.objects)
+    print(f"抓取 {picked}/{args.objects} 个，检测 {inferences} 次，固件指令 {sim.commands} 条")
+    print(f"实际用时 {wall:.2f}s（{args.rate}x），固件模拟时间 {simulated:.2f}s，其中运动 {sim.moving_time:.2f}s")
+    print(f"按固件模拟时间 {picked / simulated * 60:.2f} 个/分钟（不含上位机等待与检测耗时）")
+
+
+def bench_devices(args):
+    """每次请求新开机械臂串口（原 LLM_talk_AGENT 的做法）vs 共享设备管理器：请求耗时与断线重连"""
+    link = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bench_arm")
+    warm_up = devices.WARM_UP_DETECTOR
+    devices.WARM_UP_DETECTOR = False
+    manager = None
+    try:
+        sim = VirtualArm(rate=args.rate, link=link)
+        sim.start()
+        per_request = []
+        for _ in range(args.n):
+            t0 = time.perf_counter()
+            arm = SCARAController(link)
+            arm.ping()
+            arm.close()
+            per_request.append(time.perf_counter() - t0)
+        _summary("per-request", per_request)
+
+        t0 = time.perf_counter()
+        manager = devices.DeviceManager(arm_port=link, debug_mode=False, health_interval=args.health).start()
+        print(f"{'':<16} 设备管理器启动（连接 + 预热）{time.perf_counter() - t0:.2f}s")
+        shared = []
+        for _ in range(args.n):
+            t0 = time.perf_counter()
+            with manager.lock:
+                manager.arm().ping()
+            shared.append(time.perf_counter() - t0)
+        _summary("shared", shared)
+
+        # 模拟拔掉串口再插回：虚拟串口关闭后在同一路径上重新创建
+        sim.stop()
+        t0 = time.perf_counter()
+        time.sleep(args.unplug)
+        sim = VirtualArm(rate=args.rate, link=link)
+        sim.start()
+        while manager.reconnects == 0 or manager._arm is None:
+            if time.perf_counter() - t0 > 120:
+                print("重连超时")
+                break
+            time.sleep(0.05)
+        else:
+            print(f"断开 {args.unplug:.1f}s 后重新就绪，共用时 {time.perf_counter() - t0:.2f}s"
+                  f"（健康检查间隔 {args.health}s）")
+    finally:
+        devices.WARM_UP_DETECTOR = warm_up
+        if manager:
+            manager.close()
+        sim.stop()
+
+
+def bench_dispatch(args):
+    """清理进行中从指令串口发送状态查询与复位：状态回复耗时、复位从发送到开始执行的等待（可抢占 vs 只排队）"""
+    warm_up = devices.WARM_UP_DETECTOR
+    devices.WARM_UP_DETECTOR = False
+    try:
+        for preempt in (True, False):
+            desk = SimDesk(SimDesk.random_objects(args.objects, args.seed), 0.0, args.seed)
+            gripper = [0]
+
+            def on_gripper(value, joints):
+                if value == 105 and gripper[0] != 105 and abs(joints[3]) < 1:
+                    desk.grasp(*kinematics.forward_kinematics(joints[0], joints[1]))
+                gripper[0] = value
+
+            master, slave = pty.openpty()
+            tty_path = os.ttyname(slave)
+            with VirtualArm(rate=args.rate, on_gripper=on_gripper) as sim:
+                manager = devices.DeviceManager(sim.port, tty_path, debug_mode=False, health_interval=3600)
+                manager.start()
+                handler = run_top.DualSerialHandler(manager)
+                handler.detect = desk.detect
+                handler.COMMAND_TIMEOUT = math.inf
+                handler.dispatcher.allow_preempt = preempt
+                threading.Thread(target=handler.start, daemon=True).start()
+
+                os.write(master, b"b\n")
+                time.sleep(args.busy)
+                # 清理进行中：状态查询由接收线程直接回复
+                replies, reply = [], b""
+                for _ in range(args.queries):
+                    t0 = time.perf_counter()
+                    os.write(master, b"s\n")
+                    while not reply.endswith(b"\n"):
+                        if select.select([master], [], [], 5)[0]:
+                            reply += os.read(master, 4096)
+                        else:
+                            break
+                    replies.append(time.perf_counter() - t0)
+                    reply = b""
+                    time.sleep(0.05)
+                # 排队两个抓取指令后再复位
+                os.write(master, b"c\nd\n")
+                time.sleep(0.1)
+                t0 = time.perf_counter()
+                os.write(master, b"a\n")
+                while handler.dispatcher.status()["running"] != "a":
+                    if time.perf_counter() - t0 > 300:
+                        break
+                    time.sleep(0.002)
+                wait = time.perf_counter() - t0
+                handler.dispatcher.wait_idle(300)
+                status = handler.dispatcher.status()
+                handler.dispatcher.stop()
+                manager.close()
+            os.close(master)
+            os.close(slave)
+
+            name = "preempt" if preempt else "queue-only"
+            _summary(f"{name} status", replies)
+            print(f"{'':<16} 复位等待 {wait * 1000:.0f}ms（约合固件时间 {wait * args.rate:.1f}s），"
+                  f"完成 {status['completed']} 条，取消 {status['cancelled']} 条，"
+                  f"指令等待时间 {status.get('latency_ms')}")
+    finally:
+        devices.WARM_UP_DETECTOR = warm_up
+
+
+def _sim_cell(cell, objects, rate, seed, remaining, video=None, weights=None):
+    """工作进程中的测试环境：虚拟机械臂 + 模拟桌面，给出 video 时每次检测先对录像真实推理"""
+    index = int(cell.name.rsplit("-", 1)[1])
+    desk = SimDesk(SimDesk.random_objects(objects, seed + index), 0.0, seed + index)
+    gripper = [0]
+
+    def on_gripper(value, joints):
+        if value == 105 and gripper[0] != 105 and abs(joints[3]) < 1:
+            desk.grasp(*kinematics.forward_kinematics(joints[0], joints[1]))
+            remaining[index] = len(desk.objects)
+        gripper[0] = value
+
+    sim = VirtualArm(rate=rate, on_gripper=on_gripper)
+    sim.start()
+    devices.ARM_PORT = sim.port
+    devices.WARM_UP_DETECTOR = False
+    if not video:
+        return desk.detect
+    detector = Detector(weights, video)
+
+    def detect():
+        detector.detect()  # 推理开销在各工作进程中各自承担
+        return desk.detect()
+    return detect
+
+
+def bench_cells(args):
+    """1 个与多个工作单元（独立进程，各带虚拟机械臂）同时自动清理时的总吞吐量"""
+    baseline = None
+    for n in args.cells:
+        ctx = multiprocessing.get_context("spawn")
+        remaining = ctx.Array("i", [args.objects] * n)
+        setup = functools.partial(_sim_cell, objects=args.objects, rate=args.rate, seed=args.seed,
+                                  remaining=remaining, video=args.video, weights=args.weights)
+        # 虚拟串口在工作进程中创建，这里的端口只是占位；没有指令串口，只接收转发的指令
+        pool = cells.CellPool([cells.Cell(f"sim-{i}", None) for i in range(n)], setup).start()
+        try:
+            t0 = time.perf_counter()
+            for cell in pool.cells:
+                pool.command(cell.name, "b", source="bench")
+            while True:
+                status = pool.status()
+                if all(s["completed"] + s["cancelled"] >= 1 and s["running"] is None for s in status.values()):
+                    break
+                if time.perf_counter() - t0 > args.timeout:
+                    print("等待清理完成超时")
+                    break
+                time.sleep(0.1)
+            wall = time.perf_counter() - t0
+        finally:
+            pool.close()
+        picked = n * args.objects - sum(remaining)
+        rate = picked / wall * 60
+        baseline = baseline or rate
+        print(f"cells={n:<3} 抓取 {picked}/{n * args.objects} 个，用时 {wall:.2f}s，"
+              f"{rate:.2f} 个/分钟（{args.rate}x 时钟），为 1 个单元的 {rate / baseline:.2f} 倍")
+
+
+def bench_tracing(args):
+    """span 的开销，以及虚拟机械臂上一次复位 + 单物品抓取 + 自动清理的分段耗时"""
+    def loop(traced):
+        t0 = time.perf_counter()
+        for _ in range(args.n):
+            if traced:
+                with tracing.span("bench"):
+                    pass
+        return (time.perf_counter() - t0) / args.n
+
+    bare = loop(False)
+    enabled = tracing.TRACING
+    try:
+        tracing.TRACING = False
+        disabled = loop(True) - bare
+        tracing.TRACING = True
+        traced = loop(True) - bare
+    finally:
+        tracing.TRACING = enabled
+    print(f"每个 span 的开销：开启 {traced * 1e6:.2f}us，关闭 {disabled * 1e6:.2f}us（{args.n} 次）")
+
+    tracing.reset()
+    warm_up = devices.WARM_UP_DETECTOR
+    devices.WARM_UP_DETECTOR = False
+    desk = SimDesk(SimDesk.random_objects(args.objects, args.seed) + [["pen", 700, 400]], 0.0, args.seed)
+    gripper = [0]
+
+    def on_gripper(value, joints):
+        if value == 105 and gripper[0] != 105 and abs(joints[3]) < 1:
+            desk.grasp(*kinematics.forward_kinematics(joints[0], joints[1]))
+        gripper[0] = value
+
+    def detect():
+        with tracing.span("detect_camera"):
+            return desk.detect()
+    try:
+        with VirtualArm(rate=args.rate, on_gripper=on_gripper) as sim:
+            manager = devices.DeviceManager(sim.port, None, debug_mode=False, health_interval=3600).start()
+            handler = run_top.DualSerialHandler(manager)
+            handler.detect = detect
+            for cmd in ("a", "c", "b"):
+                handler.handle_new_command(cmd, source="bench")
+                handler.dispatcher.wait_idle(600)
+            handler.dispatcher.stop()
+            manager.close()
+    finally:
+        devices.WARM_UP_DETECTOR = warm_up
+
+    print(f"{'span':<34} {'次数':>6} {'平均':>10} {'合计':>10}（虚拟机械臂 {args.rate}x 时钟）")
+    for (name, labels), (_, total, count) in sorted(tracing.snapshot().items()):
+        label = name + (f"{{{','.join(f'{k}={v}' for k, v in labels)}}}" if labels else "")
+        print(f"{label:<34} {count:>6} {total / count * 1000:>8.2f}ms {total:>9.3f}s")
+    traces = tracing.recent()
+    print(f"环形缓冲区中 {len(traces)} 条 trace，最后一条 {traces[-1]['name']} 含 {len(traces[-1]['spans'])} 个 span")
+    if args.dump:
+        print(f"已写入 {tracing.dump(args.dump)}")
+
+
+def bench_session(args):
+    """在虚拟机械臂上录制一次会话（单物品抓取 + 自动清理），再反复回放：回放用时、与记录的偏差、多次回放是否一致"""
+    path = args.recording
+    if path is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_session.rec")
+        warm_up = devices.WARM_UP_DETECTOR
+        devices.WARM_UP_DETECTOR = False
+        desk = SimDesk(SimDesk.random_objects(args.objects, args.seed) + [["pen", 700, 400]], 0.0, args.seed)
+        gripper = [0]
+
+        def on_gripper(value, joints):
+            if value == 105 and gripper[0] != 105 and abs(joints[3]) < 1:
+                desk.grasp(*kinematics.forward_kinematics(joints[0], joints[1]))
+            gripper[0] = value
+        try:
+            # 模拟桌面不经过 Detector，检测结果通过 wrap() 记录（没有画面）
+            flight = recorder.start_flight_recorder(path, frames=False)
+            with VirtualArm(rate=args.rate, on_gripper=on_gripper) as sim:
+                manager = devices.DeviceManager(sim.port, None, debug_mode=False, health_interval=3600).start()
+                handler = run_top.DualSerialHandler(manager)
+                handler.detect = flight.wrap(desk.detect)
+                handler.COMMAND_TIMEOUT = math.inf
+                t0 = time.perf_counter()
+                for cmd in ("c", "b"):
+                    handler.handle_new_command(cmd, source="bench")
+                    handler.dispatcher.wait_idle(600)
+                recorded = time.perf_counter() - t0
+                handler.dispatcher.stop()
+                manager.close()
+        finally:
+            recorder.stop_flight_recorder()
+            devices.WARM_UP_DETECTOR = warm_up
+        print(f"录制 {path}（{os.path.getsize(path)} 字节），会话用时 {recorded:.2f}s（虚拟机械臂 {args.rate}x 时钟）")
+
+    runs = []
+    for _ in range(args.runs):
+        stats = replay.replay(path, args.time_scale)
+        runs.append(stats)
+        print(f"回放用时 {stats['wall']:.2f}s（缩放 {args.time_scale}，原会话 {stats['recorded']:.2f}s），"
+              f"串口指令 {stats['commands']}/{stats['recorded_commands']} 条，偏差 {stats['divergences']} 条，"
+              f"检测 {stats['detections']} 次")
+    _summary("replay", [s["wall"] for s in runs])
+    same = all(s["sent"] == runs[0]["sent"] for s in runs)
+    print(f"{args.runs} 次回放发出的指令序列{'完全一致' if same else '不一致'}")
+
+
+def _recorded_scenes(recording, weights, n):
+    """从录制文件中均匀取 n 帧检测，得到各场景的物体 [[类别, cx, cy], ...]"""
+    detector = Detector(weights, source=None)
+    scenes = []
+    with RecordReader(recording) as reader:
+        count = reader.frame_count()
+        for i in np.linspace(0, count - 1, min(n, count)).astype(int):
+            result = detector.infer(reader.frame(i))
+            if result:
+                scenes.append([[name, cx, cy] for name, cx, cy, _ in result])
+    detector.close()
+    return scenes
+
+
+def bench_schedule(args):
+    """检测结果原顺序 vs 按运动耗时规划顺序（跳过不必要的返回初始位置）的每分钟抓取数"""
+    if args.recording:
+        scenes = _recorded_scenes(args.recording, args.weights, args.scenes)
+    else:
+        scenes = [SimDesk.random_objects(args.objects, args.seed + i) for i in range(args.scenes)]
+    for pipelined in (False, True):
+        for schedule in (False, True):
+            picked = busy = 0
+            for objects in scenes:
+                desk = SimDesk(objects)
+                arm = SimArm(desk, args.time_scale)
+                run_1.run(SimpleNamespace(current_command=None), pipelined=pipelined, arm=arm,
+                          detect=desk.detect, schedule=schedule)
+                picked += len(objects) - len(desk.objects)
+                busy += arm.busy
+            name = ("pipelined" if pipelined else "serial") + ("+schedule" if schedule else "")
+            print(f"{name:<20} {len(scenes)} 个场景抓取 {picked} 个，机械臂耗时 {busy:.1f}s，"
+                  f"{picked / busy * 60:.2f} 个/分钟")
+
+
+def bench_pipeline(args):
+    """串行/跟踪/流水线自动清理的每分钟抓取数与推理次数对比（模拟机械臂 + 录像推理）"""
+    detector = Detector(args.weights, args.video) if args.video else None
+    objects = SimDesk.random_objects(args.objects, args.seed)
+    modes = [("serial", False, False), ("tracking", False, True), ("pipelined", True, True)]
+    results = []
+    for name, pipelined, tracking in modes:
+        desk = SimDesk(objects, args.fail_rate, args.seed)
+
+        def detect():
+            # 用真实推理（或固定耗时）模拟检测开销，结果取自模拟桌面
+            if detector:
+                detector.detect()
+            else:
+                time.sleep(args.infer_ms / 1000)
+            return desk.detect()
+
+        arm = SimArm(desk, args.time_scale)
+        inferences = run_1.run(SimpleNamespace(current_command=None), pipelined=pipelined,
+                               arm=arm, detect=detect, tracking=tracking)
+        t0 = arm.home_end  # 从复位完成开始计时
+        end = max(desk.first_empty_time or 0, arm.last_move_end)
+        picked = len(objects) - len(desk.objects)
+        results.append(f"{name:<10} 抓取 {picked}/{len(objects)} 个，用时 {end - t0:.2f}s，"
+                       f"{picked / (end - t0) * 60:.2f} 个/分钟，检测 {inferences} 次")
+    if detector:
+        detector.close()
+    print("\n".join(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="性能基准测试")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("detector", help="常驻检测器 vs 旧版 detect_camera 单次延迟")
+    p.add_argument("--video", required=True, help="录像文件路径")
+    p.add_argument("--weights", default=detect_new1.WEIGHTS_PATH)
+    p.add_argument("--n", type=int, default=30)
+    p.set_defaults(func=bench_detector)
+
+    p = sub.add_parser("decode", help="向量化解码等价性校验与耗时对比")
+    p.add_argument("--tensors", required=True, help="保存的输出张量 .npz 文件")
+    p.add_argument("--video", help="张量文件不存在时，用该录像生成")
+    p.add_argument("--weights", default=detect_new1.WEIGHTS_PATH)
+    p.add_argument("--n", type=int, default=20)
+    p.set_defaults(func=bench_decode)
+
+    p = sub.add_parser("backends", help="推理后端延迟与吞吐量对比")
+    p.add_argument("--video", help="录像文件路径（不给则使用随机图像）")
+    p.add_argument("--weights", default=detect_new1.WEIGHTS_PATH)
+    p.add_argument("--backends", nargs="*", choices=list(ENGINES))
+    p.add_argument("--n", type=int, default=50)
+    p.add_argument("--warmup", type=int, default=5)
+    p.add_argument("--intra-threads", type=int, default=detect_new1.ORT_INTRA_THREADS)
+    p.add_argument("--inter-threads", type=int, default=detect_new1.ORT_INTER_THREADS)
+    p.add_argument("--graph-opt", default=detect_new1.ORT_GRAPH_OPT,
+                   choices=list(detect_new1.OrtEngine.GRAPH_OPT_LEVELS))
+    p.set_defaults(func=bench_backends)
+
+    p = sub.add_parser("preprocess", help="预处理耗时与内存分配对比")
+    p.add_argument("--video", help="录像文件路径（不给则使用随机图像）")
+    p.add_argument("--n", type=int, default=3000)
+    p.set_defaults(func=bench_preprocess)
+
+    p = sub.add_parser("pipeline", help="串行/跟踪/流水线自动清理的每分钟抓取数与推理次数")
+    p.add_argument("--video", help="录像文件路径（不给则用 --infer-ms 模拟推理耗时）")
+    p.add_argument("--weights", default=detect_new1.WEIGHTS_PATH)
+    p.add_argument("--infer-ms", type=float, default=300)
+    p.add_argument("--objects", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--time-scale", type=float, default=1.0, help="机械臂运动时间缩放（<1 加速）")
+    p.add_argument("--fail-rate", type=float, default=0.0, help="模拟抓取失败的概率")
+    p.set_defaults(func=bench_pipeline)
+
+    p = sub.add_parser("gate", help="场景变化门控的命中率与延迟")
+    p.add_argument("--video", required=True, help="录像文件路径（桌面静止的录像）")
+    p.add_argument("--weights", default=detect_new1.WEIGHTS_PATH)
+    p.add_argument("--n", type=int, default=200)
+    p.add_argument("--motion-every", type=int, default=20, help="每隔多少次检测模拟一次机械臂运动")
+    p.set_defaults(func=bench_gate)
+
+    p = sub.add_parser("replay", help="回放录制文件的分阶段延迟/FPS/内存/精度")
+    p.add_argument("--recording", required=True, help="recorder.py 录制的文件")
+    p.add_argument("--weights", default=detect_new1.WEIGHTS_PATH)
+    p.add_argument("--backend", default=detect_new1.BACKEND, choices=list(ENGINES))
+    p.add_argument("--labels", help="标注目录（第 i 帧对应 {i:06d}.txt，YOLO格式）")
+    p.add_argument("--warmup", type=int, default=3)
+    p.add_argument("--min-fps", type=float, default=0)
+    p.add_argument("--max-p95-ms", type=float, default=0)
+    p.set_defaults(func=bench_replay)
+
+    p = sub.add_parser("kinematics", help="批量正逆解与逐点逆解耗时对比")
+    p.add_argument("--n", type=int, default=10000)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_kinematics)
+
+    p = sub.add_parser("workspace", help="工作空间地图的加载耗时与查表/逆解可达判断对比")
+    p.add_argument("--n", type=int, default=10000)
+    p.set_defaults(func=bench_workspace)
+
+    p = sub.add_parser("recipes", help="全部路径点重新逆解 vs 编译好的配方模板的指令准备耗时")
+    p.add_argument("--n", type=int, default=10000)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_recipes)
+
+    p = sub.add_parser("program", help="逐步运动 vs 程序上传的单次抓取放置周期")
+    p.add_argument("--n", type=int, default=2)
+    p.add_argument("--time-scale", type=float, default=1.0,
+                   help="模拟时间缩放（pick_and_place 内部的 sleep 不缩放，小于 1 时逐步模式结果偏大）")
+    p.set_defaults(func=bench_program)
+
+    p = sub.add_parser("protocol", help="pty 回环上 ASCII / 二进制串口协议的延迟、吞吐与抗干扰")
+    p.add_argument("--n", type=int, default=1000)
+    p.add_argument("--corrupt", type=float, default=0.0, help="每条指令被篡改一个比特的概率")
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_protocol)
+
+    p = sub.add_parser("window", help="指令窗口对指令间空闲间隔的影响与丢包超时")
+    p.add_argument("--n", type=int, default=200)
+    p.add_argument("--exec-ms", type=float, default=20, help="回环固件每条指令的执行时间")
+    p.add_argument("--drop", type=float, default=0.0, help="丢失 DONE 回复的概率")
+    p.add_argument("--timeout", type=float, default=0.5, help="每条指令的超时（秒）")
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_window)
+
+    p = sub.add_parser("cycle", help="虚拟机械臂上运行 run_1.run 的完整清理周期")
+    p.add_argument("--objects", type=int, default=3)
+    p.add_argument("--fail-rate", type=float, default=0.0)
+    p.add_argument("--rate", type=float, default=1.0, help="虚拟机械臂时钟加速倍数")
+    p.add_argument("--protocol", choices=[scara_1.PROTO_ASCII, scara_1.PROTO_BINARY], default=scara_1.PROTOCOL)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_cycle)
+
+    p = sub.add_parser("devices", help="每次请求新开串口 vs 共享设备管理器的请求耗时与断线重连（虚拟机械臂）")
+    p.add_argument("--n", type=int, default=5)
+    p.add_argument("--rate", type=float, default=20.0, help="虚拟机械臂时钟加速倍数")
+    p.add_argument("--health", type=float, default=0.5, help="健康检查间隔（秒）")
+    p.add_argument("--unplug", type=float, default=1.0, help="模拟断开的时长（秒）")
+    p.set_defaults(func=bench_devices)
+
+    p = sub.add_parser("dispatch", help="清理进行中的状态查询与复位抢占延迟（虚拟机械臂 + 伪终端指令串口）")
+    p.add_argument("--objects", type=int, default=6)
+    p.add_argument("--rate", type=float, default=20.0, help="虚拟机械臂时钟加速倍数")
+    p.add_argument("--busy", type=float, default=1.0, help="开始清理后多久发送复位（秒）")
+    p.add_argument("--queries", type=int, default=20, help="清理进行中的状态查询次数")
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_dispatch)
+
+    p = sub.add_parser("cells", help="多个工作单元（每单元一个进程 + 虚拟机械臂）同时清理的总吞吐量")
+    p.add_argument("--cells", type=int, nargs="+", default=[1, 2, 4], help="依次测试的单元数")
+    p.add_argument("--objects", type=int, default=4, help="每个单元桌面上的物体数")
+    p.add_argument("--rate", type=float, default=20.0, help="虚拟机械臂时钟加速倍数")
+    p.add_argument("--video", help="录像文件，给出时每次检测先对录像真实推理")
+    p.add_argument("--weights", default=detect_new1.WEIGHTS_PATH)
+    p.add_argument("--timeout", type=float, default=600)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_cells)
+
+    p = sub.add_parser("tracing", help="span 开销与虚拟机械臂上各阶段的耗时直方图")
+    p.add_argument("--n", type=int, default=100000, help="测量开销的 span 次数")
+    p.add_argument("--objects", type=int, default=3)
+    p.add_argument("--rate", type=float, default=20.0, help="虚拟机械臂时钟加速倍数")
+    p.add_argument("--dump", help="把 trace 写入该 JSON 文件")
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_tracing)
+
+    p = sub.add_parser("session", help="录制虚拟机械臂上的会话并反复回放（飞行记录的确定性回放）")
+    p.add_argument("--recording", help="已有的飞行记录文件，给出时跳过录制直接回放")
+    p.add_argument("--objects", type=int, default=3)
+    p.add_argument("--rate", type=float, default=20.0, help="虚拟机械臂时钟加速倍数")
+    p.add_argument("--time-scale", type=float, default=1.0, help="回放等待时间缩放")
+    p.add_argument("--runs", type=int, default=3)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_session)
+
+    p = sub.add_parser("schedule", help="原顺序与规划顺序的每分钟抓取数对比（模拟机械臂）")
+    p.add_argument("--scenes", type=int, default=5)
+    p.add_argument("--objects", type=int, default=6, help="随机场景的物体数")
+    p.add_argument("--recording", help="录制文件，场景取自对其中帧的检测结果")
+    p.add_argument("--weights", default=detect_new1.WEIGHTS_PATH)
+    p.add_argument("--time-scale", type=float, default=0.002)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_schedule)
+
+    p = sub.add_parser("variants", help="模型变体的延迟与精确率/召回率对比")
+    p.add_argument("--models", nargs="+", required=True, help="待对比的 .onnx 模型")
+    p.add_argument("--labels", required=True, help="标注帧目录（图片 + YOLO格式 .txt）")
+    p.add_argument("--backend", default="onnxruntime", choices=list(ENGINES))
+    p.add_argument("--warmup", type=int, default=3)
+    p.set_defaults(func=bench_variants)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
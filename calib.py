@@ -0,0 +1,248 @@
+"""像素坐标到机械臂坐标的标定与转换
+
+标定结果 = 相机内参/畸变（可选）+ 桌面平面的单应矩阵，并预先计算成整幅图像的查找表，
+检测结果的坐标转换只需一次向量化查表。没有标定文件时使用原来的线性公式
+（x = 0.357 * u - 104, y = 374 - 0.357 * v）。
+
+用法示例：
+    # 用机械臂末端点选的一组点标定（CSV 每行: u,v,x,y）
+    python calib.py points touched.csv --out calib.npz
+    # 先用多张棋盘格图片标定畸变，再用平放在桌面上的棋盘格标定单应矩阵
+    python calib.py checkerboard board_*.jpg --pattern 9x6 --square 20 --origin 50,150 --out calib.npz
+    # 输出重投影误差报告
+    python calib.py report calib.npz touched.csv
+"""
+import argparse
+import csv
+import glob
+import os
+import threading
+
+import cv2
+import numpy as np
+
+import detect_new1
+
+CALIB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calib.npz")  # 标定文件路径
+
+# 原来硬编码的线性转换
+DEFAULT_HOMOGRAPHY = np.array([
+    [0.357, 0.0, -104.0],
+    [0.0, -0.357, 374.0],
+    [0.0, 0.0, 1.0],
+])
+
+
+def _undistort(pixels, camera_matrix, dist_coeffs):
+    """去畸变，结果仍为像素坐标"""
+    pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 1, 2)
+    if camera_matrix is None:
+        return pixels.reshape(-1, 2)
+    return cv2.undistortPoints(pixels, camera_matrix, dist_coeffs, P=camera_matrix).reshape(-1, 2)
+
+
+def _apply_homography(H, points):
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+    return cv2.perspectiveTransform(points, H).reshape(-1, 2)
+
+
+class PixelMapper:
+    """像素 -> 机械臂坐标转换，内部为整幅图像预计算的查找表"""
+
+    def __init__(self, homography=DEFAULT_HOMOGRAPHY, camera_matrix=None, dist_coeffs=None,
+                 size=(detect_new1.FRAME_W, detect_new1.FRAME_H)):
+        self.homography = np.asarray(homography, dtype=np.float64)
+        self.camera_matrix = camera_matrix
+        self.dist_coeffs = dist_coeffs
+        self.size = tuple(int(v) for v in size)
+        self.grid = self._build_grid()
+
+    def _build_grid(self):
+        """预计算每个像素对应的机械臂坐标，形状 (h, w, 2)"""
+        w, h = self.size
+        u, v = np.meshgrid(np.arange(w), np.arange(h))
+        pixels = np.stack([u.ravel(), v.ravel()], axis=1)
+        robot = _apply_homography(self.homography, _undistort(pixels, self.camera_matrix, self.dist_coeffs))
+        return robot.reshape(h, w, 2).astype(np.float32)
+
+    def to_robot(self, u, v):
+        """批量转换（u, v 可为数组），返回 (x, y) float 数组"""
+        u = np.clip(np.rint(u).astype(np.int64), 0, self.size[0] - 1)
+        v = np.clip(np.rint(v).astype(np.int64), 0, self.size[1] - 1)
+        xy = self.grid[v, u]
+        return xy[..., 0], xy[..., 1]
+
+    def __call__(self, u, v):
+        """单点转换，返回整数 (x, y)，与原来的调用方式一致"""
+        x, y = self.to_robot(u, v)
+        return int(x), int(y)
+
+    def to_pixel(self, x, y):
+        """机械臂坐标 -> 像素坐标（不含畸变，用于模拟与可视化）"""
+        uv = _apply_homography(np.linalg.inv(self.homography), np.stack([np.ravel(x), np.ravel(y)], axis=1))
+        return uv[:, 0], uv[:, 1]
+
+    def save(self, path):
+        np.savez(path, homography=self.homography, size=np.array(self.size),
+                 camera_matrix=self.camera_matrix if self.camera_matrix is not None else np.zeros(0),
+                 dist_coeffs=self.dist_coeffs if self.dist_coeffs is not None else np.zeros(0))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        camera_matrix = data["camera_matrix"] if data["camera_matrix"].size else None
+        dist_coeffs = data["dist_coeffs"] if data["dist_coeffs"].size else None
+        return cls(data["homography"], camera_matrix, dist_coeffs, data["size"])
+
+
+def fit_points(pixels, robot, camera_matrix=None, dist_coeffs=None, size=None):
+    """用若干组对应点（像素, 机械臂坐标）拟合单应矩阵，至少 4 组"""
+    pixels = np.asarray(pixels, dtype=np.float64)
+    robot = np.asarray(robot, dtype=np.float64)
+    if len(pixels) < 4:
+        raise ValueError("至少需要 4 组对应点")
+    H, _ = cv2.findHomography(_undistort(pixels, camera_matrix, dist_coeffs), robot, 0)
+    if H is None:
+        raise ValueError("单应矩阵拟合失败，请检查对应点是否共线")
+    return PixelMapper(H, camera_matrix, dist_coeffs, size or (detect_new1.FRAME_W, detect_new1.FRAME_H))
+
+
+def calibrate_intrinsics(images, pattern, square):
+    """多张棋盘格图片标定相机内参与畸变，返回 (K, dist, rms)"""
+    cols, rows = pattern
+    board = np.zeros((rows * cols, 3), np.float32)
+    board[:, :2] = np.mgrid[0:cols, 0:rows].T.reshape(-1, 2) * square
+    obj_points, img_points, size = [], [], None
+    for image in images:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        size = gray.shape[::-1]
+        found, corners = _find_corners(gray, pattern)
+        if found:
+            obj_points.append(board)
+            img_points.append(corners)
+    if len(obj_points) < 3:
+        raise ValueError(f"只在 {len(obj_points)} 张图片中找到棋盘格，至少需要 3 张")
+    rms, K, dist, _, _ = cv2.calibrateCamera(obj_points, img_points, size, None, None)
+    return K, dist, rms
+
+
+def _find_corners(gray, pattern):
+    found, corners = cv2.findChessboardCorners(gray, pattern)
+    if found:
+        corners = cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1),
+                                   (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01))
+    return found, corners
+
+
+def board_correspondences(image, pattern, square, origin, angle=0.0):
+    """平放在桌面上的棋盘格：第一个内角点位于机械臂坐标 origin，x 轴方向与机械臂 x 轴夹角 angle（度）"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    found, corners = _find_corners(gray, pattern)
+    if not found:
+        raise ValueError("桌面图片中未找到棋盘格")
+    cols, rows = pattern
+    local = np.mgrid[0:cols, 0:rows].T.reshape(-1, 2).astype(np.float64) * square
+    c, s = np.cos(np.radians(angle)), np.sin(np.radians(angle))
+    robot = local @ np.array([[c, s], [-s, c]]) + np.asarray(origin, dtype=np.float64)
+    return corners.reshape(-1, 2), robot
+
+
+def reprojection_report(mapper, pixels, robot):
+    """打印各点的重投影误差（毫米），返回 (平均误差, 最大误差)"""
+    x, y = mapper.to_robot(np.asarray(pixels)[:, 0], np.asarray(pixels)[:, 1])
+    errors = np.hypot(x - np.asarray(robot)[:, 0], y - np.asarray(robot)[:, 1])
+    print(f"{'像素(u,v)':>16}{'实际(x,y)':>20}{'换算(x,y)':>20}{'误差(mm)':>10}")
+    for (u, v), (rx, ry), px, py, err in zip(pixels, robot, x, y, errors):
+        print(f"{f'({u:.0f},{v:.0f})':>16}{f'({rx:.1f},{ry:.1f})':>20}{f'({px:.1f},{py:.1f})':>20}{err:10.2f}")
+    print(f"平均误差 {errors.mean():.2f}mm，最大误差 {errors.max():.2f}mm")
+    return errors.mean(), errors.max()
+
+
+def load_points_csv(path):
+    """读取对应点 CSV：每行 u,v,x,y（允许表头）"""
+    pixels, robot = [], []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            try:
+                u, v, x, y = map(float, row[:4])
+            except ValueError:
+                continue
+            pixels.append((u, v))
+            robot.append((x, y))
+    return np.array(pixels), np.array(robot)
+
+
+_mapper = None
+_mapper_lock = threading.Lock()
+
+
+def get_mapper():
+    """进程内共享的坐标转换器：有标定文件则加载，否则使用默认线性转换"""
+    global _mapper
+    with _mapper_lock:
+        if _mapper is None:
+            if os.path.exists(CALIB_PATH):
+                _mapper = PixelMapper.load(CALIB_PATH)
+                print(f"已加载标定文件: {CALIB_PATH}")
+            else:
+                _mapper = PixelMapper()
+        return _mapper
+
+
+def pixel_to_robot(u, v):
+    """检测结果的像素中心 -> 机械臂坐标 (x, y)（整数）"""
+    return get_mapper()(u, v)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="相机-机械臂标定")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("points", help="用点选的对应点标定")
+    p.add_argument("csv", help="对应点 CSV（u,v,x,y）")
+    p.add_argument("--intrinsics", help="已有的标定文件，复用其中的内参与畸变")
+    p.add_argument("--out", default=CALIB_PATH)
+
+    p = sub.add_parser("checkerboard", help="用棋盘格标定")
+    p.add_argument("images", nargs="+", help="棋盘格图片，最后一张为平放在桌面上的")
+    p.add_argument("--pattern", default="9x6", help="内角点数 列x行")
+    p.add_argument("--square", type=float, required=True, help="方格边长（毫米）")
+    p.add_argument("--origin", required=True, help="桌面棋盘格第一个内角点的机械臂坐标 x,y")
+    p.add_argument("--angle", type=float, default=0.0, help="棋盘格 x 轴与机械臂 x 轴的夹角（度）")
+    p.add_argument("--out", default=CALIB_PATH)
+
+    p = sub.add_parser("report", help="重投影误差报告")
+    p.add_argument("calib")
+    p.add_argument("csv", help="对应点 CSV（u,v,x,y）")
+
+    args = parser.parse_args()
+    if args.cmd == "points":
+        pixels, robot = load_points_csv(args.csv)
+        K = dist = None
+        if args.intrinsics:
+            base = PixelMapper.load(args.intrinsics)
+            K, dist = base.camera_matrix, base.dist_coeffs
+        mapper = fit_points(pixels, robot, K, dist)
+        reprojection_report(mapper, pixels, robot)
+        mapper.save(args.out)
+        print(f"标定结果已保存: {args.out}")
+    elif args.cmd == "checkerboard":
+        pattern = tuple(int(v) for v in args.pattern.lower().split("x"))
+        paths = [p for pattern_ in args.images for p in sorted(glob.glob(pattern_))]
+        images = [cv2.imread(p) for p in paths]
+        K, dist, rms = calibrate_intrinsics(images, pattern, args.square)
+        print(f"内参标定 RMS 重投影误差 {rms:.3f}px")
+        pixels, robot = board_correspondences(
+            images[-1], pattern, args.square, [float(v) for v in args.origin.split(",")], args.angle)
+        h, w = images[-1].shape[:2]
+        mapper = fit_points(pixels, robot, K, dist, (w, h))
+        reprojection_report(mapper, pixels, robot)
+        mapper.save(args.out)
+        print(f"标定结果已保存: {args.out}")
+    else:
+        pixels, robot = load_points_csv(args.csv)
+        reprojection_report(PixelMapper.load(args.calib), pixels, robot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""多工作单元：一个控制服务驱动多套机械臂与摄像头
+
+每个工作单元（一张桌子）有自己的机械臂串口、摄像头（设备号或录像文件）、标定文件、工作空间地图和放置位置，
+登记在 cells.json 中。每个单元运行在独立的工作进程里（spawn 方式启动，不共享 GIL），
+进程内照常使用 devices / detect_new1 / workspace 的单例和 run_top.DualSerialHandler，
+主进程通过管道把语音指令转发给对应单元。没有 cells.json 时按当前模块配置生成一个默认单元，行为与单机版相同。
+
+cells.json 示例：
+    {"cells": [
+        {"name": "desk1", "arm_port": "/dev/ttyCH341USB0", "cmd_port": "/dev/ttyCH341USB1", "camera": 0,
+         "calib": "calib_desk1.npz", "keywords": ["一号", "左边"]},
+        {"name": "desk2", "arm_port": "/dev/ttyACM0", "camera": 2, "calib": "calib_desk2.npz",
+         "drop_locations": {"paper": [-260, 180, 70]}, "keywords": ["二号", "右边"]}
+    ]}
+drop_locations 覆盖 recipes.RECIPES 中对应类别的放置位置，未填写的类别沿用默认配方，
+未填写 cmd_port 时该单元不运行串口指令循环（也不做空闲自动清理），只接收语音指令。
+"""
+import json
+import multiprocessing
+import os
+import threading
+
+import tracing
+
+CELLS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cells.json")  # 工作单元登记文件
+START_TIMEOUT = 120  # 等待工作进程连接并预热完成的时间（秒）
+
+
+class Cell:
+    """一个工作单元的配置"""
+
+    def __init__(self, name, arm_port, cmd_port=None, camera=0, calib=None, workspace=None,
+                 drop_locations=None, keywords=()):
+        self.name = name
+        self.arm_port = arm_port
+        self.cmd_port = cmd_port
+        self.camera = camera  # 摄像头设备索引或录像文件路径
+        self.calib = calib
+        # 不同标定对应不同的视野，默认把工作空间地图放在标定文件旁边
+        if workspace is None and calib:
+            workspace = os.path.splitext(calib)[0] + "_workspace.npy"
+        self.workspace = workspace
+        self.drop_locations = {k: tuple(v) for k, v in (drop_locations or {}).items()}
+        self.keywords = list(keywords)
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**d)
+
+    def apply(self):
+        """在工作进程中改写各模块配置，须在第一次使用设备、检测器和标定之前调用"""
+        import calib
+        import detect_new1
+        import devices
+        import recipes
+        import workspace
+        devices.ARM_PORT = self.arm_port
+        devices.CMD_PORT = self.cmd_port
+        detect_new1.CAMERA_DEVICE = self.camera
+        if self.calib:
+            calib.CALIB_PATH = self.calib
+        if self.workspace:
+            workspace.WORKSPACE_PATH = self.workspace
+        for name, drop in self.drop_locations.items():
+            recipes.RECIPES[name] = {**recipes.RECIPES.get(name, {}), "drop": drop}
+
+    def matches(self, text):
+        return bool(text) and any(k in text for k in self.keywords)
+
+    def __repr__(self):
+        return f"Cell({self.name!r}, arm_port={self.arm_port!r}, camera={self.camera!r})"
+
+
+def load_cells(path=None):
+    """读取工作单元登记；文件不存在时返回按当前模块配置生成的单个默认单元"""
+    path = path or CELLS_PATH
+    if not os.path.exists(path):
+        import detect_new1
+        import devices
+        return [Cell("default", devices.ARM_PORT, devices.CMD_PORT, detect_new1.CAMERA_DEVICE)]
+    with open(path, encoding="utf-8") as f:
+        cells = [Cell.from_dict(d) for d in json.load(f)["cells"]]
+    names = [c.name for c in cells]
+    if not cells or len(set(names)) != len(names):
+        raise ValueError(f"{path} 中的工作单元为空或名称重复: {names}")
+    return cells
+
+
+def cell_main(cell, conn, setup=None):
+    """工作进程入口：连接本单元的设备，执行主进程经管道转发的指令
+
+    消息为 ("command", cmd, keyword, source) / ("status",) / ("metrics",) / ("traces", n) / ("stop",)，
+    每条消息回复一次。
+    setup(cell) 在连接设备之前调用，可返回替换的检测函数（用于虚拟机械臂与录像测试）。
+    """
+    cell.apply()
+    detect = setup(cell) if setup else None
+
+    from devices import get_devices
+    from run_top import DualSerialHandler
+    devices = get_devices().start()
+    handler = DualSerialHandler(devices)
+    if detect is not None:
+        handler.detect = detect
+    if cell.cmd_port:
+        threading.Thread(target=handler.start, daemon=True).start()
+    handler.dispatcher.start()
+    conn.send("ready")
+    try:
+        while True:
+            try:
+                msg = conn.recv()
+            except EOFError:
+                break  # 主进程已退出
+            if msg[0] == "command":
+                job = handler.handle_new_command(msg[1], keyword=msg[2], source=msg[3])
+                conn.send(job.cmd if job else None)
+            elif msg[0] == "status":
+                conn.send(handler.status())
+            elif msg[0] == "metrics":
+                conn.send(tracing.snapshot())
+            elif msg[0] == "traces":
+                conn.send(tracing.recent(msg[1]))
+            elif msg[0] == "stop":
+                handler.dispatcher.stop()
+                conn.send(True)
+                break
+    finally:
+        devices.close()
+
+
+class CellPool:
+    """每个工作单元一个工作进程，按关键词把指令路由到对应单元"""
+
+    def __init__(self, cells, setup=None):
+        self.cells = list(cells)
+        self.setup = setup
+        self._ctx = multiprocessing.get_context("spawn")  # 不继承主进程的线程与串口句柄
+        self._workers = {}  # 名称 -> (进程, 管道, 锁)
+        self._ready = set()  # 已回复 "ready"、可以接收消息的单元
+
+    def start(self):
+        """启动全部工作单元；任一单元启动失败时关闭已启动的进程（释放其串口）后抛出 RuntimeError"""
+        try:
+            for cell in self.cells:
+                parent, child = self._ctx.Pipe()
+                proc = self._ctx.Process(target=cell_main, args=(cell, child, self.setup),
+                                         name=f"cell-{cell.name}", daemon=True)
+                proc.start()
+                self._workers[cell.name] = (proc, parent, threading.Lock())
+            # 各单元并行连接与预热，全部就绪后再返回
+            for cell in self.cells:
+                proc, conn, _ = self._workers[cell.name]
+                try:
+                    ready = conn.poll(START_TIMEOUT) and conn.recv() == "ready"
+                except EOFError:  # 工作进程在就绪前退出
+                    ready = False
+                if not ready:
+                    raise RuntimeError(f"工作单元 {cell.name} 启动失败")
+                self._ready.add(cell.name)
+                print(f"工作单元 {cell.name} 已就绪（进程 {proc.pid}）")
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    def route(self, *texts):
+        """按识别文本、智能体回复中的关键词选择单元，都不匹配时用第一个单元"""
+        for text in texts:
+            for cell in self.cells:
+                if cell.matches(text):
+                    return cell
+        return self.cells[0]
+
+    def _call(self, name, *msg):
+        proc, conn, lock = self._workers[name]
+        with lock:  # HTTP 服务的多个请求线程共用同一条管道
+            conn.send(msg)
+            return conn.recv()
+
+    def command(self, name, cmd, keyword=None, source="http"):
+        """把指令交给单元的调度器，返回入队的指令（无效或重复时为 None）"""
+        return self._call(name, "command", cmd, keyword, source)
+
+    def status(self):
+        return {cell.name: self._call(cell.name, "status") for cell in self.cells}
+
+    def metrics(self):
+        """各单元的直方图 [({"cell": 名称}, snapshot), ...]，交给 tracing.render() 合并输出"""
+        return [({"cell": cell.name}, self._call(cell.name, "metrics")) for cell in self.cells]
+
+    def traces(self, n=None):
+        return {cell.name: self._call(cell.name, "traces", n) for cell in self.cells}
+
+    def close(self):
+        for name, (proc, conn, lock) in self._workers.items():
+            # 尚未就绪的单元不会处理消息，直接结束进程
+            if proc.is_alive() and name in self._ready:
+                try:
+                    self._call(name, "stop")
+                except (EOFError, OSError):
+                    pass
+                proc.join(10)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join()
+            conn.close()
+        self._workers.clear()
+        self._ready.clear()
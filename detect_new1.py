@@ -1,55 +1,289 @@
+import threading
+import time
+
 import cv2
 import numpy as np
 
+from tracing import span
 
-def detect_camera():
-    # 配置参数
-    weights_path = r"/best_1.onnx"  # 模型路径，修改为实际路径
-    camera_device = 0  # 摄像头设备索引或路径
-    input_w, input_h = 640, 640 # 模型输入尺寸
-    conf_thres = 0.60# 置信度阈值
-    nms_thres = 0.35  # NMS阈值
-    class_names = ["pen", "eraser", "sharpener", "scale", "paper"]  # 类别名称
-
-    # 加载模型
+# 配置参数
+WEIGHTS_PATH = r"/best_1.onnx"  # 模型路径，修改为实际路径
+CAMERA_DEVICE = 0  # 摄像头设备索引或路径（也可以是录像文件路径）
+FRAME_W, FRAME_H = 1280, 720  # 摄像头采集分辨率
+INPUT_W, INPUT_H = 640, 640  # 模型输入尺寸
+CONF_THRES = 0.60  # 置信度阈值
+NMS_THRES = 0.35  # NMS阈值
+CLASS_NAMES = ["pen", "eraser", "sharpener", "scale", "paper"]  # 类别名称
+CLASS_AWARE_NMS = False  # True 时按类别分别做NMS
+LETTERBOX = True  # True 时等比缩放加灰边（与YOLOv5训练一致），False 时直接拉伸到输入尺寸
+
+# 场景变化门控：画面没有变化时直接返回上次的检测结果
+SCENE_GATE = True
+GATE_THRESHOLD = 3.0  # 任一分块的平均绝对差超过该值（灰度级）即认为画面变化
+GATE_GRID = (16, 9)  # 分块数（列, 行）：64x36 的缩小灰度图每块 4x4，对应 1280x720 原图的 80x80 像素
+GATE_MAX_AGE = 10.0  # 缓存结果最长有效时间（秒）
+
+# 推理后端配置
+BACKEND = "opencv"  # 可选 "opencv" / "onnxruntime"
+ORT_INTRA_THREADS = 0  # onnxruntime 算子内线程数（0 表示由 onnxruntime 自行决定）
+ORT_INTER_THREADS = 0  # onnxruntime 算子间线程数
+ORT_GRAPH_OPT = "all"  # 图优化级别：disable / basic / extended / all
+
+# 每次 Detector.detect() 得到结果后的回调 listener(frame, result)（如飞行记录），由上层模块注册
+DETECTION_LISTENERS = []
+
+
+def read_input_size(weights_path, default=(INPUT_W, INPUT_H)):
+    """从ONNX模型读取输入尺寸 (w, h)，输入为动态尺寸时返回默认值
+
+    只解析模型的图结构（不加载外部权重、不创建推理会话）。未安装 onnx 或模型无法解析时报错，
+    不按默认尺寸继续运行（输入尺寸不一致时检测框会整体错位）。
+    """
+    try:
+        import onnx
+    except ImportError:
+        raise RuntimeError("未安装 onnx，请执行 pip install onnx")
+    try:
+        model = onnx.load(weights_path, load_external_data=False)
+        dims = model.graph.input[0].type.tensor_type.shape.dim
+    except Exception as e:
+        raise RuntimeError(f"模型读取失败: {str(e)}")
+    if len(dims) == 4 and dims[2].dim_value > 0 and dims[3].dim_value > 0:
+        return dims[3].dim_value, dims[2].dim_value
+    return default
+
+
+def load_net(weights_path=WEIGHTS_PATH):
+    """加载ONNX模型"""
     try:
         net = cv2.dnn.readNetFromONNX(weights_path)
         net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
         net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
-    # print(f"模型加载成功: {weights_path}")
     except Exception as e:
         raise RuntimeError(f"模型加载失败: {str(e)}")
-    # 打开摄像头
-    cap = cv2.VideoCapture(camera_device)
-    if not cap.isOpened():
-        # 尝试作为设备路径打开
-        cap = cv2.VideoCapture(f"/dev/video{camera_device}")
-        if not cap.isOpened():
-            raise IOError(f"无法打开摄像头设备: {camera_device}")
+    return net
+
+
+class OpenCVEngine:
+    """cv2.dnn 推理后端"""
+    name = "opencv"
+
+    def __init__(self, weights_path=WEIGHTS_PATH):
+        self.net = load_net(weights_path)
+        self.out_names = self.net.getUnconnectedOutLayersNames()
+        self.input_size = read_input_size(weights_path)
+
+    def forward(self, blob):
+        self.net.setInput(blob)
+        return self.net.forward(self.out_names)
+
+
+class OrtEngine:
+    """onnxruntime 推理后端，输出缓冲区预先分配并绑定，推理过程不再分配输出内存
+
+    注意：返回的输出数组在下一次 forward 时会被覆盖。
+    """
+    name = "onnxruntime"
+    GRAPH_OPT_LEVELS = {
+        "disable": "ORT_DISABLE_ALL",
+        "basic": "ORT_ENABLE_BASIC",
+        "extended": "ORT_ENABLE_EXTENDED",
+        "all": "ORT_ENABLE_ALL",
+    }
 
+    def __init__(self, weights_path=WEIGHTS_PATH, intra_threads=ORT_INTRA_THREADS,
+                 inter_threads=ORT_INTER_THREADS, graph_opt=ORT_GRAPH_OPT):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("未安装 onnxruntime，请执行 pip install onnxruntime")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_threads
+        options.inter_op_num_threads = inter_threads
+        if inter_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        options.graph_optimization_level = getattr(
+            ort.GraphOptimizationLevel, self.GRAPH_OPT_LEVELS[graph_opt])
+        try:
+            self.session = ort.InferenceSession(
+                weights_path, options, providers=["CPUExecutionProvider"])
+        except Exception as e:
+            raise RuntimeError(f"模型加载失败: {str(e)}")
+
+        self.input_name = self.session.get_inputs()[0].name
+        shape = self.session.get_inputs()[0].shape
+        self.input_size = (shape[3], shape[2]) if all(
+            isinstance(d, int) for d in shape[2:]) else (INPUT_W, INPUT_H)
+        self.binding = self.session.io_binding()
+        self.outputs = []
+        for out in self.session.get_outputs():
+            if all(isinstance(d, int) for d in out.shape):
+                # 静态形状：预分配输出缓冲区并绑定
+                buf = np.empty(out.shape, dtype=np.float32)
+                self.binding.bind_output(out.name, "cpu", 0, np.float32, buf.shape,
+                                         buf.ctypes.data)
+                self.outputs.append(buf)
+            else:
+                self.binding.bind_output(out.name, "cpu")
+        self._static = len(self.outputs) == len(self.session.get_outputs())
+
+    def forward(self, blob):
+        self.binding.bind_cpu_input(self.input_name, blob)
+        self.session.run_with_iobinding(self.binding)
+        if self._static:
+            return self.outputs
+        return self.binding.copy_outputs_to_cpu()
+
+
+ENGINES = {
+    OpenCVEngine.name: OpenCVEngine,
+    OrtEngine.name: OrtEngine,
+}
+
+
+def create_engine(backend=BACKEND, weights_path=WEIGHTS_PATH, **kwargs):
+    """按名称创建推理后端"""
+    if backend not in ENGINES:
+        raise ValueError(f"未知推理后端: {backend}，可选 {list(ENGINES)}")
+    return ENGINES[backend](weights_path, **kwargs)
+
+
+def open_capture(source=CAMERA_DEVICE):
+    """打开摄像头（设备索引/设备路径/录像文件）"""
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened() and isinstance(source, int):
+        # 尝试作为设备路径打开
+        cap = cv2.VideoCapture(f"/dev/video{source}")
+    if not cap.isOpened():
+        raise IOError(f"无法打开摄像头设备: {source}")
 
     # 设置摄像头参数
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_W)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_H)
+    return cap
+
+
+class Letterbox:
+    """等比缩放加灰边的预处理，结果写入预分配并复用的 float32 NCHW 缓冲区
+
+    返回的 blob 在下一次调用时会被覆盖；scale/pad_x/pad_y 用于把检测框映射回原图。
+    """
+
+    def __init__(self, input_w=INPUT_W, input_h=INPUT_H, pad_value=114):
+        self.input_w, self.input_h = input_w, input_h
+        self.pad_value = pad_value
+        self.blob = np.empty((1, 3, input_h, input_w), dtype=np.float32)
+        self._canvas = np.full((input_h, input_w, 3), pad_value, dtype=np.uint8)
+        self._resized = None
+        self._frame_size = None
+        self.scale, self.pad_x, self.pad_y = 1.0, 0, 0
+
+    def _configure(self, orig_w, orig_h):
+        """原图尺寸变化时重新计算缩放/填充参数（正常运行中只发生一次）"""
+        self.scale = min(self.input_w / orig_w, self.input_h / orig_h)
+        new_w, new_h = round(orig_w * self.scale), round(orig_h * self.scale)
+        self.pad_x, self.pad_y = (self.input_w - new_w) // 2, (self.input_h - new_h) // 2
+        self._resized = np.empty((new_h, new_w, 3), dtype=np.uint8)
+        self._canvas[:] = self.pad_value
+        self._frame_size = (orig_w, orig_h)
+
+    def __call__(self, frame):
+        orig_h, orig_w = frame.shape[:2]
+        if self._frame_size != (orig_w, orig_h):
+            self._configure(orig_w, orig_h)
+        new_h, new_w = self._resized.shape[:2]
+        cv2.resize(frame, (new_w, new_h), dst=self._resized, interpolation=cv2.INTER_LINEAR)
+        self._canvas[self.pad_y:self.pad_y + new_h, self.pad_x:self.pad_x + new_w] = self._resized
+        # BGR转RGB、HWC转CHW并归一化，直接写入输入缓冲区
+        for c in range(3):
+            np.multiply(self._canvas[:, :, 2 - c], np.float32(1 / 255.0), out=self.blob[0, c])
+        return self.blob
+
+    @property
+    def params(self):
+        return self.scale, self.pad_x, self.pad_y
+
+
+def decode(outputs, orig_w, orig_h, input_w=INPUT_W, input_h=INPUT_H,
+           conf_thres=CONF_THRES, num_classes=len(CLASS_NAMES), letterbox=None):
+    """向量化解析YOLOv5输出，返回 (boxes[N,4] 左上角+宽高, confs[N], class_ids[N])
+
+    letterbox 为 (scale, pad_x, pad_y) 时按等比缩放还原坐标，否则按拉伸比例还原。
+    """
+    # YOLOv5的ONNX输出是(1, 25200, 85)格式，去除批次维度后为(25200, 85)
+    pred = np.asarray(outputs[0])
+    pred = pred.reshape(-1, pred.shape[-1])
+    if pred.shape[1] <= 5:
+        return np.zeros((0, 4), np.int32), np.zeros(0, np.float32), np.zeros(0, np.int64)
+
+    # 目标置信度预过滤：类别分数不超过1，obj_conf 不过阈值的行不可能通过
+    pred = pred[pred[:, 4] > conf_thres]
+    cls_scores = pred[:, 5:5 + num_classes]  # 只取实际类别数量的分数
+    class_ids = np.argmax(cls_scores, axis=1)
+    confs = pred[:, 4] * cls_scores[np.arange(len(pred)), class_ids]
+    keep = confs > conf_thres
+    pred, confs, class_ids = pred[keep], confs[keep], class_ids[keep]
 
-    # 读取一帧
-    ret, frame = cap.read()
-    cap.release()
+    cx, cy, w, h = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+    if letterbox is not None:
+        scale, pad_x, pad_y = letterbox
+        boxes = np.stack([
+            (cx - w / 2 - pad_x) / scale,
+            (cy - h / 2 - pad_y) / scale,
+            w / scale,
+            h / scale,
+        ], axis=1).astype(np.int32)
+        return boxes, confs, class_ids
 
-    if not ret or frame is None:
-        raise IOError("无法获取摄像头图像")
+    # 坐标转换为左上角(x1, y1)和宽高(w, h)，与逐行版本相同的float32运算和截断
+    boxes = np.stack([
+        (cx - w / 2) * orig_w / input_w,
+        (cy - h / 2) * orig_h / input_h,
+        w * orig_w / input_w,
+        h * orig_h / input_h,
+    ], axis=1).astype(np.int32)
+    return boxes, confs, class_ids
 
-  #  print(f"图像尺寸: {frame.shape[1]}x{frame.shape[0]}")
-    orig_h, orig_w = frame.shape[:2]
 
-    # 图像预处理
-    blob = cv2.dnn.blobFromImage(
-        frame, 1 / 255.0,  (input_w, input_h), swapRB=True, crop=False)
-    net.setInput(blob)
-    # 推理（获取输出层）
-    outputs = net.forward(net.getUnconnectedOutLayersNames())
+def nms(boxes, confs, class_ids, conf_thres=CONF_THRES, nms_thres=NMS_THRES, class_aware=False):
+    """NMS去重；class_aware=True 时按类别分别做NMS（不同类别的框互不抑制）"""
+    if len(boxes) == 0:
+        return np.zeros(0, np.int64)
+    nms_boxes = boxes
+    if class_aware:
+        # 按类别平移框，使不同类别的框不重叠，一次NMSBoxes完成批量按类NMS
+        offset = int(boxes[:, :2].max() + boxes[:, 2:].max()) + 1
+        nms_boxes = boxes.copy()
+        nms_boxes[:, :2] += (class_ids * offset)[:, None].astype(np.int32)
+    indices = cv2.dnn.NMSBoxes(nms_boxes.tolist(), confs.tolist(), conf_thres, nms_thres)
+    return np.array(indices, dtype=np.int64).flatten()
 
 
+def postprocess(outputs, orig_w, orig_h, input_w=INPUT_W, input_h=INPUT_H,
+                conf_thres=CONF_THRES, nms_thres=NMS_THRES, class_names=CLASS_NAMES,
+                class_aware=False, letterbox=None):
+    """解析YOLOv5输出，返回[[类别, 中心x, 中心y, 置信度], ...]"""
+    boxes, confs, class_ids = decode(outputs, orig_w, orig_h, input_w, input_h,
+                                     conf_thres, len(class_names), letterbox)
+    indices = nms(boxes, confs, class_ids, conf_thres, nms_thres, class_aware)
+    return format_result(boxes, confs, class_ids, indices, class_names)
+
+
+def format_result(boxes, confs, class_ids, indices, class_names=CLASS_NAMES):
+    """NMS保留的框转换为[[类别, 中心x, 中心y, 置信度], ...]"""
+    return [
+        [class_names[class_ids[i]],
+         int(boxes[i][0] + boxes[i][2] // 2),  # 中心点x
+         int(boxes[i][1] + boxes[i][3] // 2),  # 中心点y
+         round(float(confs[i]), 2)]
+        for i in indices
+    ]
+
+
+def postprocess_reference(outputs, orig_w, orig_h, input_w=INPUT_W, input_h=INPUT_H,
+                          conf_thres=CONF_THRES, nms_thres=NMS_THRES, class_names=CLASS_NAMES):
+    """逐行解析的原始实现，仅用于与向量化版本做等价性校验和性能对比"""
     # 关键修正：YOLOv5的ONNX输出是(1, 25200, 85)格式（85=4坐标+1置信度+80类别）
     # 需将输出重塑为(25200, 85)
     outputs = np.squeeze(outputs[0])  # 去除批次维度
@@ -88,11 +322,243 @@ def detect_camera():
          boxes[i][0] + boxes[i][2] // 2,  # 中心点x
          boxes[i][1] + boxes[i][3] // 2,  # 中心点y
          round(confs[i], 2)]
-        for i in indices.flatten()
+        for i in np.array(indices).flatten()
     ] if len(indices) > 0 else []
     return result
 
 
+class SceneGate:
+    """场景变化门控：把画面缩小为灰度图与缓存结果对应的画面比较，变化不超过阈值则复用结果
+
+    按分块比较而不是整幅平均：笔、橡皮这类小物体只占画面的很小一部分，整幅平均差几乎不变，
+    而所在分块的平均差明显超过阈值。
+    """
+
+    def __init__(self, threshold=GATE_THRESHOLD, max_age=GATE_MAX_AGE, size=(64, 36), grid=GATE_GRID):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.size = size
+        self.grid = grid
+        self.hits = 0  # 命中缓存（省去的推理次数）
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._signature = None
+        self._result = None
+        self._time = 0.0
+
+    def signature(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def difference(self, a, b):
+        """两个缩小灰度图各分块平均绝对差的最大值"""
+        diff = np.abs(a - b).astype(np.float32)
+        return float(cv2.resize(diff, self.grid, interpolation=cv2.INTER_AREA).max())
+
+    def lookup(self, signature):
+        """画面未变化且缓存未过期时返回缓存结果，否则返回 None"""
+        with self._lock:
+            if (self._result is not None
+                    and time.monotonic() - self._time <= self.max_age
+                    and self.difference(signature, self._signature) <= self.threshold):
+                self.hits += 1
+                return [list(r) for r in self._result]
+            self.misses += 1
+            return None
+
+    def store(self, signature, result):
+        with self._lock:
+            self._signature = signature
+            self._result = [list(r) for r in result]
+            self._time = time.monotonic()
+
+    def invalidate(self):
+        """机械臂运动后调用，丢弃缓存结果"""
+        with self._lock:
+            if self._result is not None:
+                self.invalidations += 1
+            self._result = None
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / total if total else 0.0,
+                "saved_inferences": self.hits,
+            }
+
+
+class Detector:
+    """常驻检测器：模型只加载一次，摄像头保持打开，后台线程持续抓取最新帧
+
+    source=None 时不打开摄像头，只能通过 infer() 对外部传入的图像做检测（离线评估用）。
+    """
+
+    def __init__(self, weights_path=WEIGHTS_PATH, source=CAMERA_DEVICE, loop_video=True,
+                 backend=BACKEND, scene_gate=SCENE_GATE, **engine_kwargs):
+        self.engine = create_engine(backend, weights_path, **engine_kwargs)
+        # 输入尺寸取自模型本身，可直接加载 320/416 等小尺寸或量化模型
+        self.input_w, self.input_h = self.engine.input_size
+        self.letterbox = Letterbox(self.input_w, self.input_h) if LETTERBOX else None
+        self.gate = SceneGate() if scene_gate else None
+        self.inferences = 0  # 完整推理次数（不含场景门控命中的缓存结果）
+        self.source = source
+        self.loop_video = loop_video  # 录像文件读完后从头循环
+        self._frame = None
+        self._frame_id = 0
+        self._consumed_id = 0
+        self._cond = threading.Condition()
+        self._infer_lock = threading.Lock()  # 推理后端及其输出缓冲区不是线程安全的
+        self._running = True
+        self.cap = None
+        self._grabber = None
+        if source is None:
+            return
+
+        self.cap = open_capture(source)
+        # 录像文件按原始帧率回放，模拟真实摄像头
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if not isinstance(source, int) else 0
+        self._frame_interval = 1.0 / fps if fps and fps > 0 else 0
+        self._grabber = threading.Thread(target=self._grab_loop, daemon=True)
+        self._grabber.start()
+
+    def _grab_loop(self):
+        """后台抓帧线程，始终只保留最新的一帧"""
+        while self._running:
+            t0 = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret or frame is None:
+                if self.loop_video and not isinstance(self.source, int):
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                time.sleep(0.01)
+                continue
+            with self._cond:
+                self._frame = frame
+                self._frame_id += 1
+                self._cond.notify_all()
+            if self._frame_interval:
+                time.sleep(max(0.0, self._frame_interval - (time.perf_counter() - t0)))
+
+    def read(self, fresh=False, timeout=2.0):
+        """获取最新帧；fresh=True 时等待一帧上次未取过的新帧"""
+        with self._cond:
+            wanted = self._consumed_id + 1 if fresh else 1
+            if not self._cond.wait_for(lambda: self._frame_id >= wanted, timeout):
+                raise IOError("无法获取摄像头图像")
+            self._consumed_id = self._frame_id
+            return self._frame
+
+    def infer(self, frame, timings=None):
+        """对一帧图像做推理并返回检测结果
+
+        传入 timings 字典时，记录 preprocess / forward / decode / nms 各阶段耗时（秒）。
+        """
+        orig_h, orig_w = frame.shape[:2]
+
+        with self._infer_lock:
+            self.inferences += 1
+            t0 = time.perf_counter()
+            # 图像预处理
+            if self.letterbox:
+                blob = self.letterbox(frame)
+                params = self.letterbox.params
+            else:
+                blob = cv2.dnn.blobFromImage(
+                    frame, 1 / 255.0, (self.input_w, self.input_h), swapRB=True, crop=False)
+                params = None
+            t1 = time.perf_counter()
+            outputs = self.engine.forward(blob)
+            t2 = time.perf_counter()
+            boxes, confs, class_ids = decode(outputs, orig_w, orig_h, self.input_w, self.input_h,
+                                             letterbox=params)
+            t3 = time.perf_counter()
+            indices = nms(boxes, confs, class_ids, class_aware=CLASS_AWARE_NMS)
+            result = format_result(boxes, confs, class_ids, indices)
+            if timings is not None:
+                timings.update(preprocess=t1 - t0, forward=t2 - t1, decode=t3 - t2,
+                               nms=time.perf_counter() - t3)
+            return result
+
+    def detect(self, fresh=False, use_cache=True):
+        """抓取最新帧并检测；画面与上次检测时相比没有变化则直接返回缓存结果"""
+        frame = self.read(fresh=fresh)
+        if not (self.gate and use_cache):
+            result = self.infer(frame)
+        else:
+            signature = self.gate.signature(frame)
+            result = self.gate.lookup(signature)
+            if result is None:
+                result = self.infer(frame)
+                self.gate.store(signature, result)
+        for listener in DETECTION_LISTENERS:
+            try:
+                listener(frame, result)
+            except Exception as e:
+                print(f"检测回调出错: {e}")
+        return result
+
+    def invalidate_cache(self):
+        if self.gate:
+            self.gate.invalidate()
+
+    def close(self):
+        """停止抓帧线程并释放摄像头"""
+        self._running = False
+        if self._grabber and self._grabber.is_alive():
+            self._grabber.join(timeout=1.0)
+        if self.cap:
+            self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_detector():
+    """获取进程内共享的检测器（首次调用时创建）"""
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            # 在调用时读取模块配置，多工作单元时各进程可先修改 CAMERA_DEVICE 等配置
+            _detector = Detector(WEIGHTS_PATH, CAMERA_DEVICE)
+        return _detector
+
+
+def detect_camera():
+    """兼容旧接口：使用共享检测器完成一次检测"""
+    with span("detect_camera"):
+        return get_detector().detect()
+
+
+def invalidate_cache():
+    """丢弃共享检测器的缓存结果（机械臂运动后调用）"""
+    if _detector is not None:
+        _detector.invalidate_cache()
+
+
+def inference_count():
+    """共享检测器至今的完整推理次数（尚未创建时为 0）"""
+    return _detector.inferences if _detector is not None else 0
+
+
+def cache_stats():
+    """共享检测器的缓存命中统计"""
+    if _detector is None or _detector.gate is None:
+        return {}
+    return _detector.gate.stats()
+
+
 if __name__ == "__main__":
     while True:
         print(detect_camera())
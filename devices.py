@@ -0,0 +1,172 @@
+"""进程内共享的设备管理
+
+机械臂串口与指令接收串口在进程启动时只打开一次（打开串口会复位 Arduino，并等待 2 秒），
+预热后交给 HTTP 服务、串口指令循环和自动清理循环共用同一个句柄。
+后台线程在机械臂空闲时定期发送空指令检查连接，连续失败或串口断开时按指数退避重连。
+连接时默认不回零（回零是实际的机械动作，任务进行中的短暂断线不应触发），由自动清理等任务在开始时回零；
+重连后固件已复位、位置未知，在下一次回零之前不应执行单步运动。
+"""
+import threading
+import time
+
+import serial
+
+from scara_1 import SCARAController
+
+ARM_PORT = "/dev/ttyCH341USB0"  # 机械臂串口
+CMD_PORT = "/dev/ttyCH341USB1"  # 指令接收串口
+BAUDRATE = 115200
+HEALTH_INTERVAL = 10.0  # 健康检查间隔（秒）
+HEALTH_FAILURES = 2  # 连续几次检查失败后重连
+BACKOFF_MIN = 1.0  # 重连退避的初始间隔（秒）
+BACKOFF_MAX = 30.0
+HOME_ON_CONNECT = False  # True 时连接（含重连）后先回零
+WARM_UP_DETECTOR = True  # 启动时加载检测模型并打开摄像头
+
+
+class DeviceManager:
+    """机械臂与指令串口的唯一持有者
+
+    lock 为机械臂的使用权：执行指令期间持有，健康检查只在能立即拿到时进行，不会打断运动。
+    """
+
+    def __init__(self, arm_port=ARM_PORT, cmd_port=CMD_PORT, baudrate=BAUDRATE, debug_mode=True,
+                 health_interval=HEALTH_INTERVAL):
+        self.arm_port = arm_port
+        self.cmd_port = cmd_port
+        self.baudrate = baudrate
+        self.debug_mode = debug_mode
+        self.health_interval = health_interval
+        self.lock = threading.RLock()
+        self._arm = None
+        self._cmd_serial = None
+        self._failures = 0
+        self._backoff = BACKOFF_MIN
+        self._next_attempt = 0.0  # 下一次允许重连的时间
+        self._stop = threading.Event()
+        self._thread = None
+        self.reconnects = 0
+
+    def _connect_arm(self):
+        """打开机械臂串口并确认固件响应，失败时按退避推迟下一次尝试"""
+        if time.time() < self._next_attempt:
+            return None
+        arm = SCARAController(self.arm_port, self.baudrate, debug_mode=self.debug_mode)
+        if arm.is_connected() and arm.ping() and (not HOME_ON_CONNECT or arm.home(timeout=60)):
+            self._arm, self._failures, self._backoff = arm, 0, BACKOFF_MIN
+            print(f"机械臂已就绪: {self.arm_port}")
+            return arm
+        if arm.is_connected():
+            arm.close()
+        self._next_attempt = time.time() + self._backoff
+        print(f"机械臂连接失败，{self._backoff:.0f} 秒后重试")
+        self._backoff = min(self._backoff * 2, BACKOFF_MAX)
+        return None
+
+    def arm(self):
+        """共享的机械臂句柄；未连接时尝试连接（处于退避期间返回 None）"""
+        with self.lock:
+            if self._arm is None or not self._arm.is_connected():
+                self._drop_arm()
+                return self._connect_arm()
+            return self._arm
+
+    def _drop_arm(self):
+        if self._arm is not None:
+            try:
+                self._arm.close()
+            except Exception as e:
+                print(f"关闭机械臂串口出错: {e}")
+            self._arm = None
+
+    def cmd_serial(self):
+        """共享的指令接收串口，打开失败时抛出 serial.SerialException"""
+        if self._cmd_serial is None or not self._cmd_serial.is_open:
+            self._cmd_serial = serial.Serial(
+                port=self.cmd_port,
+                baudrate=self.baudrate,
+                timeout=0.1,
+                parity=serial.PARITY_NONE,
+                stopbits=serial.STOPBITS_ONE,
+                bytesize=serial.EIGHTBITS
+            )
+            print(f"指令接收串口已连接到 {self.cmd_port}")
+        return self._cmd_serial
+
+    def start(self):
+        """连接并预热，启动健康检查线程"""
+        t0 = time.perf_counter()
+        import recorder
+        if recorder.FLIGHT_RECORD:
+            recorder.start_flight_recorder()  # 在连接之前开始，包含连接时的空指令与回零
+        self.arm()
+        if WARM_UP_DETECTOR:
+            try:
+                from detect_new1 import get_detector
+                get_detector()
+            except Exception as e:
+                print(f"检测器预热失败: {e}")
+        # 加载标定与工作空间地图、编译抓取放置配方，避免第一条指令时才加载
+        from recipes import get_recipes
+        from workspace import get_workspace
+        get_workspace()
+        get_recipes()
+        print(f"设备预热完成，用时 {time.perf_counter() - t0:.1f} 秒")
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._health_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def check(self):
+        """一次健康检查：机械臂被占用时跳过，返回机械臂是否可用"""
+        if not self.lock.acquire(blocking=False):
+            return True
+        try:
+            arm = self._arm
+            if arm is not None and arm.is_connected() and arm.ping():
+                self._failures = 0
+                return True
+            self._failures += 1
+            if arm is not None and arm.is_connected() and self._failures < HEALTH_FAILURES:
+                return False
+            if arm is not None:
+                print("机械臂无响应，重新连接")
+                self.reconnects += 1
+                self._drop_arm()
+            if self._connect_arm() is None:
+                return False
+            if self.reconnects and not HOME_ON_CONNECT:
+                print("机械臂已重新连接，固件已复位，执行运动前需要先回零")
+            return True
+        finally:
+            self.lock.release()
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"健康检查出错: {e}")
+
+    def close(self):
+        self._stop.set()
+        with self.lock:
+            self._drop_arm()
+        if self._cmd_serial is not None and self._cmd_serial.is_open:
+            self._cmd_serial.close()
+            print("指令接收串口已关闭")
+        import recorder
+        recorder.stop_flight_recorder()
+
+
+_devices = None
+_devices_lock = threading.Lock()
+
+
+def get_devices():
+    """进程内共享的设备管理器（首次调用时创建，需调用 start() 连接）"""
+    global _devices
+    with _devices_lock:
+        if _devices is None:
+            _devices = DeviceManager(ARM_PORT, CMD_PORT, BAUDRATE)
+        return _devices
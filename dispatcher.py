@@ -0,0 +1,147 @@
+"""指令调度：优先级队列 + 单个执行线程
+
+指令到达后立即入队并返回，不阻塞读取串口或 HTTP 请求的线程；执行线程按优先级（数值小的优先）、
+同优先级按到达顺序取出执行。抢占型指令（如复位）会清空队列，并通知正在执行的任务在下一个安全点
+（两条运动指令之间，或固件程序的两个路径点之间）退出，再立即开始执行。最近 LATENCY_WINDOW 条指令
+从到达到开始执行的等待时间会保留下来，用于状态中的分位数统计。
+"""
+import collections
+import heapq
+import itertools
+import threading
+import time
+
+import numpy as np
+
+LATENCY_WINDOW = 1000  # 保留最近多少条指令的等待时间
+
+
+class Job:
+    """一条排队或执行中的指令"""
+
+    def __init__(self, cmd, priority, source):
+        self.cmd = cmd
+        self.priority = priority
+        self.source = source  # 指令来源，如 uart / http / idle
+        self.cancel_event = threading.Event()  # 设置后任务应在下一个安全点退出
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+
+    @property
+    def latency(self):
+        """从到达到开始执行的等待时间（秒）"""
+        return None if self.started is None else self.started - self.submitted
+
+    def __repr__(self):
+        return f"Job({self.cmd!r}, priority={self.priority}, source={self.source!r})"
+
+
+class Dispatcher:
+    """execute(job) 在执行线程中运行；priorities 为 {指令: 优先级}，preempting 为可抢占的指令集合"""
+
+    def __init__(self, execute, priorities, preempting=(), allow_preempt=True):
+        self.execute = execute
+        self.priorities = priorities
+        self.preempting = set(preempting)
+        self.allow_preempt = allow_preempt
+        self._cond = threading.Condition()
+        self._queue = []  # [(优先级, 到达序号, Job)]
+        self._counter = itertools.count()
+        self._running = None
+        self._thread = None
+        self._stopped = False
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)  # 最近开始执行的指令的等待时间（秒）
+        self.completed = 0
+        self.cancelled = 0
+        self.dropped = 0  # 与排队或执行中的指令重复而丢弃的数量
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, cmd, source="uart"):
+        """指令入队，返回 Job；与排队或执行中的指令重复时丢弃并返回 None"""
+        job = Job(cmd, self.priorities.get(cmd, max(self.priorities.values(), default=0) + 1), source)
+        self.start()
+        with self._cond:
+            if any(queued.cmd == cmd for _, _, queued in self._queue) or (
+                    self._running and self._running.cmd == cmd and cmd not in self.preempting):
+                self.dropped += 1
+                return None
+            if self.allow_preempt and cmd in self.preempting:
+                for _, _, queued in self._queue:
+                    queued.cancel_event.set()
+                    self.cancelled += 1
+                self._queue.clear()
+                if self._running and not self._running.cancel_event.is_set():
+                    print(f"指令 {cmd} 抢占正在执行的指令 {self._running.cmd}")
+                    self._running.cancel_event.set()
+            heapq.heappush(self._queue, (job.priority, next(self._counter), job))
+            self._cond.notify_all()
+        return job
+
+    def idle(self):
+        with self._cond:
+            return self._running is None and not self._queue
+
+    def wait_idle(self, timeout=None):
+        """等待队列清空且没有指令在执行，返回是否等到"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._running is None and not self._queue, timeout)
+
+    def status(self):
+        """当前状态（可在执行指令期间随时调用）"""
+        with self._cond:
+            running = self._running
+            status = {
+                "running": running.cmd if running else None,
+                "running_for": round(time.perf_counter() - running.started, 1) if running else 0.0,
+                "cancelling": bool(running and running.cancel_event.is_set()),
+                "queue": [job.cmd for _, _, job in sorted(self._queue)],
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "dropped": self.dropped,
+            }
+            latencies = list(self.latencies)
+        if latencies:
+            status["latency_ms"] = {
+                "p50": round(float(np.percentile(latencies, 50)) * 1000, 1),
+                "p95": round(float(np.percentile(latencies, 95)) * 1000, 1),
+                "max": round(max(latencies) * 1000, 1),
+            }
+        return status
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            if self._running:
+                self._running.cancel_event.set()
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._stopped)
+                if self._stopped:
+                    return
+                _, _, job = heapq.heappop(self._queue)
+                job.started = time.perf_counter()
+                self._running = job
+                self.latencies.append(job.latency)
+            try:
+                self.execute(job)
+            except Exception as e:
+                print(f"执行指令 {job.cmd} 出错: {e}")
+            finally:
+                with self._cond:
+                    job.finished = time.perf_counter()
+                    if job.cancel_event.is_set():
+                        self.cancelled += 1
+                    else:
+                        self.completed += 1
+                    self._running = None
+                    self._cond.notify_all()
@@ -0,0 +1,86 @@
+"""SCARA 机械臂批量正/逆运动学（NumPy 向量化）
+
+所有函数都接受标量或数组，角度单位为度，长度单位为毫米。
+逆解同时给出两种肘部构型：
+    第 0 列  肘部向下（theta2 >= 0，与原 SCARAController.inverse_kinematics 相同）
+    第 1 列  肘部向上（theta2 <= 0）
+"""
+from collections import namedtuple
+
+import numpy as np
+
+L1 = 228.0  # 大臂长度
+L2 = 156.5  # 小臂长度
+
+# 关节限位（度）。下限取自固件回零时限位开关处的步数：
+# theta1 -3955/44.44，theta2 -5850/35.56；大臂正方向没有限位开关，按结构允许取 180°
+THETA1_LIMITS = (-89.0, 180.0)
+THETA2_LIMITS = (-164.5, 164.5)
+
+ELBOW_DOWN, ELBOW_UP = 0, 1
+
+IKResult = namedtuple("IKResult", [
+    "theta1",  # (..., 2) 两种构型的大臂角度
+    "theta2",  # (..., 2) 两种构型的小臂角度
+    "reachable",  # (...) 目标点是否在工作空间内
+    "within_limits",  # (..., 2) 各构型是否满足关节限位（不可达的点为 False）
+])
+
+
+def _wrap(angle):
+    """角度归一化到 (-180, 180]"""
+    return 180.0 - np.mod(180.0 - angle, 360.0)
+
+
+def inverse_kinematics(x, y, l1=L1, l2=L2, theta1_limits=THETA1_LIMITS, theta2_limits=THETA2_LIMITS):
+    """批量逆运动学，返回 IKResult"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    r2 = x ** 2 + y ** 2
+    r = np.sqrt(r2)
+    reachable = (abs(l1 - l2) <= r) & (r <= l1 + l2)
+
+    cos_theta2 = np.clip((r2 - l1 ** 2 - l2 ** 2) / (2 * l1 * l2), -1.0, 1.0)
+    theta2 = np.arccos(cos_theta2)  # 肘部向下的解，另一解取相反数
+    base = np.arctan2(y, x)
+    offset = np.arctan2(l2 * np.sin(theta2), l1 + l2 * cos_theta2)
+
+    theta1 = np.stack([base - offset, base + offset], axis=-1)
+    theta2 = np.stack([theta2, -theta2], axis=-1)
+    theta1 = np.degrees(theta1)
+    theta2 = np.degrees(theta2)
+
+    # 大臂角度归一化后，若超出限位而相差 360° 的等价角在限位内，则取等价角
+    def in_theta1_limits(a):
+        return (a >= theta1_limits[0]) & (a <= theta1_limits[1])
+
+    theta1 = _wrap(theta1)
+    for shift in (360.0, -360.0):
+        theta1 = np.where(~in_theta1_limits(theta1) & in_theta1_limits(theta1 + shift),
+                          theta1 + shift, theta1)
+
+    within = (in_theta1_limits(theta1)
+              & (theta2 >= theta2_limits[0]) & (theta2 <= theta2_limits[1])
+              & reachable[..., None])
+    return IKResult(theta1, theta2, reachable, within)
+
+
+def forward_kinematics(theta1, theta2, l1=L1, l2=L2):
+    """批量正运动学，返回末端 (x, y)"""
+    t1 = np.radians(np.asarray(theta1, dtype=np.float64))
+    t12 = t1 + np.radians(np.asarray(theta2, dtype=np.float64))
+    return l1 * np.cos(t1) + l2 * np.cos(t12), l1 * np.sin(t1) + l2 * np.sin(t12)
+
+
+def select(result, prefer=ELBOW_DOWN):
+    """每个点选一种构型：优先 prefer，不满足限位时用另一种
+
+    返回 (theta1, theta2, valid)，valid 为 False 的点两种构型都不可用。
+    """
+    other = 1 - prefer
+    use_prefer = result.within_limits[..., prefer] | ~result.within_limits[..., other]
+    idx = np.where(use_prefer, prefer, other)[..., None]
+    theta1 = np.take_along_axis(result.theta1, idx, axis=-1)[..., 0]
+    theta2 = np.take_along_axis(result.theta2, idx, axis=-1)[..., 0]
+    valid = result.within_limits.any(axis=-1)
+    return theta1, theta2, valid
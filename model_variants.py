@@ -0,0 +1,137 @@
+"""生成 best_1.onnx 的量化 / 小输入尺寸变体
+
+用法示例：
+    python model_variants.py dynamic best_1.onnx best_1_int8_dyn.onnx
+    python model_variants.py static best_1.onnx best_1_int8_static.onnx --calib desk.mp4
+    python model_variants.py resize best_1.onnx best_1_320.onnx --size 320
+
+生成的模型都可以直接交给 detect_new1.Detector 加载，输入尺寸从模型中读取。
+量化模型建议配合 onnxruntime 后端使用（cv2.dnn 对量化算子支持有限）。
+"""
+import argparse
+import glob
+import os
+
+import cv2
+import numpy as np
+
+import detect_new1
+
+
+def quantize_dynamic(src, dst):
+    """INT8 动态量化（只量化权重，无需标定数据）"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic as _quantize
+    _quantize(src, dst, weight_type=QuantType.QUInt8)
+    print(f"动态量化模型已保存: {dst}")
+
+
+def _calib_frames(source, n):
+    """从录像或图片目录读取标定用的帧"""
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, "*.jpg")) + glob.glob(os.path.join(source, "*.png")))
+        return [cv2.imread(p) for p in paths[:n]]
+    frames = []
+    cap = detect_new1.open_capture(source)
+    while len(frames) < n:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+class _FrameReader:
+    """onnxruntime 静态量化的标定数据读取器
+
+    预处理与 Detector 运行时相同（detect_new1.LETTERBOX 为 True 时等比缩放加灰边），标定得到的激活值范围才与实际输入一致。
+    """
+
+    def __init__(self, input_name, frames, input_size, letterbox=None):
+        letterbox = detect_new1.LETTERBOX if letterbox is None else letterbox
+        if letterbox:
+            preprocess = detect_new1.Letterbox(*input_size)
+            # Letterbox 复用同一个输出缓冲区，每帧需要复制
+            blobs = [preprocess(f).copy() for f in frames]
+        else:
+            blobs = [cv2.dnn.blobFromImage(f, 1 / 255.0, input_size, swapRB=True, crop=False) for f in frames]
+        self._blobs = iter([{input_name: blob} for blob in blobs])
+
+    def get_next(self):
+        return next(self._blobs, None)
+
+
+def quantize_static(src, dst, calib_source, n=100):
+    """INT8 静态量化，用实际桌面画面标定激活值范围"""
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static as _quantize
+
+    frames = _calib_frames(calib_source, n)
+    if not frames:
+        raise RuntimeError(f"无法从 {calib_source} 读取标定帧")
+    input_name = ort.InferenceSession(src, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    reader = _FrameReader(input_name, frames, detect_new1.read_input_size(src))
+    _quantize(src, dst, reader, quant_format=QuantFormat.QDQ,
+              activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    print(f"静态量化模型已保存（{len(frames)} 帧标定）: {dst}")
+
+
+def resize_input(src, dst, size):
+    """把模型输入改为 size x size
+
+    YOLOv5 导出的检测头中网格尺寸可能是常量，直接改输入尺寸不一定可行，
+    因此改完后会实际跑一次推理验证；失败时请用 yolov5 的
+    `python export.py --weights best_1.pt --include onnx --imgsz SIZE` 重新导出。
+    """
+    import onnx
+    import onnxruntime as ort
+
+    model = onnx.load(src)
+    dims = model.graph.input[0].type.tensor_type.shape.dim
+    dims[2].dim_value = size
+    dims[3].dim_value = size
+    for out in model.graph.output:
+        for d in out.type.tensor_type.shape.dim:
+            d.dim_param = "?"  # 输出尺寸随输入变化，交给推理时确定
+    del model.graph.value_info[:]
+    onnx.save(model, dst)
+
+    try:
+        session = ort.InferenceSession(dst, providers=["CPUExecutionProvider"])
+        out = session.run(None, {session.get_inputs()[0].name: np.zeros((1, 3, size, size), np.float32)})
+    except Exception as e:
+        os.remove(dst)
+        raise RuntimeError(f"该模型无法直接修改输入尺寸，请用 yolov5 export.py --imgsz {size} 重新导出: {e}")
+    print(f"{size}x{size} 输入模型已保存: {dst}，输出形状 {out[0].shape}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成量化 / 小尺寸模型变体")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("dynamic", help="INT8 动态量化")
+    p.add_argument("src")
+    p.add_argument("dst")
+
+    p = sub.add_parser("static", help="INT8 静态量化")
+    p.add_argument("src")
+    p.add_argument("dst")
+    p.add_argument("--calib", required=True, help="标定用录像或图片目录")
+    p.add_argument("--n", type=int, default=100, help="标定帧数")
+
+    p = sub.add_parser("resize", help="修改输入尺寸")
+    p.add_argument("src")
+    p.add_argument("dst")
+    p.add_argument("--size", type=int, choices=[320, 416, 480, 512], required=True)
+
+    args = parser.parse_args()
+    if args.cmd == "dynamic":
+        quantize_dynamic(args.src, args.dst)
+    elif args.cmd == "static":
+        quantize_static(args.src, args.dst, args.calib, args.n)
+    else:
+        resize_input(args.src, args.dst, args.size)
+
+
+if __name__ == "__main__":
+    main()
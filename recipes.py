@@ -0,0 +1,114 @@
+"""抓取放置配方
+
+每类物体的抓取放置流程用声明式配方描述（安全高度、抓取高度、夹爪开合值、放置位置），
+启动时编译成关节空间模板：放置点和初始位置这些固定位姿的逆解只算一次并缓存，
+每次抓取只需对物体坐标求一次逆解即可得到整套运动指令。
+run_1.pick_and_place（自动清理）与 run_top 的单物品抓取共用同一套编译结果。
+"""
+import threading
+
+import kinematics
+from scheduler import HOME_POSE, SAFE_Z
+from tracing import span
+
+GRIPPER_OPEN = 0
+GRIPPER_CLOSED = 105
+
+# 配方中未给出的字段取默认值；drop 为放置位置 (x, y, z)，必须给出
+DEFAULT_RECIPE = {
+    "approach_z": SAFE_Z,  # 物体上方与放置点上方的安全高度
+    "grasp_z": 0,  # 抓取高度
+    "phi": 0,
+    "open": GRIPPER_OPEN,  # 夹爪张开时的舵机值
+    "close": GRIPPER_CLOSED,  # 夹爪闭合时的舵机值
+}
+
+# 放置位置以原 run_1.DROP_LOCATIONS（自动清理）为准。原 run_top 单物品抓取中的另一份已经不一致：
+# sharpener 为 (115, -80, 50)、paper 为 (-260, 180, 70)；自动清理是主要的抓取路径，这两处未采用。
+# 某张桌子需要不同的放置位置时在 cells.json 的 drop_locations 中覆盖
+RECIPES = {
+    "pen": {"drop": (115, -80, 50)},
+    "eraser": {"drop": (115, -80, 50)},
+    "sharpener": {"drop": (115, -90, 50)},
+    "paper": {"drop": (-260, 180, 50)},
+}
+
+# 模板步骤中的位姿：物体处（抓取时求解）、放置点、初始位置（编译时求解）
+OBJECT, DROP, HOME = "object", "drop", "home"
+
+
+def _solve(x, y, l1, l2):
+    """逆解 -> 发送给固件的整数角度，不可达时抛出 ValueError"""
+    with span("inverse_kinematics"):
+        theta1, theta2, valid = kinematics.select(kinematics.inverse_kinematics(x, y, l1, l2))
+    if not valid:
+        raise ValueError(f"({x}, {y}) 不可达或超出关节限位")
+    return int(theta1), int(theta2)
+
+
+class Template:
+    """一类物体编译后的关节空间模板"""
+
+    def __init__(self, name, recipe, l1=kinematics.L1, l2=kinematics.L2):
+        recipe = {**DEFAULT_RECIPE, **recipe}
+        if recipe.get("drop") is None:
+            raise ValueError(f"配方 {name} 缺少放置位置 drop")
+        self.name = name
+        self.l1, self.l2 = l1, l2
+        self.drop = tuple(recipe["drop"])
+        up, down, phi = recipe["approach_z"], recipe["grasp_z"], recipe["phi"]
+        opened, closed = recipe["open"], recipe["close"]
+        # (说明, 位姿, z, 夹爪, 运动段, 视野事件)，位姿为 None 的步骤只是停顿
+        self.steps = [
+            ("步骤1：已移动到物体上方", OBJECT, up, opened, "transit", None),
+            ("步骤2：夹爪已张开", OBJECT, up, opened, "grasp", None),
+            ("步骤3：已下降到抓取高度", OBJECT, down, opened, "approach", None),
+            ("步骤4：夹爪已闭合（抓取成功）", OBJECT, down, closed, "grasp", None),
+            ("步骤5：已提升到安全高度", OBJECT, up, closed, "lift", None),
+            ("步骤6：已到达过渡点", None, None, None, None, None),
+            # 放置位置在相机视野外，此时开始检测下一轮
+            ("步骤7：已到达放置位置上方", DROP, up, closed, "transit", True),
+            ("步骤8：已下降到放置高度", DROP, self.drop[2], closed, "place", None),
+            # 返回途中可能经过相机视野
+            ("步骤9：夹爪已张开（放置成功）", DROP, self.drop[2], opened, "place", False),
+            ("步骤10：已返回初始位置", HOME, HOME_POSE[2], opened, "transit", True),
+        ]
+        self.phi = phi
+        # 固定位姿的逆解只在编译时计算一次
+        self.joints = {DROP: _solve(*self.drop[:2], l1, l2), HOME: _solve(*HOME_POSE[:2], l1, l2)}
+
+    def moves(self, x, y, return_home=True):
+        """物体在 (x, y) 时的步骤 [(说明, 关节指令, 运动段, 视野事件), ...]
+
+        关节指令为 (theta1, theta2, phi, z, gripper)，停顿步骤为 None；只对物体坐标求一次逆解。
+        return_home=False 时放置后停在放置位置（在视野外），不返回初始位置。
+        """
+        joints = dict(self.joints)
+        joints[OBJECT] = _solve(x, y, self.l1, self.l2)
+        steps = self.steps if return_home else self.steps[:8] + [self.steps[8][:5] + (None,)]
+        return [(label, None if pose is None else (*joints[pose], self.phi, z, gripper), segment, clear)
+                for label, pose, z, gripper, segment, clear in steps]
+
+
+def compile_recipes(recipes=None, l1=kinematics.L1, l2=kinematics.L2):
+    """编译全部配方，放置点不可达时抛出 ValueError"""
+    recipes = RECIPES if recipes is None else recipes
+    return {name: Template(name, recipe, l1, l2) for name, recipe in recipes.items()}
+
+
+def drop_locations(templates):
+    """{类别: 放置位置}，供 scheduler.plan 使用"""
+    return {name: template.drop for name, template in templates.items()}
+
+
+_templates = None
+_templates_lock = threading.Lock()
+
+
+def get_recipes():
+    """进程内共享的编译结果（首次调用时按 RECIPES 编译）"""
+    global _templates
+    with _templates_lock:
+        if _templates is None:
+            _templates = compile_recipes(RECIPES)
+        return _templates
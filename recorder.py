@@ -0,0 +1,285 @@
+"""摄像头画面录制与回放，以及运行过程的飞行记录
+
+录制文件为追加写入的二进制日志：
+    文件头  b"SCRL" + 版本号(uint16)
+    记录    类型(uint8) + 时间戳(float64) + 长度(uint32) + 数据
+帧记录的数据为 JPEG 编码的图像。读取时整个文件内存映射，按偏移量建立索引。
+
+飞行记录（FLIGHT_RECORD 开启后由设备管理器启动，每个进程一个文件）在同一格式中追加：
+    检测结果  JSON {"frame": 对应的帧序号或 null, "result": [[类别, cx, cy, 置信度], ...]}
+    串口指令  指令编号、是否成功、9 个参数、占用时间与从提交到结束的时间，以及各路径点的到达时间
+    输入指令  JSON {"cmd", "keyword", "source"}，即串口、语音与空闲自动清理交给 handle_new_command 的指令
+replay.py 读取飞行记录，用记录中的检测结果和指令耗时代替摄像头和串口重新运行，得到可重复的基准测试。
+
+用法示例：
+    python recorder.py --source 0 --out desk.rec --n 300
+    python recorder.py --source desk.mp4 --out desk.rec
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import detect_new1
+
+MAGIC = b"SCRL"
+VERSION = 1
+HEADER = struct.Struct("<4sH")
+RECORD = struct.Struct("<BdI")  # 类型, 时间戳, 数据长度
+
+REC_FRAME = 1  # JPEG 帧
+REC_DETECTION = 2  # 检测结果
+REC_COMMAND = 3  # 一条串口指令及其完成时间
+REC_INPUT = 4  # 输入的指令（串口、语音、空闲自动清理）
+
+# 串口指令记录：指令编号, 是否成功, 9 个参数, 占用时间, 从提交到结束的时间, 进度条数；其后每条进度为 序号 + 时间
+COMMAND = struct.Struct("<BB9iddH")
+PROGRESS = struct.Struct("<Bf")
+
+FLIGHT_RECORD = False  # True 时设备管理器启动时开始飞行记录
+FLIGHT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "flights")  # 飞行记录文件目录
+FLIGHT_FRAMES = True  # 是否记录检测所用的画面（占用空间较大）
+FLIGHT_QUALITY = 80  # 记录画面的 JPEG 质量
+
+
+class RecordWriter:
+    """追加写入记录文件"""
+
+    def __init__(self, path):
+        self._f = open(path, "wb")
+        self._f.write(HEADER.pack(MAGIC, VERSION))
+        self.count = 0
+
+    def write(self, rec_type, payload, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        self._f.write(RECORD.pack(rec_type, timestamp, len(payload)))
+        self._f.write(payload)
+        self.count += 1
+
+    def write_frame(self, frame, quality=90, timestamp=None):
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise IOError("图像编码失败")
+        self.write(REC_FRAME, buf.tobytes(), timestamp)
+
+    def write_json(self, rec_type, obj, timestamp=None):
+        self.write(rec_type, json.dumps(obj, ensure_ascii=False).encode("utf-8"), timestamp)
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class RecordReader:
+    """内存映射读取记录文件，按类型建立偏移索引"""
+
+    def __init__(self, path):
+        self._f = open(path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version > VERSION:
+            raise ValueError(f"不是有效的记录文件: {path}")
+        self.index = {}  # 类型 -> [(时间戳, 偏移, 长度), ...]
+        pos = HEADER.size
+        while pos + RECORD.size <= len(self._mm):
+            rec_type, timestamp, length = RECORD.unpack_from(self._mm, pos)
+            pos += RECORD.size
+            if pos + length > len(self._mm):
+                break  # 录制中断导致的不完整记录
+            self.index.setdefault(rec_type, []).append((timestamp, pos, length))
+            pos += length
+
+    def records(self, rec_type):
+        """按顺序返回某类型的 (时间戳, 数据memoryview)"""
+        view = memoryview(self._mm)
+        for timestamp, offset, length in self.index.get(rec_type, []):
+            yield timestamp, view[offset:offset + length]
+
+    def frame_count(self):
+        return len(self.index.get(REC_FRAME, []))
+
+    def frame(self, i):
+        _, offset, length = self.index[REC_FRAME][i]
+        return cv2.imdecode(np.frombuffer(self._mm, np.uint8, length, offset), cv2.IMREAD_COLOR)
+
+    def frames(self):
+        for i in range(self.frame_count()):
+            yield self.frame(i)
+
+    def json_records(self, rec_type):
+        """按顺序返回某类型的 (时间戳, 解析后的 JSON)"""
+        for timestamp, data in self.records(rec_type):
+            yield timestamp, json.loads(bytes(data).decode("utf-8"))
+
+    def commands(self):
+        """按顺序返回串口指令记录 (时间戳, 指令编号, 是否成功, 参数, 占用时间, 总时间, [(序号, 时间), ...])"""
+        for timestamp, data in self.records(REC_COMMAND):
+            cmd_id, ok, *rest = COMMAND.unpack_from(data, 0)
+            params, service, latency, n = rest[:9], rest[9], rest[10], rest[11]
+            progress = [PROGRESS.unpack_from(data, COMMAND.size + i * PROGRESS.size) for i in range(n)]
+            yield timestamp, cmd_id, bool(ok), list(params), service, latency, progress
+
+    def close(self):
+        self._mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FlightRecorder:
+    """飞行记录：画面、检测结果、每条串口指令及其 DONE 时间、输入的指令，写入同一个追加式记录文件
+
+    各来源在不同线程中回调（检测线程、串口事件循环、指令接收与 HTTP 线程），写入时加锁，每条记录后落盘，
+    进程异常退出时也只丢失最后一条不完整的记录（读取时自动忽略）。
+    """
+
+    def __init__(self, path, frames=FLIGHT_FRAMES, quality=FLIGHT_QUALITY):
+        self.path = path
+        self.frames = frames
+        self.quality = quality
+        self._writer = RecordWriter(path)
+        self._lock = threading.Lock()
+        self._last_frame = None
+        self._frame_index = -1
+        self._last_done = 0.0  # 上一条串口指令结束的时间
+
+    def _write(self, method, *args):
+        """在锁内取写入器并写入一条记录；记录器关闭后直接忽略"""
+        with self._lock:
+            if self._writer is None:
+                return
+            getattr(self._writer, method)(*args)
+            self._writer.flush()
+
+    def detection(self, frame, result):
+        """记录一次检测；画面与上次相同（检测缓存命中）时不重复保存"""
+        with self._lock:
+            if self._writer is None:
+                return
+            if self.frames and frame is not None and frame is not self._last_frame:
+                self._writer.write_frame(frame, self.quality)
+                self._last_frame = frame
+                self._frame_index += 1
+            index = self._frame_index if self.frames and frame is not None else None
+            self._writer.write_json(REC_DETECTION, {"frame": index, "result": result})
+            self._writer.flush()
+
+    def command(self, cmd_id, params, ok, submitted, finished, progress):
+        """记录一条串口指令（scara_1.COMMAND_LISTENERS 回调）
+
+        占用时间从提交与上一条指令结束两者中较晚的时刻算起，窗口内连续发送的指令不会重复计算。
+        """
+        with self._lock:
+            start = max(submitted, self._last_done)
+            self._last_done = finished
+        params = (list(params) + [0] * 9)[:9]
+        data = COMMAND.pack(cmd_id, ok, *params, finished - start, finished - submitted, len(progress))
+        data += b"".join(PROGRESS.pack(i, t - start) for i, t in progress)
+        self._write("write", REC_COMMAND, data)
+
+    def input(self, cmd, keyword=None, source="uart"):
+        """记录一条输入的指令（原始内容，归一化之前）"""
+        self._write("write_json", REC_INPUT, {"cmd": cmd, "keyword": keyword, "source": source})
+
+    def wrap(self, detect):
+        """包装不经过 Detector 的检测函数（如模拟桌面），使其结果也被记录（没有画面）"""
+        def recorded():
+            result = detect()
+            self.detection(None, result)
+            return result
+        return recorded
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+_flight = None
+_flight_lock = threading.Lock()
+
+
+def start_flight_recorder(path=None, frames=FLIGHT_FRAMES):
+    """开始飞行记录（已开始时直接返回），注册检测与串口指令回调"""
+    global _flight
+    import scara_1
+    with _flight_lock:
+        if _flight is None:
+            if path is None:
+                os.makedirs(FLIGHT_DIR, exist_ok=True)
+                path = os.path.join(FLIGHT_DIR, f"flight-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.rec")
+            _flight = FlightRecorder(path, frames)
+            detect_new1.DETECTION_LISTENERS.append(_flight.detection)
+            scara_1.COMMAND_LISTENERS.append(_flight.command)
+            print(f"飞行记录写入 {path}")
+        return _flight
+
+
+def get_flight_recorder():
+    """正在进行的飞行记录，未开启时为 None"""
+    return _flight
+
+
+def stop_flight_recorder():
+    global _flight
+    import scara_1
+    with _flight_lock:
+        if _flight is not None:
+            detect_new1.DETECTION_LISTENERS.remove(_flight.detection)
+            scara_1.COMMAND_LISTENERS.remove(_flight.command)
+            _flight.close()
+            _flight = None
+
+
+def record(source, out, n=0, quality=90, interval=0.0):
+    """从摄像头或录像录制 n 帧（n=0 表示录到源结束或 Ctrl+C）"""
+    cap = detect_new1.open_capture(source)
+    try:
+        with RecordWriter(out) as writer:
+            while not n or writer.count < n:
+                ret, frame = cap.read()
+                if not ret or frame is None:
+                    break
+                writer.write_frame(frame, quality)
+                if interval:
+                    time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cap.release()
+    print(f"已录制 {writer.count} 帧到 {out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="录制摄像头画面")
+    parser.add_argument("--source", default=str(detect_new1.CAMERA_DEVICE), help="摄像头索引或录像文件")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--n", type=int, default=0, help="录制帧数（0 表示不限）")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG 质量")
+    parser.add_argument("--interval", type=float, default=0.0, help="两帧之间的间隔（秒）")
+    args = parser.parse_args()
+    source = int(args.source) if args.source.isdigit() else args.source
+    record(source, args.out, args.n, args.quality, args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""飞行记录回放
+
+用 recorder.FlightRecorder 记录的会话代替摄像头和串口，重新运行 run_1.run 或 run_top.DualSerialHandler：
+检测结果按记录顺序返回（给出模型时对记录的画面重新推理），每条串口指令按记录中的占用时间等待后返回
+记录的结果，输入的指令按记录的时间间隔重新交给 handle_new_command。上位机逻辑改变导致指令序列与记录不一致时，
+按指令编号向后查找对应的记录并统计为偏差，找不到时使用同类指令的中位耗时。
+慢的或失败的现场会话因此可以作为固定的基准测试反复运行。
+
+用法示例：
+    python replay.py flights/flight-20250101-120000-1234.rec --time-scale 0.1
+    python replay.py session.rec --weights best_1.onnx
+"""
+import argparse
+import statistics
+import threading
+import time
+from types import SimpleNamespace
+
+import serial
+
+import run_1
+import run_top
+from detect_new1 import Detector
+from recorder import REC_DETECTION, REC_INPUT, RecordReader
+from scara_1 import CMD_PING, CMD_PROGRAM_RUN, MOTION_CMDS, Cancelled, SCARAController
+
+LOOKAHEAD = 50  # 指令序列不一致时向后查找的记录条数
+
+
+class Session:
+    """读取一个飞行记录文件"""
+
+    def __init__(self, path, detector=None):
+        self.reader = RecordReader(path)
+        # 健康检查的空指令与运行逻辑无关，回放时不发送，也不参与匹配
+        self.commands = [c for c in self.reader.commands() if c[1] != CMD_PING]
+        self.detections = list(self.reader.json_records(REC_DETECTION))
+        self.inputs = list(self.reader.json_records(REC_INPUT))
+        timestamps = [ts for entries in self.reader.index.values() for ts, _, _ in entries]
+        self.start, self.end = min(timestamps, default=0.0), max(timestamps, default=0.0)
+        # 第一条输入之前的指令是连接时的回零，回放时没有对应的连接过程，从输入之后开始匹配
+        first_input = self.inputs[0][0] if self.inputs else self.start
+        self.skip = sum(1 for c in self.commands if c[0] < first_input)
+        self.detector = detector  # 给出时对记录的画面重新推理
+        self._next_detection = 0
+        self._lock = threading.Lock()
+
+    def detect(self):
+        """按记录顺序返回检测结果，用完后返回空结果（自动清理随之结束）"""
+        with self._lock:
+            if self._next_detection >= len(self.detections):
+                return []
+            _, record = self.detections[self._next_detection]
+            self._next_detection += 1
+        if self.detector and record["frame"] is not None:
+            return self.detector.infer(self.reader.frame(record["frame"]))
+        return record["result"]
+
+    def duration(self):
+        """记录的会话时长（秒）"""
+        return self.end - self.start
+
+    def close(self):
+        self.reader.close()
+
+
+class ReplayArm(SCARAController):
+    """不连接串口的机械臂：每条指令按记录中的占用时间等待，返回记录的结果"""
+
+    def __init__(self, session, time_scale=1.0):
+        self.L1 = 228.0
+        self.L2 = 156.5
+        self._init_state()
+        self.ser = None
+        self.debug_mode = False
+        self.session = session
+        self.time_scale = time_scale
+        self.position = session.skip  # 下一条待匹配的记录
+        self.sent = []  # 回放中发出的 (指令编号, 参数)，用于比较两次回放是否一致
+        self.divergences = 0  # 与记录不一致的指令数
+        self.busy = 0.0  # 按记录耗时累计的机械臂占用时间（秒）
+        self._medians = {}
+        for cmd_id in {c[1] for c in session.commands}:
+            self._medians[cmd_id] = statistics.median(c[4] for c in session.commands if c[1] == cmd_id)
+
+    def is_connected(self):
+        return True
+
+    def _match(self, cmd_id):
+        """取出与 cmd_id 对应的下一条记录 (是否成功, 占用时间, 进度)"""
+        commands = self.session.commands
+        for k in range(self.position, min(self.position + LOOKAHEAD, len(commands))):
+            _, recorded_id, ok, _, service, _, progress = commands[k]
+            if recorded_id == cmd_id:
+                self.divergences += k - self.position
+                self.position = k + 1
+                return ok, service, progress
+        self.divergences += 1
+        return True, self._medians.get(cmd_id, 0.0), []
+
+    def send_cmd(self, cmd_id, params=None, timeout=10):
+        if cmd_id in MOTION_CMDS:
+            self.checkpoint()
+        if cmd_id == CMD_PING:
+            return True
+        self.sent.append((cmd_id, (list(params or []) + [0] * 9)[:9]))
+        ok, service, _ = self._match(cmd_id)
+        self.busy += service
+        time.sleep(service * self.time_scale)
+        if ok and cmd_id in MOTION_CMDS:
+            self._notify_motion()
+        return ok
+
+    def send_cmds(self, cmds, timeout=10):
+        return all([self.send_cmd(cmd_id, params, timeout) for cmd_id, params in cmds])
+
+    def _run_program(self, speed, accel, on_progress, timeout):
+        self.sent.append((CMD_PROGRAM_RUN, [0, 0, 0, 0, 0, 0, speed, accel, 0]))
+        ok, service, progress = self._match(CMD_PROGRAM_RUN)
+        start = time.perf_counter()
+        for k, (i, offset) in enumerate(progress):
+            time.sleep(max(0.0, start + offset * self.time_scale - time.perf_counter()))
+            if on_progress:
+                on_progress(i)
+            if k < len(progress) - 1 and self.cancel_event is not None and self.cancel_event.is_set():
+                # 与固件相同，在路径点之间中止
+                self.busy += offset
+                self._notify_motion()
+                raise Cancelled()
+        time.sleep(max(0.0, start + service * self.time_scale - time.perf_counter()))
+        self.busy += service
+        if ok:
+            self._notify_motion()
+        return ok
+
+    def close(self):
+        pass
+
+
+class ReplayDevices:
+    """代替 devices.DeviceManager：只提供回放用的机械臂，没有指令串口"""
+
+    def __init__(self, arm):
+        self.lock = threading.RLock()
+        self._arm = arm
+        self.reconnects = 0
+
+    def arm(self):
+        return self._arm
+
+    def cmd_serial(self):
+        raise serial.SerialException("回放模式没有指令串口")
+
+    def start(self):
+        return self
+
+    def close(self):
+        pass
+
+
+def replay(path, time_scale=1.0, detector=None):
+    """回放一个飞行记录，返回统计信息
+
+    记录中有输入指令时按原来的时间间隔交给 DualSerialHandler（经调度器执行），否则直接运行一次 run_1.run。
+    """
+    session = Session(path, detector)
+    arm = ReplayArm(session, time_scale)
+    t0 = time.perf_counter()
+    try:
+        if session.inputs:
+            handler = run_top.DualSerialHandler(ReplayDevices(arm))
+            handler.detect = session.detect
+            for timestamp, record in session.inputs:
+                time.sleep(max(0.0, t0 + (timestamp - session.start) * time_scale - time.perf_counter()))
+                handler.handle_new_command(record["cmd"], keyword=record["keyword"], source=record["source"])
+            handler.dispatcher.wait_idle()
+            status = handler.dispatcher.status()
+            handler.dispatcher.stop()
+        else:
+            run_1.run(SimpleNamespace(current_command=None), arm=arm, detect=session.detect)
+            status = None
+        return {
+            "wall": time.perf_counter() - t0,
+            "busy": arm.busy,
+            "recorded": session.duration(),
+            "commands": arm.position - session.skip,
+            "recorded_commands": len(session.commands) - session.skip,
+            "divergences": arm.divergences + len(session.commands) - arm.position,
+            "sent": arm.sent,
+            "detections": session._next_detection,
+            "frames": session.reader.frame_count(),
+            "status": status,
+        }
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放飞行记录")
+    parser.add_argument("path", help="飞行记录文件")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="等待时间缩放（小于 1 时加速回放）")
+    parser.add_argument("--weights", help="给出时对记录的画面重新推理，代替记录的检测结果")
+    args = parser.parse_args()
+    detector = Detector(args.weights, source=None) if args.weights else None
+    stats = replay(args.path, args.time_scale, detector)
+    print(f"回放用时 {stats['wall']:.2f}s（缩放 {args.time_scale}），按记录耗时机械臂占用 {stats['busy']:.2f}s，"
+          f"原会话 {stats['recorded']:.2f}s")
+    print(f"串口指令 {stats['commands']}/{stats['recorded_commands']} 条，偏差 {stats['divergences']} 条，"
+          f"检测 {stats['detections']} 次（画面 {stats['frames']} 帧）")
+    if stats["status"]:
+        print(f"调度器状态: {stats['status']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,156 +1,343 @@
-from detect_new1 import detect_camera
-from scara_1 import SCARAController
-import time
-
-def return_to_home_position(arm):
-    """返回复位位置"""
-    try:
-        print("尝试返回复位位置...")
-        if not arm.move_position(x=0, y=0, z=100, phi=0, gripper=0):
-            print("返回复位位置失败，尝试二次移动")
-            arm.move_position(x=0, y=0, z=100, phi=0, gripper=0)
-        print("已回到复位位置")
-        return True
-    except Exception as e:
-        print(f"返回复位位置出错：{e}")
-        return False
-
-def pick_and_place(arm, obj_x, obj_y, drop_x, drop_y, drop_z=35):
-    """分步执行抓取-放置流程"""
-    try:
-        # 1. 移动到物体上方安全高度
-        if not arm.move_position(x=obj_x, y=obj_y, z=100):
-            return False
-        print("步骤1：已移动到物体上方")
-
-        # 2. 张开夹爪
-        if not arm.move_position(x=obj_x, y=obj_y, gripper=0):
-            return False
-        print("步骤2：夹爪已张开")
-
-        # 3. 下降到抓取位置
-        if not arm.move_position(x=obj_x, y=obj_y, z=0, gripper=0):
-            return False
-        print("步骤3：已下降到抓取高度")
-
-        # 4. 闭合夹爪（抓取）
-        if not arm.move_position(x=obj_x, y=obj_y, z=0, gripper=105):
-            return False
-        print("步骤4：夹爪已闭合（抓取成功）")
-
-        # 5. 提升到安全高度
-        if not arm.move_position(x=obj_x, y=obj_y, z=100, gripper=105):
-            return False
-        print("步骤5：已提升到安全高度")
-
-        # 6. 移动到过渡点
-        time.sleep(0.5)
-        print("步骤6：已到达过渡点")
-
-        # 7. 移动到放置位置上方
-        if not arm.move_position(x=drop_x, y=drop_y, z=100, gripper=105):
-            return False
-        print("步骤7：已到达放置位置上方")
-
-        # 8. 下降到放置高度
-        if not arm.move_position(x=drop_x, y=drop_y, z=drop_z, gripper=0):
-            return False
-        print("步骤8：已下降到放置高度")
-
-        # 9. 张开夹爪（释放）
-        if not arm.move_position(x=drop_x, y=drop_y, z=drop_z, gripper=0):
-            return False
-        print("步骤9：夹爪已张开（放置成功）")
-
-        # 10. 返回初始位置
-        if not arm.move_position(x=384.5, y=0, z=100):
-            return False
-        print("步骤10：已返回初始位置")
-        time.sleep(0.2)
-
-        return True
-    except Exception as e:
-        print(f"运动步骤出错：{e}")
-        return_to_home_position(arm)
-        return False
-
-def run(handler):
-    """自动清理主循环（不可被打断，连续3次无物体则退出）"""
-    arm = None
-    try:
-        arm = SCARAController("/dev/ttyACM0", 115200, debug_mode=True)
-        print("正在复位机械臂...")
-        if not arm.home(timeout=60):
-            print("复位失败，退出")
-            arm.close()
-            handler.current_command = None  # 清除指令标记
-            return
-        print("机械臂复位完成")
-
-        drop_locations = {
-            'eraser': (115, -80, 50),
-            'pen': (115, -80, 50),
-            'sharpener': (115, -90, 50),
-            'paper': (-260, 180, 50)
-        }
-
-        no_object_count = 0  # 连续无物体计数器
-        MAX_NO_OBJECT = 2   # 最大连续无物体次数
-
-        while True:
-            # 检查连续无物体次数
-            if no_object_count >= MAX_NO_OBJECT:
-                print(f"连续{MAX_NO_OBJECT}次未检测到物体，退出自动清理")
-                break
-
-            try:
-                data = detect_camera()
-                print(f"检测到 {len(data)} 个物体")
-
-                if not data:
-                    no_object_count += 1
-                    print(f"未检测到物体（{no_object_count}/{MAX_NO_OBJECT}）")
-                    time.sleep(1)  # 等待1秒后重试
-                    continue
-                else:
-                    no_object_count = 0  # 检测到物体，重置计数器
-
-                for obj in data:
-                    classes = obj[0]
-                    a, b = obj[1], obj[2]
-
-                    # 坐标转换
-                    a = int(0.357 * a - 104)
-                    b = int(374 - 0.357 * b)
-                    print(f"处理 {classes}，坐标: ({a}, {b})")
-
-                    if classes in drop_locations:
-                        drop_x, drop_y, drop_z = drop_locations[classes]
-                        if pick_and_place(arm, a, b, drop_x, drop_y, drop_z):
-                            print(f"{classes} 抓取放置完成")
-                        else:
-                            print(f"{classes} 抓取放置失败，尝试回到复位位置")
-                            return_to_home_position(arm)
-                            time.sleep(1)
-                            break
-                    else:
-                        print(f"未知物体: {classes}")
-
-                time.sleep(0.1)
-            except Exception as e:
-                print(f"主循环出错：{e}")
-                return_to_home_position(arm)
-                time.sleep(1)
-
-    except Exception as e:
-        print(f"初始化错误: {e}")
-    finally:
-        if arm and arm.is_connected():
-            arm.close()
-            print("连接关闭")
-        # 清除指令标记，允许新指令执行
-        handler.current_command = None
-        print("自动清理已退出")
-
-if __name__ == "__main__":
-    run(object())  # 保持单独运行能力
+from calib import pixel_to_robot
+from detect_new1 import cache_stats, detect_camera, inference_count, invalidate_cache
+from devices import get_devices
+from recipes import drop_locations, get_recipes
+from scara_1 import MOTION_LISTENERS, Cancelled
+from scheduler import HOME_POSE, plan
+from tracker import WorldModel
+from tracing import observe, span
+from workspace import get_workspace
+import threading
+import time
+
+PIPELINED = True  # True 时机械臂运动期间后台线程并行检测（流水线模式）
+TRACKING = True  # True 时跟踪物体并记录抓取状态，抓取失败后不必重新检测
+USE_PROGRAM = True  # True 时整套抓取放置动作作为一个程序一次上传执行
+SCHEDULE = True  # True 时按运动耗时规划抓取顺序，并在可以时跳过返回初始位置
+
+# 机械臂每次运动后让检测缓存失效
+if invalidate_cache not in MOTION_LISTENERS:
+    MOTION_LISTENERS.append(invalidate_cache)
+
+
+class PerceptionWorker(threading.Thread):
+    """后台感知线程：机械臂离开相机视野时检测，主循环抓取结束后直接取用最新结果
+
+    结果按场景版本号标记：每次机械臂进入视野（开始抓取）场景版本加一，
+    只有在当前版本下、机械臂不在视野内时拍摄的检测结果才有效。
+    程序模式下机械臂离开视野时整个程序还没有完成（运动完成回调尚未触发），
+    因此桌面改变后的第一次检测前由本线程让检测缓存失效，避免取到抓取前的缓存结果。
+    """
+
+    def __init__(self, detect=None):
+        super().__init__(daemon=True)
+        self._detect = detect or detect_camera
+        self._cond = threading.Condition()
+        self._clear = True  # 机械臂是否不在相机视野内
+        self._version = 0  # 场景版本号
+        self._moved = False  # 桌面改变后是否还没有让检测缓存失效
+        self._result = None
+        self._result_version = -1
+        self._error = None
+        self._running = True
+
+    def scene_changed(self):
+        """机械臂即将进入视野并改变桌面：之前的检测结果作废"""
+        with self._cond:
+            self._clear = False
+            self._version += 1
+            self._moved = True
+            self._cond.notify_all()
+
+    def refresh(self):
+        """桌面未变但需要重新检测（如未检测到物体后重试）"""
+        with self._cond:
+            self._version += 1
+            self._cond.notify_all()
+
+    def arm_clear(self, clear=True):
+        """标记机械臂是否已离开相机视野"""
+        with self._cond:
+            self._clear = clear
+            self._cond.notify_all()
+
+    def latest(self, timeout=30):
+        """等待并返回当前场景版本的检测结果"""
+        with self._cond:
+            if not self._cond.wait_for(
+                    lambda: self._result_version == self._version or self._error, timeout):
+                raise TimeoutError("等待检测结果超时")
+            if self._error:
+                error, self._error = self._error, None
+                raise error
+            return self._result
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def run(self):
+        while True:
+            with self._cond:
+                # 机械臂在视野外且当前版本还没有结果时才检测
+                self._cond.wait_for(lambda: not self._running or (
+                    self._clear and self._result_version != self._version))
+                if not self._running:
+                    return
+                version = self._version
+                moved, self._moved = self._moved, False
+            try:
+                if moved:
+                    # 之前进行中的检测已在本线程内完成并写入缓存，此时失效才不会被覆盖
+                    invalidate_cache()
+                result = self._detect()
+            except Exception as e:
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                time.sleep(0.5)
+                continue
+            with self._cond:
+                if version == self._version:
+                    self._result, self._result_version = result, version
+                    self._cond.notify_all()
+
+def return_to_home_position(arm):
+    """返回复位位置"""
+    try:
+        print("尝试返回复位位置...")
+        if not arm.move_position(x=0, y=0, z=100, phi=0, gripper=0):
+            print("返回复位位置失败，尝试二次移动")
+            arm.move_position(x=0, y=0, z=100, phi=0, gripper=0)
+        print("已回到复位位置")
+        return True
+    except Exception as e:
+        print(f"返回复位位置出错：{e}")
+        return False
+
+def format_segment_times(times, since=None):
+    """各运动段耗时，since 为之前的统计（只显示差值）"""
+    since = since or {}
+    return "，".join(f"{name} {seconds - since.get(name, 0.0):.2f}s" for name, seconds in times.items()
+                    if seconds > since.get(name, 0.0)) or "无"
+
+
+def pick_and_place(arm, obj_x, obj_y, recipe, perception=None, use_program=USE_PROGRAM, return_home=True):
+    """执行抓取-放置流程
+
+    recipe 为物体类别或 recipes.Template：按编译好的关节空间模板生成各步指令，只对物体坐标求一次逆解。
+    use_program=True 时整套动作作为一个程序上传，一条指令启动，固件逐点回报进度；
+    否则逐条发送运动指令并等待每一步完成。两种方式都会先去掉无效运动、合并只改变夹爪的步骤。
+    传入 perception（PerceptionWorker）时，会在机械臂离开相机视野期间通知其后台检测。
+    return_home=False 时放置后不返回初始位置，直接接着抓下一个物体。
+    """
+    template = get_recipes()[recipe] if isinstance(recipe, str) else recipe
+    last = [time.perf_counter()]
+
+    def reached(step):
+        label, *_, clear = step
+        print(label)
+        # 各步骤耗时按到达的间隔统计（程序模式下在串口线程中回调）
+        now = time.perf_counter()
+        observe("pick_step", now - last[0], step=label.split("：")[0])
+        last[0] = now
+        if perception and clear is not None:
+            perception.arm_clear(clear)
+
+    saved = arm.saved_round_trips
+    segment_times = dict(arm.segment_times)
+    try:
+        with span("pick_and_place", mode="program" if use_program else "per-move"):
+            steps = template.moves(obj_x, obj_y, return_home)
+            if perception:
+                perception.scene_changed()
+
+            if use_program:
+                moves = [step for step in steps if step[1] is not None]
+                if not arm.execute_joint_program([step[1] for step in moves], segments=[step[2] for step in moves],
+                                                 on_progress=lambda i: reached(moves[i])):
+                    return False
+            else:
+                # 以停顿步骤分段，每段优化后逐条执行
+                segment = []
+                for step in steps + [None]:
+                    if step is not None and step[1] is not None:
+                        segment.append(step)
+                        continue
+                    if segment and not arm.execute_joint_moves(
+                            [s[1] for s in segment], segments=[s[2] for s in segment],
+                            on_progress=lambda i, seg=segment: reached(seg[i])):
+                        return False
+                    segment = []
+                    if step is not None:
+                        time.sleep(0.5)
+                        reached(step)
+                time.sleep(0.2)
+
+            if arm.saved_round_trips > saved:
+                print(f"运动优化省去 {arm.saved_round_trips - saved} 条指令")
+            print(f"各运动段耗时: {format_segment_times(arm.segment_times, segment_times)}")
+            return True
+    except Cancelled:
+        raise
+    except Exception as e:
+        print(f"运动步骤出错：{e}")
+        return_to_home_position(arm)
+        return False
+
+def run(handler, pipelined=PIPELINED, arm=None, detect=None, tracking=TRACKING, schedule=SCHEDULE):
+    """自动清理主循环（不可被打断，连续3次无物体则退出）
+
+    pipelined=True 时每次只抓取一个物体，下一轮直接使用机械臂在视野外时后台检测的结果。
+    tracking=True 时用 WorldModel 跟踪物体：抓取失败后继续处理其他物体，已放置、
+    已放弃或无放置位置的物体不再重复规划。返回本次清理的完整推理次数
+    （使用共享检测器时不含场景门控命中的缓存结果，外部传入的检测函数每次调用算一次）。
+    schedule=True 时用 scheduler.plan 按运动耗时排列抓取顺序，还有物体要抓时放置后不返回初始位置。
+    arm / detect 可传入外部的机械臂与检测函数（默认使用设备管理器共享的机械臂与 detect_camera）。
+    """
+    shared = detect is None  # 共享检测器：按其推理计数统计，缓存命中不算
+    detect = detect or detect_camera
+    worker = None
+    world = WorldModel() if tracking else None
+    workspace = get_workspace()
+    inferences = 0
+    start_count = inference_count()
+    try:
+        if arm is None:
+            arm = get_devices().arm()
+            if arm is None:
+                print("机械臂未连接，退出")
+                return inferences
+        print("正在复位机械臂...")
+        if not arm.home(timeout=60):
+            print("复位失败，退出")
+            return inferences
+        print("机械臂复位完成")
+
+        if pipelined:
+            worker = PerceptionWorker(detect)
+            worker.start()
+
+        templates = get_recipes()  # 各类物体编译好的抓取放置模板
+
+        no_object_count = 0  # 连续无物体计数器
+        MAX_NO_OBJECT = 2   # 最大连续无物体次数
+        pose = HOME_POSE  # 机械臂当前所在位置（放置后未返回初始位置时为放置点）
+
+        while True:
+            arm.checkpoint()  # 被更高优先级的指令取消时在此退出
+            # 检查连续无物体次数
+            if no_object_count >= MAX_NO_OBJECT:
+                print(f"连续{MAX_NO_OBJECT}次未检测到物体，退出自动清理")
+                if pose != HOME_POSE:
+                    arm.move_position(*HOME_POSE)  # 停在放置点时返回初始位置
+                break
+
+            try:
+                data = worker.latest() if worker else detect()
+                if not shared:
+                    inferences += 1
+                print(f"检测到 {len(data)} 个物体")
+
+                if world:
+                    world.update(data)
+                    targets = [(t.cls, t.cx, t.cy, t) for t in world.pending()]
+                    print(f"其中待抓取 {len(targets)} 个")
+                else:
+                    targets = [(obj[0], obj[1], obj[2], None) for obj in data]
+
+                if not targets:
+                    no_object_count += 1
+                    print(f"未检测到待抓取物体（{no_object_count}/{MAX_NO_OBJECT}）")
+                    time.sleep(1)  # 等待1秒后重试
+                    if worker:
+                        worker.refresh()
+                    continue
+                else:
+                    no_object_count = 0  # 检测到物体，重置计数器
+
+                picks = []
+                for classes, a, b, track in targets:
+                    # 坐标转换（标定查找表）
+                    a, b = pixel_to_robot(a, b)
+                    if classes not in templates:
+                        print(f"未知物体: {classes}")
+                        if world:
+                            world.mark_ignored(track)
+                        continue
+                    # 发送指令前查表检查可达性，略超出时吸附到最近的可抓取点
+                    snapped = workspace.snap(a, b)
+                    if snapped is None:
+                        print(f"{classes} ({a}, {b}) 超出工作空间，跳过")
+                        if world:
+                            world.mark_ignored(track)
+                        continue
+                    if snapped != (a, b):
+                        print(f"{classes} ({a}, {b}) 略超出工作空间，吸附到 {snapped}")
+                        a, b = snapped
+                    picks.append((classes, a, b, track))
+                if schedule:
+                    picks = plan(picks, drop_locations(templates), start=pose, pipelined=worker is not None)
+                else:
+                    picks = [(pick, True) for pick in picks]
+
+                for (classes, a, b, track), return_home in picks:
+                    print(f"处理 {classes}，坐标: ({a}, {b})")
+                    if pick_and_place(arm, a, b, templates[classes], perception=worker, return_home=return_home):
+                        print(f"{classes} 抓取放置完成")
+                        pose = HOME_POSE if return_home else templates[classes].drop
+                        if world:
+                            world.mark_done(track)
+                        if worker:
+                            break  # 流水线模式：直接取用机械臂在视野外时的新检测结果
+                    else:
+                        print(f"{classes} 抓取放置失败，尝试回到复位位置")
+                        return_to_home_position(arm)
+                        pose = HOME_POSE
+                        time.sleep(1)
+                        if world:
+                            # 其他物体的位置记录仍然有效，继续处理，不必重新检测
+                            world.mark_failed(track)
+                            continue
+                        break
+                else:
+                    if worker:
+                        worker.refresh()  # 本轮结果中没有可抓取物体，重新检测
+
+                time.sleep(0.1)
+            except Cancelled:
+                raise
+            except Exception as e:
+                print(f"主循环出错：{e}")
+                return_to_home_position(arm)
+                time.sleep(1)
+            finally:
+                if worker:
+                    worker.arm_clear()
+
+    except Cancelled:
+        print("自动清理被取消")
+        raise
+    except Exception as e:
+        print(f"初始化错误: {e}")
+    finally:
+        if worker:
+            worker.stop()
+        if shared:
+            inferences = inference_count() - start_count
+        print(f"本次清理共检测 {inferences} 次" + (f"，物体状态: {world.summary()}" if world else ""))
+        if arm:
+            print(f"各运动段累计耗时: {format_segment_times(arm.segment_times)}")
+        if cache_stats():
+            print(f"检测缓存统计: {cache_stats()}")
+        # 清除指令标记，允许新指令执行
+        handler.current_command = None
+        print("自动清理已退出")
+    return inferences
+
+if __name__ == "__main__":
+    try:
+        run(object())  # 保持单独运行能力
+    finally:
+        get_devices().close()
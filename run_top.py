@@ -1,16 +1,28 @@
+import json
 import serial
+import threading
 import time
+import tracing
+from calib import pixel_to_robot
+from devices import get_devices
+from dispatcher import Dispatcher
 from detect_new1 import detect_camera
-from run_1 import run, return_to_home_position
-from scara_1 import SCARAController
+from recorder import get_flight_recorder
+from run_1 import format_segment_times, pick_and_place, run, return_to_home_position
+from scara_1 import Cancelled
+from workspace import get_workspace
+
+# 指令优先级（数值小的优先），复位可抢占正在执行的指令
+COMMAND_PRIORITY = {'a': 0, 'c': 1, 'd': 1, 'e': 1, 'f': 1, 'b': 2}
+PREEMPTING = {'a'}
+VALID_COMMANDS = ['a', 'b', 'c', 'd', 'e', 'f', 's']  # s 为查询状态
+TRACE_DUMP_ON_ERROR = True  # 指令出错时把最近的计时记录写入 tracing.TRACE_DUMP_DIR
 
 
 class DualSerialHandler:
-    def __init__(self):
-        # 串口配置 按照自己的串口来设置
-        self.arm_serial_port = "/dev/ttyCH341USB0"
-        self.cmd_serial_port = "/dev/ttyCH341USB1"
-        self.baudrate = 115200
+    def __init__(self, devices=None):
+        # 串口由进程内共享的设备管理器持有（端口配置见 devices.py）
+        self.devices = devices or get_devices()
 
         # 状态管理
         self.arm = None
@@ -19,37 +31,31 @@ class DualSerialHandler:
         self.last_command_time = time.time()
         self.COMMAND_TIMEOUT = 180  # 超时时间（秒）
         self.current_command = None  # 当前执行的指令（仅用于状态标记）
-        self.allow_interrupt = False  # 全局中断允许标志（始终为False）
+        self.detect = detect_camera  # 检测函数（可替换为录像或模拟桌面）
+        self.allow_interrupt = True  # 是否允许复位在安全点打断正在执行的指令
+        self.dispatcher = Dispatcher(self.execute_command, COMMAND_PRIORITY, PREEMPTING, self.allow_interrupt)
 
     def connect_arm(self):
-        """连接机械臂"""
-        if self.arm and self.arm.is_connected():
-            return True
+        """获取共享的机械臂句柄（设备管理器负责连接与重连）"""
         try:
-            self.arm = SCARAController(
-                port=self.arm_serial_port,
-                baudrate=self.baudrate,
-                debug_mode=True
-            )
-            print(f"机械臂已连接到 {self.arm_serial_port}")
-            return True
+            self.arm = self.devices.arm()
         except Exception as e:
             print(f"机械臂连接失败: {e}")
             self.arm = None
-            return False
+        return self.arm is not None
 
     def start_run_loop(self):
-        """启动run循环（不可被打断）"""
+        """启动run循环（可被复位在两次运动之间打断）"""
         self.running = True
-        print("启动run循环（不可被打断）")
-        run(self)  # 传入自身实例用于状态检查
+        print("启动run循环")
+        run(self, arm=self.arm, detect=self.detect)  # 传入自身实例用于状态检查，并共用同一个机械臂句柄
 
     def pick_specific_object(self, target):
-        """抓取指定物体（不可被打断）"""
+        """抓取指定物体（可被复位在安全点打断）"""
         print(f"开始抓取 {target}...")
         try:
             # 步骤1：获取检测结果
-            detection_result = detect_camera()
+            detection_result = self.detect()
             if not detection_result:
                 print(f"未检测到任何物体，无法抓取{target}")
                 return False
@@ -62,80 +68,35 @@ class DualSerialHandler:
 
             # 步骤3：坐标转换
             _, obj_x, obj_y, _ = target_info
-            converted_x = int(0.357 * obj_x - 104)
-            converted_y = int(374 - 0.357 * obj_y)
+            converted_x, converted_y = pixel_to_robot(obj_x, obj_y)
             print(f"{target}坐标转换后: ({converted_x}, {converted_y})")
-
-            # 步骤4：执行抓取放置（全程不检查中断）
-            drop_locations = {
-                'pen': (115, -80, 50),
-                'eraser': (115, -80, 50),
-                'sharpener': (115, -80, 50),
-                'paper': (-260, 180, 70)
-            }
-            drop_x, drop_y, drop_z = drop_locations[target]
-
-            # 移动到物体上方
-            if not self.arm.move_position(x=converted_x, y=converted_y, z=100):
-                return False
-            print("步骤1：已移动到物体上方")
-
-            # 张开夹爪
-            if not self.arm.move_position(x=converted_x, y=converted_y, z=100,gripper=0):
+            snapped = get_workspace().snap(converted_x, converted_y)
+            if snapped is None:
+                print(f"{target}超出工作空间，无法抓取")
                 return False
-            print("步骤2：夹爪已张开")
+            converted_x, converted_y = snapped
 
-            # 下降到抓取高度
-            if not self.arm.move_position(x=converted_x, y=converted_y, z=0,gripper=0):
+            # 步骤4：按编译好的配方模板执行抓取放置（与自动清理共用同一套配方）
+            if not pick_and_place(self.arm, converted_x, converted_y, target):
                 return False
-            print("步骤3：已下降到抓取高度")
-
-            # 闭合夹爪
-            if not self.arm.move_position(x=converted_x, y=converted_y, z=0,gripper=105):
-                return False
-            print("步骤4：夹爪已闭合（抓取成功）")
-
-            # 提升到安全高度
-            if not self.arm.move_position(x=converted_x, y=converted_y, z=100,gripper=105):
-                return False
-            print("步骤5：已提升到安全高度")
-
-            # 移动到放置位置上方
-            if not self.arm.move_position(x=drop_x, y=drop_y,z=100,gripper=105):
-                return False
-            print("步骤6：已到达放置位置上方")
-
-            # 下降到放置高度
-            if not self.arm.move_position(x=drop_x, y=drop_y,z=drop_z):
-                return False
-            print("步骤7：已下降到放置高度")
-
-            # 张开夹爪释放
-            if not self.arm.move_position(x=drop_x, y=drop_y,z=drop_z,gripper=0):
-                return False
-            print("步骤8：夹爪已张开（放置成功）")
-
-            # 返回初始位置
-            if not self.arm.move_position(x=384.5, y=0, z=100):
-                return False
-            print("步骤9：已返回初始位置")
 
             print(f"{target}抓取放置完成")
+            print(f"各运动段累计耗时: {format_segment_times(self.arm.segment_times)}")
             return True
 
+        except Cancelled:
+            raise
         except Exception as e:
             print(f"抓取{target}出错: {e}")
             return_to_home_position(self.arm)
             return False
 
-    def handle_new_command(self, cmd,keyword=None):
-        """处理新指令（仅在当前无操作时执行）"""
+    def handle_new_command(self, cmd, keyword=None, source="uart"):
+        """处理新指令：状态查询立即回答，其余指令放入调度队列后立即返回 Job（无效或重复时返回 None）"""
+        flight = get_flight_recorder()
+        if flight:
+            flight.input(cmd, keyword, source)  # 记录原始输入，回放时按同样的时间重新交给本函数
         cmd = cmd.strip().lower()if cmd else '111'
-        # 若当前有正在执行的指令（除None外），则忽略新指令
-        if self.current_command is not None:
-            print(f"\n当前有正在执行的指令{self.current_command}，忽略新指令: {cmd}")
-            return
-
 
         # 多输入归一化
         if keyword is not None:
@@ -151,34 +112,65 @@ class DualSerialHandler:
                 cmd = "e"
             elif "纸" in keyword or cmd == "f":
                 cmd = "f"
+            elif "状态" in keyword or cmd == "s":
+                cmd = "s"
         if cmd == '111':
             print(f"默认无效指令: {cmd}，不执行任何操作")
-            return
+            return None
+        if cmd == 's':
+            status = self.status()
+            print(f"当前状态: {status}")
+            return None
+        if cmd not in COMMAND_PRIORITY:
+            print(f"无效指令: {cmd}，请发送a-f")
+            return None
 
-        print(f"\n收到新指令: {cmd}，开始执行...")
         self.last_command_time = time.time()
-        self.current_command = cmd  # 标记当前指令，防止被打断
+        job = self.dispatcher.submit(cmd, source)
+        if job is None:
+            print(f"\n指令 {cmd} 已在队列中或正在执行，忽略")
+        else:
+            print(f"\n收到新指令: {cmd}，已加入队列")
+        return job
+
+    def status(self):
+        """调度器与机械臂状态，执行指令期间也可随时查询"""
+        status = self.dispatcher.status()
+        status["arm"] = bool(self.arm and self.arm.is_connected())
+        return status
+
+    def execute_command(self, job):
+        """在调度器的执行线程中执行一条指令；被抢占时在下一个安全点退出"""
+        # 每条指令为一条 trace，其中的检测、逆解、串口指令与抓取步骤都记在它下面
+        with tracing.span("command", cmd=job.cmd, source=job.source) as span:
+            span.note(latency=round(job.latency, 6))
+            ok = self._execute_command(job)
+        if not ok and TRACE_DUMP_ON_ERROR:
+            print(f"最近的计时记录已保存到 {tracing.dump()}")
+
+    def _execute_command(self, job):
+        """执行指令，出错时返回 False"""
+        cmd = job.cmd
+        print(f"\n开始执行指令: {cmd}（等待 {job.latency * 1000:.0f}ms）")
+        self.current_command = cmd  # 标记当前指令
 
         # 确保机械臂连接
-        if cmd in ['b', 'c', 'd', 'e', 'f'] and not self.connect_arm():
+        if not self.connect_arm():
             print("机械臂未连接，无法执行指令")
             self.current_command = None
-            return
+            return False
 
-        # 执行指令（全程不被打断）
+        # 执行指令（期间设备管理器不做健康检查）
+        self.devices.lock.acquire()
+        self.arm.cancel_event = job.cancel_event
         try:
             if cmd == 'a':
                 # 复位机械臂
                 print("执行复位指令...")
-                if self.arm:
-                    if self.arm.home(timeout=60):
-                        print("机械臂复位完成")
-                    else:
-                        print("复位失败")
+                if self.arm.home(timeout=60):
+                    print("机械臂复位完成")
                 else:
-                    print("尝试连接机械臂并复位...")
-                    if self.connect_arm():
-                        self.arm.home(timeout=60)
+                    print("复位失败")
 
             elif cmd == 'b':
                 # 启动自动清理
@@ -201,61 +193,66 @@ class DualSerialHandler:
                 # 抓取paper
                 self.pick_specific_object("paper")
 
-            else:
-                print(f"无效指令: {cmd}，请发送a-f")
-
+        except Cancelled:
+            print(f"指令{cmd}已在安全点取消")
         except Exception as e:
             print(f"执行指令{cmd}出错: {e}")
             return_to_home_position(self.arm)
+            return False
         finally:
+            self.arm.cancel_event = None
+            self.devices.lock.release()
             self.current_command = None  # 指令执行完毕，清除标记
+        return True
+
+    def _read_commands(self):
+        """指令接收线程：阻塞读取串口，收到指令立即入队，状态查询直接回复"""
+        while True:
+            try:
+                line = self.cmd_serial.readline()
+            except (serial.SerialException, TypeError) as e:
+                if not self.cmd_serial.is_open:
+                    return  # 串口已关闭（进程退出）
+                print(f"指令串口读取出错: {e}")
+                time.sleep(1)
+                continue
+            cmd1 = line.decode('utf-8', errors='ignore').strip()
+            if not cmd1:
+                continue
+            if len(cmd1) == 1 and cmd1 in VALID_COMMANDS:
+                if cmd1 == 's':
+                    self.cmd_serial.write((json.dumps(self.status()) + "\n").encode())
+                else:
+                    self.handle_new_command(cmd=cmd1)
+            else:
+                print(f"无效指令格式: {cmd1}，请发送单个字符(a-f，s 为查询状态)")
 
     def start(self):
-        """启动主程序"""
+        """启动主程序：接收线程读取指令，调度器执行，主线程只负责空闲超时自动清理"""
         try:
-            self.cmd_serial = serial.Serial(
-                port=self.cmd_serial_port,
-                baudrate=self.baudrate,
-                timeout=0.1,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                bytesize=serial.EIGHTBITS
-            )
-            print(f"指令接收串口已连接到 {self.cmd_serial_port}")
+            self.cmd_serial = self.devices.cmd_serial()
+            self.dispatcher.start()
+            threading.Thread(target=self._read_commands, daemon=True).start()
             print(f"无指令{self.COMMAND_TIMEOUT}秒后将自动启动清理...")
 
             while True:
-                # 超时检查（自动启动清理）
+                # 超时检查（自动启动清理），仅当当前无操作时才启动
                 idle_time = time.time() - self.last_command_time
-                if idle_time >= self.COMMAND_TIMEOUT:
-                    # 仅当当前无操作时才启动超时清理
-                    if self.current_command is None:
-                        print(f"已超过{self.COMMAND_TIMEOUT}秒无指令，自动启动清理...")
-                        self.handle_new_command(cmd='b')  # 触发自动清理
-
-                # 检查指令接收
-                if self.cmd_serial.in_waiting > 0:
-                    cmd1 = self.cmd_serial.readline().decode('utf-8', errors='ignore').strip()
-                    if len(cmd1) == 1 and cmd1 in ['a', 'b', 'c', 'd', 'e', 'f']:
-                        self.handle_new_command(cmd=cmd1)
-                    else:
-                        print(f"无效指令格式: {cmd1}，请发送单个字符(a-f)")
-
-                time.sleep(0.05)
+                if idle_time >= self.COMMAND_TIMEOUT and self.dispatcher.idle():
+                    print(f"已超过{self.COMMAND_TIMEOUT}秒无指令，自动启动清理...")
+                    self.handle_new_command(cmd='b', source="idle")  # 触发自动清理
+                time.sleep(0.5)
 
         except serial.SerialException as e:
             print(f"串口错误: {e}")
         except KeyboardInterrupt:
             print("\n用户中断程序")
-        finally:
-            if self.cmd_serial and self.cmd_serial.is_open:
-                self.cmd_serial.close()
-                print("指令接收串口已关闭")
-            if self.arm and self.arm.is_connected():
-                self.arm.close()
-                print("机械臂连接已关闭")
+        # 串口由设备管理器持有，在进程退出时统一关闭
 
 
 if __name__ == "__main__":
-    handler = DualSerialHandler()
-    handler.start()
+    devices = get_devices().start()
+    try:
+        DualSerialHandler(devices).start()
+    finally:
+        devices.close()
@@ -1,98 +1,759 @@
-import serial
-import math
-import time
-
-
-class SCARAController:
-    def __init__(self, port, baudrate=115200, debug_mode=False):
-        self.L1 = 228.0  # 大臂长度
-        self.L2 = 156.5
-        # 当前状态（用于单步运动的默认值）
-        self.current_theta1 = 0
-        self.current_theta2 = 0
-        self.current_phi = 0
-        self.current_z = 100
-        self.current_gripper = 0
-
-        # 串口初始化
-        self.ser = None
-        self.debug_mode = debug_mode
-        try:
-            self.ser = serial.Serial(port, baudrate, timeout=0.1)
-            time.sleep(2)
-            self.ser.reset_input_buffer()
-            print(f"已连接到 {port}")
-        except Exception as e:
-            print(f"连接失败: {e}")
-            self.ser = None
-
-    def _read_serial(self):
-        """读取串口数据并返回"""
-        if self.ser.in_waiting:
-            return self.ser.readline().decode('ASCII', errors='replace').strip()
-        return ""
-
-    def is_connected(self):
-        return self.ser and self.ser.is_open
-
-    def send_cmd(self, cmd_id, params=None, timeout=10):
-        if not self.is_connected():
-            print("未连接到设备")
-            return False
-
-        params = [int(p) if p is not None else 0 for p in (params or [])]
-        cmd = [cmd_id] + params + [0] * (9 - len(params))
-        cmd_str = ",".join(map(str, cmd))
-
-        print(f"发送的数据: {cmd}")
-
-        # 发送前清空接收缓冲区，避免残留数据干扰
-        self.ser.reset_input_buffer()
-
-        # 发送指令
-        self.ser.write((cmd_str + "\n").encode('ASCII'))
-
-        while True:
-            line = self.ser.readline().decode().strip()
-            if line == "DONE":
-                print(f"{line}")
-                return True
-
-    def home(self, speed=5000, accel=3000, max_retries=5, timeout=60):
-        return self.send_cmd(1, [0, 0, 0, 0, 0, 0, speed, accel], timeout=timeout)
-
-    def move_joints(self, theta1, theta2, phi, z, gripper, speed=5000, accel=3000, max_retries=5):
-        params = [0, int(theta1), int(theta2), int(phi), int(z), int(gripper), int(speed), int(accel)]
-        return self.send_cmd(2, params, timeout=30)
-
-    def inverse_kinematics(self, x, y):
-        """计算逆运动学（返回整数角度）"""
-        x, y = int(x), int(y)  # 确保输入为整数
-        r = math.hypot(x, y)
-        # 检查工作范围
-        if not (abs(int(self.L1) - int(self.L2)) <= r <= int(self.L1) + int(self.L2)):
-            raise ValueError(f"目标点超出范围 (r={int(r)})")
-
-        # 计算角度（肘部向下）
-        cos_theta2 = (r ** 2 - self.L1 ** 2 - self.L2 ** 2) / (2 * self.L1 * self.L2)
-        cos_theta2 = max(min(cos_theta2, 1), -1)  # 限制范围
-        theta2 = math.acos(cos_theta2)
-        theta1 = math.atan2(y, x) - math.atan2(self.L2 * math.sin(theta2), self.L1 + self.L2 * cos_theta2)
-
-        return math.degrees(theta1), math.degrees(theta2)
-
-    def move_position(self, x, y, z=None, phi=None, gripper=None, speed=5000, accel=3000):
-        """通过笛卡尔坐标运动（内部转换为关节角度）"""
-        z = z if z is not None else self.current_z
-        phi = phi if phi is not None else self.current_phi
-        gripper = gripper if gripper is not None else self.current_gripper
-
-        # 逆运动学计算（转换x,y到theta1,theta2）
-        theta1, theta2 = self.inverse_kinematics(x, y)
-        return self.move_joints(theta1, theta2, phi, z, gripper, speed, accel)
-
-    def close(self):
-        """关闭连接"""
-        if self.is_connected():
-            self.ser.close()
+import asyncio
+import binascii
+import collections
+import concurrent.futures
+import struct
+import threading
+import time
+
+import numpy as np
+import serial
+
+import kinematics
+from tracing import observe, span
+
+# 机械臂运动完成后的回调（如让检测缓存失效），由上层模块注册
+MOTION_LISTENERS = []
+# 每条指令结束（DONE、超时或失败）时在串口事件循环线程中回调（如飞行记录），
+# listener(cmd_id, params, ok, submitted, finished, progress)，时间为 perf_counter，progress 为 [(i, 时间), ...]
+COMMAND_LISTENERS = []
+
+# 指令编号（与 v0_1.ino 对应）
+CMD_PING = 0  # 空指令：固件不做任何动作直接回复完成，用于检查连接
+CMD_HOME = 1
+CMD_MOVE = 2
+CMD_PROGRAM_ADD = 3  # 追加一个路径点到固件程序缓冲区
+CMD_PROGRAM_CLEAR = 4  # 清空程序缓冲区
+CMD_PROGRAM_RUN = 5  # 依次执行缓冲区中的路径点，每到达一个路径点回复 "WP i"，收到 PROGRAM_ABORT 时回复 "ABORT i" 并停止
+MOTION_CMDS = (CMD_HOME, CMD_MOVE, CMD_PROGRAM_RUN)
+PROGRAM_CAPACITY = 100  # 固件中 theta1Array 等数组的长度
+STEPS_PER_UNIT = (44.444444, 35.555555, 10, 100)  # 固件 theta1AngleToSteps, theta2AngleToSteps, phi, z（步/度、步/毫米）
+MAX_SPEED = 4000  # 固件 setup() 中 setMaxSpeed(4000)，applyProfile() 设置的最高速度也不超过它
+OPTIMIZE_MOVES = True  # 跳过与当前指令状态相同的运动，并把只改变夹爪的运动合并到前一条运动中
+
+# 各类运动段的 (最高速度 步/秒, 加速度 步/秒²)。固件最高速度不超过 4000，
+# 程序模式下路径点以 100 为单位保存，取值应为 100 的整数倍
+MOTION_PROFILES = {
+    "transit": (4000, 6000),  # 安全高度上的转移，加速度加大
+    "approach": (3000, 3000),  # 下降到抓取高度，降低最高速度以免碰偏物体
+    "grasp": (4000, 3000),  # 原地开合夹爪
+    "lift": (4000, 3000),  # 夹着物体提升，与原默认值相同
+    "place": (3000, 3000),  # 下降到放置高度并松开
+}
+
+# 串口协议：binary 为带序号和 CRC 的二进制帧，ascii 为原来的逗号分隔文本（旧固件使用）
+PROTO_ASCII = "ascii"
+PROTO_BINARY = "binary"
+PROTOCOL = PROTO_BINARY
+
+# 二进制帧（与 v0_1.ino 对应）：
+#   A5 5A | 版本(u8) | 类型(u8) | 序号(u8) | 长度(u8) | 数据 | CRC16(u16 小端)
+# CRC 为 CRC-16/CCITT-FALSE，覆盖版本到数据末尾。
+FRAME_SYNC = b"\xa5\x5a"
+PROTO_VERSION = 1
+FRAME_CMD = 0x01  # 上位机指令，数据为 指令编号(u8) + 9 个参数(int16)
+FRAME_ACK = 0x81  # 固件已收到并校验通过
+FRAME_NACK = 0x82  # 固件拒收，数据为原因码(u8)
+FRAME_DONE = 0x83  # 指令执行完毕
+FRAME_PROGRESS = 0x84  # 程序执行到第 i 个路径点，数据为 i(u8)
+FRAME_ABORTED = 0x85  # 程序在第 i 个路径点被中止（代替 DONE），数据为 i(u8)
+PROGRAM_ABORT = b"\x18"  # 单字节中止请求，固件在每个路径点之后检查，不是帧、不回复 ACK
+PROGRAM_POLL = 0.05  # 程序执行期间检查 cancel_event 的间隔（秒）
+MAX_PAYLOAD = 32
+NACK_REASONS = {1: "CRC 错误", 2: "长度错误", 3: "协议版本不符", 4: "帧类型错误"}
+ACK_TIMEOUT = 0.2  # 等待 ACK 的时间（秒），超时重发
+ACK_RETRIES = 3
+# 已发送到固件但尚未完成的指令数上限。固件执行指令期间不读串口，后续指令暂存在其 64 字节的
+# 接收缓冲区中（可放下 2 个二进制帧），上一条完成后立即开始执行
+CMD_WINDOW = 2
+# 指令等待 DONE 超时后固件多半仍在执行（期间不读串口）。此时再发送并按 ACK_TIMEOUT 重发会让同一帧在
+# 接收缓冲区中堆积到溢出，固件之后还会执行其中的第一份，与上位机记录的状态不一致。
+# 因此先等待迟到的回复，RESYNC_TIMEOUT 内没有任何回复时每隔 RESYNC_INTERVAL 发送一次空指令，直到固件回复。
+# 等待 ACK 超时同理（ACK 丢失时固件已在执行这条指令）：不按 ACK_TIMEOUT 重发，而是立即发一个空指令探测，
+# 固件按顺序处理串口数据，探测的回复先于本指令的 PROGRESS/DONE 到达时才说明指令帧丢失、需要重发
+RESYNC_TIMEOUT = 30.0
+RESYNC_INTERVAL = 1.0
+RESYNC_PINGS = 5
+
+_FRAME_HEAD = struct.Struct("<2sBBBB")
+_CMD_PAYLOAD = struct.Struct("<B9h")  # 固件 data[] 为 16 位 int
+
+
+def crc16(data, crc=0xFFFF):
+    return binascii.crc_hqx(data, crc)
+
+
+def encode_frame(frame_type, seq, payload=b""):
+    """打包一个二进制帧"""
+    body = _FRAME_HEAD.pack(FRAME_SYNC, PROTO_VERSION, frame_type, seq & 0xFF, len(payload)) + payload
+    return body + struct.pack("<H", crc16(body[2:]))
+
+
+def encode_cmd(seq, cmd_id, params):
+    """打包一条指令帧，params 为 9 个整数（即 ASCII 协议中指令编号之后的 9 个字段）"""
+    return encode_frame(FRAME_CMD, seq, _CMD_PAYLOAD.pack(cmd_id, *params))
+
+
+def decode_cmd(payload):
+    """解包指令帧的数据，返回 (指令编号, [9 个参数])"""
+    cmd_id, *params = _CMD_PAYLOAD.unpack(payload)
+    return cmd_id, params
+
+
+class FrameDecoder:
+    """从串口字节流中拆出二进制帧，遇到损坏的数据逐字节重新同步"""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.frames = collections.deque()  # [(类型, 序号, 数据), ...]
+        self.errors = 0  # 校验失败的帧数
+
+    def feed(self, data):
+        self._buf += data
+        while True:
+            start = self._buf.find(FRAME_SYNC)
+            if start < 0:
+                del self._buf[:-1]  # 保留最后一个字节，可能是被截断的同步头
+                return
+            del self._buf[:start]
+            if len(self._buf) < _FRAME_HEAD.size:
+                return
+            _, version, frame_type, seq, length = _FRAME_HEAD.unpack_from(self._buf)
+            end = _FRAME_HEAD.size + length + 2
+            if length <= MAX_PAYLOAD and len(self._buf) < end:
+                return
+            if (length > MAX_PAYLOAD or version != PROTO_VERSION
+                    or crc16(bytes(self._buf[2:end - 2])) != int.from_bytes(self._buf[end - 2:end], "little")):
+                self.errors += 1
+                del self._buf[:1]
+                continue
+            self.frames.append((frame_type, seq, bytes(self._buf[_FRAME_HEAD.size:end - 2])))
+            del self._buf[:end]
+
+    def reset(self):
+        self._buf.clear()
+        self.frames.clear()
+
+
+class Cancelled(Exception):
+    """任务在安全点（两条运动指令之间，或程序的两个路径点之间）被取消"""
+
+
+def optimize_moves(moves, state=None):
+    """运动指令优化
+
+    moves: [(theta1, theta2, phi, z, gripper), ...]，即实际发送给固件的整数值
+    state: 执行前的指令状态（同格式），未知时为 None
+    去掉与当前状态完全相同的指令；只改变夹爪的指令并入前一条不改变夹爪的运动
+    （固件在运动到位后才转动舵机，合并后动作顺序不变）。
+    返回 (优化后的指令, owner)，owner[i] 为原第 i 条指令随优化后第几条指令一起完成，-1 表示无需执行。
+    """
+    out, owner = [], []
+    before_last = None  # out[-1] 执行前的状态
+    for move in map(tuple, moves):
+        if move == state:
+            owner.append(len(out) - 1)
+            continue
+        if (out and state[:4] == move[:4] and before_last is not None
+                and before_last[4] == out[-1][4]):
+            out[-1] = move
+        else:
+            before_last = state
+            out.append(move)
+        owner.append(len(out) - 1)
+        state = move
+    return out, owner
+
+
+class _Command:
+    def __init__(self, seq, cmd_id, params, timeout, on_progress, future):
+        self.seq = seq
+        self.cmd_id = cmd_id
+        self.params = params
+        self.timeout = timeout
+        self.on_progress = on_progress
+        self.future = future  # 执行完毕时结果为 True
+        self.ack = None  # 当前这次发送的 ACK：True 为 ACK，False 为 NACK
+        self.timer = None
+        self.started = None  # 固件开始执行（收到 ACK）的时间
+        self.submitted = time.perf_counter()
+        self.progress = []  # [(路径点序号, 到达时间), ...]
+
+
+class AsyncSCARAController:
+    """asyncio 串口指令通道：每条指令对应一个 future，后台读取任务按序号分发固件的回复
+
+    - 超时从指令开始执行（收到 ACK）时计算，超时后 future 抛出 TimeoutError，不影响后续指令
+    - 取消尚未发送的指令会直接丢弃；已发送的指令固件无法中止，只是不再等待其结果，
+      只有正在执行的程序可以用 abort_program 在路径点之间中止
+    - 为保证执行顺序，同一时刻只有一条指令处于已发送、未确认状态；ASCII 协议没有 ACK，窗口固定为 1
+    - 指令等待 DONE 超时后，在收到固件的下一个回复之前不开始 ACK 计时、不重发（见 RESYNC_TIMEOUT）
+    - 等待 ACK 超时后先发空指令探测固件状态，本指令的 PROGRESS/DONE 同样视为确认，ACK 丢失不算失败
+    """
+
+    def __init__(self, ser, protocol=PROTOCOL, window=CMD_WINDOW, debug_mode=False):
+        self.ser = ser
+        self.protocol = protocol
+        self.window = window if protocol == PROTO_BINARY else 1
+        self.debug_mode = debug_mode
+        self.resends = 0  # 因 NACK 或 ACK 超时重发的次数
+        self.resyncs = 0  # 等待 DONE 超时后重新同步的次数
+        self._stale = set()  # 等待 DONE 超时、固件可能仍在执行的指令序号
+        self._decoder = FrameDecoder()
+        self._lines = bytearray()
+        self._seq = 0
+        self._queue = None
+        self._slots = None
+        self._inflight = collections.deque()  # 已发送未完成的指令，按发送顺序
+        self._changed = None
+        self._tasks = []
+        self._fd = None
+        self._reader_pool = concurrent.futures.ThreadPoolExecutor(1)
+        self._running = False
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.window)
+        self._changed = asyncio.Condition()
+        self._running = True
+        self._tasks = [asyncio.create_task(self._sender())]
+        try:
+            # POSIX 下直接监听串口文件描述符，否则在线程中阻塞读取
+            asyncio.get_running_loop().add_reader(self.ser.fileno(), self._on_readable)
+            self._fd = self.ser.fileno()
+        except (AttributeError, NotImplementedError, ValueError):
+            self._tasks.append(asyncio.create_task(self._reader()))
+
+    async def close(self):
+        self._running = False
+        if self._fd is not None:
+            asyncio.get_running_loop().remove_reader(self._fd)
+            self._fd = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for cmd in list(self._inflight):
+            self._finish(cmd, error=IOError("连接已关闭"))
+        self._reader_pool.shutdown(wait=True)
+
+    def submit(self, cmd_id, params=None, timeout=10, on_progress=None):
+        """排队一条指令，返回其 future（在事件循环线程中调用）"""
+        params = [int(p) if p is not None else 0 for p in (params or [])]
+        params = params + [0] * (9 - len(params))
+        self._seq = (self._seq + 1) & 0xFF
+        cmd = _Command(self._seq, cmd_id, params, timeout, on_progress,
+                       asyncio.get_running_loop().create_future())
+        if self.debug_mode:
+            print(f"发送的数据: {[cmd_id] + params}")
+        self._queue.put_nowait(cmd)
+        return cmd.future
+
+    async def send(self, cmd_id, params=None, timeout=10, on_progress=None):
+        """发送一条指令并等待执行完毕"""
+        return await self.submit(cmd_id, params, timeout, on_progress)
+
+    async def _sender(self):
+        while True:
+            cmd = await self._queue.get()
+            if cmd.future.done():  # 发送前已被取消
+                continue
+            await self._slots.acquire()
+            self._inflight.append(cmd)
+            try:
+                await self._transmit(cmd)
+            except Exception as e:
+                self._finish(cmd, error=e)
+
+    async def _transmit(self, cmd):
+        """发送一条指令并等待固件开始执行；前面的指令执行期间固件不读串口，ACK 超时从它成为队首时计算"""
+        loop = asyncio.get_running_loop()
+        if self.protocol == PROTO_ASCII:
+            t0 = time.perf_counter()
+            self.ser.write((",".join(map(str, [cmd.cmd_id] + cmd.params)) + "\n").encode('ASCII'))
+            observe("serial_write", time.perf_counter() - t0)
+            await self._wait_head(cmd)
+            self._start_timer(cmd)
+            return
+
+        frame = encode_cmd(cmd.seq, cmd.cmd_id, cmd.params)
+        for attempt in range(ACK_RETRIES + 1):
+            if attempt:
+                self.resends += 1
+            cmd.ack = loop.create_future()
+            t0 = time.perf_counter()
+            self.ser.write(frame)
+            observe("serial_write", time.perf_counter() - t0)
+            await self._wait_head(cmd)
+            # 第一份照常发送（接收缓冲区放得下，固件空闲时对它的 ACK 即可证明已同步），ACK 计时与重发等到同步之后
+            await self._resync()
+            t0 = time.perf_counter()
+            try:
+                acked = await asyncio.wait_for(asyncio.shield(cmd.ack), ACK_TIMEOUT)
+            except asyncio.TimeoutError:
+                # ACK 丢失时固件正在执行本指令、不读串口，此时重发只会在接收缓冲区中堆积
+                await self._resync(cmd)
+                if not cmd.ack.done():
+                    continue  # 固件已回复探测但没有收到本指令
+                acked = cmd.ack.result()
+            observe("wait_ack", time.perf_counter() - t0)
+            if cmd not in self._inflight:
+                return  # ACK 丢失，DONE 已经到达
+            if acked:
+                self._start_timer(cmd)
+                return
+        raise IOError("未收到指令确认")
+
+    def abort_program(self):
+        """请求固件在下一个路径点停止正在执行的程序（在事件循环线程中调用）
+
+        固件回复 ABORTED 代替 DONE，程序指令的 future 抛出 Cancelled；程序已执行完时固件丢弃该字节。
+        固件只检查接收缓冲区的第一个字节，程序之后已有指令帧在排队时要等这些指令执行后才会看到。
+        """
+        self.ser.write(PROGRAM_ABORT)
+
+    def _ping(self):
+        """发送一个空指令帧并等待其回复；固件按顺序处理，回复到达时之前收到的帧都已处理完"""
+        self._seq = (self._seq + 1) & 0xFF
+        self._stale.add(self._seq)
+        self.ser.write(encode_cmd(self._seq, CMD_PING, [0] * 9))
+
+    async def _resync(self, cmd=None):
+        """等到固件再次回复（迟到的 DONE 或对空指令的回复）
+
+        前面有指令等待 DONE 超时时调用；cmd 等待 ACK 超时时传入 cmd，立即发一个空指令探测，
+        cmd 被确认（其 PROGRESS/DONE 到达）或固件回复探测时返回。
+        """
+        if cmd is not None:
+            self._ping()
+        if not self._stale:
+            return
+        self.resyncs += 1
+        loop = asyncio.get_running_loop()
+        # ACK 丢失时等待的是 cmd 本身的执行，回零等长时间运动不能中途发送更多空指令
+        deadline = loop.time() + max(RESYNC_TIMEOUT, cmd.timeout if cmd else 0)
+        pings = 0
+        async with self._changed:
+            while self._stale and not (cmd and cmd.ack.done()):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    if pings >= RESYNC_PINGS:
+                        raise IOError("固件无响应，无法重新同步")
+                    # 每次只发一个空指令帧，不会让接收缓冲区溢出
+                    pings += 1
+                    self._ping()
+                    deadline = loop.time() + RESYNC_INTERVAL
+                    continue
+                try:
+                    await asyncio.wait_for(self._changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _wait_head(self, cmd):
+        async with self._changed:
+            await self._changed.wait_for(lambda: not self._inflight or self._inflight[0] is cmd)
+        if cmd not in self._inflight:
+            raise IOError("指令已结束")
+
+    def _start_timer(self, cmd):
+        cmd.started = time.perf_counter()
+        cmd.timer = asyncio.get_running_loop().call_later(
+            cmd.timeout, self._finish, cmd, None, TimeoutError("等待指令完成超时"))
+
+    def _finish(self, cmd, result=True, error=None):
+        if cmd not in self._inflight:
+            return
+        self._inflight.remove(cmd)
+        self._slots.release()
+        if cmd.timer:
+            cmd.timer.cancel()
+        if isinstance(error, TimeoutError) and cmd.started is not None and self.protocol == PROTO_BINARY:
+            self._stale.add(cmd.seq)
+        if cmd.ack and not cmd.ack.done():
+            cmd.ack.set_result(False)
+        if not cmd.future.done():
+            if error:
+                cmd.future.set_exception(error)
+            else:
+                if cmd.started is not None:
+                    # 从固件开始执行到 DONE 的等待，即运动本身的耗时
+                    observe("wait_done", time.perf_counter() - cmd.started, cmd=cmd.cmd_id)
+                cmd.future.set_result(result)
+        # 先唤醒等待队首的后续指令，回调出错也不会让它们一直等待
+        asyncio.get_running_loop().create_task(self._notify_changed())
+        finished = time.perf_counter()
+        for listener in COMMAND_LISTENERS:
+            try:
+                listener(cmd.cmd_id, cmd.params, error is None, cmd.submitted, finished, cmd.progress)
+            except Exception as e:
+                print(f"指令回调出错: {e}")
+
+    async def _notify_changed(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    def _read_chunk(self):
+        try:
+            return self.ser.read(self.ser.in_waiting or 1)
+        except Exception:
+            return b""
+
+    def _on_readable(self):
+        self._feed(self._read_chunk())
+
+    async def _reader(self):
+        loop = asyncio.get_running_loop()
+        while self._running:
+            self._feed(await loop.run_in_executor(self._reader_pool, self._read_chunk))
+
+    def _feed(self, data):
+        if not data:
+            return
+        if self.protocol == PROTO_BINARY:
+            self._decoder.feed(data)
+            while self._decoder.frames:
+                self._dispatch(*self._decoder.frames.popleft())
+            return
+        self._lines += data
+        while b"\n" in self._lines:
+            line, _, rest = bytes(self._lines).partition(b"\n")
+            self._lines = bytearray(rest)
+            line = line.decode(errors='replace').strip()
+            if line == "DONE":
+                self._dispatch(FRAME_DONE, None, b"")
+            elif line.startswith("WP"):
+                self._dispatch(FRAME_PROGRESS, None, bytes([int(line.split()[1])]))
+            elif line.startswith("ABORT"):
+                self._dispatch(FRAME_ABORTED, None, bytes([int(line.split()[1])]))
+
+    def _dispatch(self, frame_type, seq, payload):
+        """把一条回复交给对应的指令；ASCII 回复没有序号，属于最早发送的指令"""
+        if self._stale and frame_type in (FRAME_ACK, FRAME_NACK, FRAME_DONE, FRAME_ABORTED):
+            # 固件完成了超时的指令或重新开始读串口，已重新同步
+            self._stale.clear()
+            asyncio.get_running_loop().create_task(self._notify_changed())
+        cmd = next((c for c in self._inflight if seq is None or c.seq == seq), None)
+        if cmd is None:
+            return  # 已超时或已结束的指令的迟到回复
+        if frame_type == FRAME_ACK:
+            if cmd.ack and not cmd.ack.done():
+                cmd.ack.set_result(True)
+        elif frame_type == FRAME_NACK:
+            if self.debug_mode:
+                print(f"指令被拒收（{NACK_REASONS.get(payload[0] if payload else 0, '未知原因')}），重发")
+            if cmd.ack and not cmd.ack.done():
+                cmd.ack.set_result(False)
+        elif frame_type == FRAME_PROGRESS:
+            # ACK 丢失时 PROGRESS 说明固件已在执行，同样视为确认
+            if cmd.ack and not cmd.ack.done():
+                cmd.ack.set_result(True)
+                asyncio.get_running_loop().create_task(self._notify_changed())
+            if payload:
+                cmd.progress.append((payload[0], time.perf_counter()))
+            if cmd.on_progress and payload:
+                cmd.on_progress(payload[0])
+        elif frame_type == FRAME_DONE:
+            # ACK 丢失时 DONE 同时视为确认
+            if cmd.ack and not cmd.ack.done():
+                cmd.ack.set_result(True)
+            if self.debug_mode:
+                print("DONE")
+            self._finish(cmd)
+        elif frame_type == FRAME_ABORTED:
+            if cmd.ack and not cmd.ack.done():
+                cmd.ack.set_result(True)
+            if self.debug_mode:
+                print(f"程序在路径点 {payload[0] if payload else '?'} 处中止")
+            self._finish(cmd, error=Cancelled())
+
+
+class SCARAController:
+    """同步接口，内部在后台线程的事件循环中运行 AsyncSCARAController"""
+
+    def __init__(self, port, baudrate=115200, debug_mode=False, protocol=PROTOCOL, window=CMD_WINDOW):
+        self.L1 = 228.0  # 大臂长度
+        self.L2 = 156.5
+        self._init_state()
+
+        # 串口初始化
+        self.ser = None
+        self.debug_mode = debug_mode
+        self.protocol = protocol
+        self.core = None
+        self._loop = None
+        try:
+            self.ser = serial.Serial(port, baudrate, timeout=0.1)
+            time.sleep(2)
+            self.ser.reset_input_buffer()
+            print(f"已连接到 {port}")
+        except Exception as e:
+            print(f"连接失败: {e}")
+            self.ser = None
+            return
+
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        self.core = AsyncSCARAController(self.ser, protocol, window, debug_mode)
+        self._call(self.core.start())
+
+    def _init_state(self):
+        # 当前状态（用于单步运动的默认值），每条运动指令成功后更新
+        self.current_theta1 = 0
+        self.current_theta2 = 0
+        self.current_phi = 0
+        self.current_z = 100
+        self.current_gripper = 0
+        self.state = None  # 最近一次成功执行后的指令状态 (theta1, theta2, phi, z, gripper)，未知时为 None
+        self.saved_round_trips = 0  # 运动优化省去的指令数
+        self.segment_times = {}  # 各类运动段的累计耗时（秒）
+        self.cancel_event = None  # 设置后，下一条运动指令发送前（程序执行中则在下一个路径点）抛出 Cancelled
+
+    def checkpoint(self):
+        """安全点：当前任务已被取消时抛出 Cancelled（已发送的指令照常执行完）"""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise Cancelled()
+
+    def _record(self, segment, seconds):
+        if segment:
+            self.segment_times[segment] = self.segment_times.get(segment, 0.0) + seconds
+
+    def _commit(self, state):
+        """记录指令执行后的状态；指令失败时机械臂可能停在中途，state 传 None"""
+        self.state = state
+        if state is not None:
+            (self.current_theta1, self.current_theta2, self.current_phi,
+             self.current_z, self.current_gripper) = state
+
+    @property
+    def resends(self):
+        return self.core.resends if self.core else 0
+
+    def _call(self, coro):
+        """在事件循环线程中运行协程并等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _read_serial(self):
+        """读取串口数据并返回"""
+        if self.ser.in_waiting:
+            return self.ser.readline().decode('ASCII', errors='replace').strip()
+        return ""
+
+    def is_connected(self):
+        return self.ser and self.ser.is_open
+
+    def send_cmd(self, cmd_id, params=None, timeout=10):
+        if cmd_id in MOTION_CMDS:
+            self.checkpoint()
+        if not self.is_connected():
+            print("未连接到设备")
+            return False
+        try:
+            # 健康检查每隔几秒发送一次空指令，只记入直方图，不占用 trace 环形缓冲区
+            with span("send_cmd", trace=cmd_id != CMD_PING, cmd=cmd_id):
+                self._call(self.core.send(cmd_id, params, timeout))
+        except (TimeoutError, IOError) as e:
+            print(f"指令 {cmd_id} 执行失败: {e}")
+            return False
+        if cmd_id in MOTION_CMDS:
+            self._notify_motion()
+        return True
+
+    def ping(self, timeout=2):
+        """发送空指令，返回固件是否响应"""
+        return self.send_cmd(CMD_PING, None, timeout)
+
+    def submit_cmd(self, cmd_id, params=None, timeout=10):
+        """不等待完成，返回 concurrent.futures.Future；可调用其 cancel() 取消尚未发送的指令"""
+        return asyncio.run_coroutine_threadsafe(self.core.send(cmd_id, params, timeout), self._loop)
+
+    def send_cmds(self, cmds, timeout=10):
+        """连续发送多条不产生运动的指令 [(cmd_id, params), ...]，按窗口流水发送，全部完成后返回"""
+        futures = [self.submit_cmd(cmd_id, params, timeout) for cmd_id, params in cmds]
+        try:
+            with span("send_cmds"):
+                for future in futures:
+                    future.result()
+        except (TimeoutError, IOError) as e:
+            print(f"指令执行失败: {e}")
+            for future in futures:
+                future.cancel()
+            return False
+        return True
+
+    def _notify_motion(self):
+        for listener in MOTION_LISTENERS:
+            listener()
+
+    def home(self, speed=5000, accel=3000, max_retries=5, timeout=60):
+        ok = self.send_cmd(1, [0, 0, 0, 0, 0, 0, speed, accel], timeout=timeout)
+        # 回零后各关节停在 0 位，z 在 100mm 处，夹爪不动
+        self._commit((0, 0, 0, 100, int(self.current_gripper)) if ok else None)
+        return ok
+
+    def move_joints(self, theta1, theta2, phi, z, gripper, speed=5000, accel=3000, max_retries=5, segment=None):
+        """关节空间运动；指定 segment（MOTION_PROFILES 中的运动段）时使用该段的速度/加速度并统计耗时"""
+        target = (int(theta1), int(theta2), int(phi), int(z), int(gripper))
+        if OPTIMIZE_MOVES and target == self.state:
+            self.saved_round_trips += 1
+            return True
+        speed, accel = MOTION_PROFILES[segment] if segment else (speed, accel)
+        start = time.perf_counter()
+        ok = self.send_cmd(2, [0, *target, int(speed), int(accel)], timeout=30)
+        self._record(segment, time.perf_counter() - start)
+        self._commit(target if ok else None)
+        return ok
+
+    def _solve_waypoints(self, waypoints):
+        """批量逆解 [(x, y, z, phi, gripper), ...]，返回发送给固件的整数指令值；有不可达的点时抛出 ValueError"""
+        x, y, z, phi, gripper = np.asarray(waypoints, dtype=np.float64).T
+        with span("inverse_kinematics"):
+            theta1, theta2, valid = kinematics.select(kinematics.inverse_kinematics(x, y, self.L1, self.L2))
+        if not valid.all():
+            raise ValueError(f"路径点 {np.flatnonzero(~valid).tolist()} 不可达或超出关节限位")
+        return [tuple(int(v) for v in point) for point in zip(theta1, theta2, phi, z, gripper)]
+
+    def _optimize(self, moves, on_progress):
+        """优化运动指令，返回 (优化后的指令, 进度回调, 来源)
+
+        进度回调按优化后的下标转发原路径点的进度；来源[k] 为优化后第 k 条指令由原第几条指令产生。
+        """
+        if not OPTIMIZE_MOVES:
+            return moves, on_progress, list(range(len(moves)))
+        optimized, owner = optimize_moves(moves, self.state)
+        self.saved_round_trips += len(moves) - len(optimized)
+        source = [owner.index(k) for k in range(len(optimized))]
+
+        def progress(k):
+            for i, o in enumerate(owner):
+                if o == k and on_progress:
+                    on_progress(i)
+        progress(-1)
+        return optimized, progress, source
+
+    def execute_moves(self, waypoints, speed=5000, accel=3000, on_progress=None, segments=None):
+        """逐条发送路径点 [(x, y, z, phi, gripper), ...]（每条等待完成），发送前先做运动优化
+
+        on_progress(i): 第 i 个路径点完成后回调
+        segments: 各路径点的运动段名称，指定时按 MOTION_PROFILES 设置速度/加速度；
+                  合并后的指令使用产生它的路径点的运动段
+        """
+        return self.execute_joint_moves(self._solve_waypoints(waypoints), speed, accel, on_progress, segments)
+
+    def execute_joint_moves(self, moves, speed=5000, accel=3000, on_progress=None, segments=None):
+        """同 execute_moves，路径点为已求解的关节指令 [(theta1, theta2, phi, z, gripper), ...]"""
+        moves, progress, source = self._optimize(moves, on_progress)
+        for k, move in enumerate(moves):
+            segment = segments[source[k]] if segments else None
+            if not self.move_joints(*move, speed, accel, segment=segment):
+                return False
+            if progress:
+                progress(k)
+        return True
+
+    def execute_program(self, waypoints, speed=5000, accel=3000, on_progress=None, timeout=120, segments=None):
+        """上传整段路径点程序并用一条指令启动执行，全部完成后返回
+
+        waypoints: [(x, y, z, phi, gripper), ...]，所有路径点一次批量逆解，
+                   有不可达的点时在任何运动开始前抛出 ValueError
+        on_progress(i): 每到达第 i 个路径点回调一次
+        segments: 各路径点的运动段名称，速度/加速度随路径点上传，耗时按进度回报的间隔统计
+        """
+        return self.execute_joint_program(self._solve_waypoints(waypoints), speed, accel, on_progress, timeout,
+                                          segments)
+
+    def execute_joint_program(self, moves, speed=5000, accel=3000, on_progress=None, timeout=120, segments=None):
+        """同 execute_program，路径点为已求解的关节指令 [(theta1, theta2, phi, z, gripper), ...]"""
+        if not self.is_connected():
+            print("未连接到设备")
+            return False
+        if not 0 < len(moves) <= PROGRAM_CAPACITY:
+            raise ValueError(f"路径点数量须在 1~{PROGRAM_CAPACITY} 之间")
+        self.checkpoint()  # 程序启动后由 _run_program 在路径点之间检查
+
+        moves, progress, source = self._optimize(moves, on_progress)
+        if not moves:
+            return True
+        segments = [segments[i] for i in source] if segments else [None] * len(moves)
+
+        # 上传程序（不产生运动，按窗口连续发送）；没有指定运动段的路径点速度/加速度为 0，沿用启动指令的值
+        cmds = [(CMD_PROGRAM_CLEAR, None)]
+        cmds += [(CMD_PROGRAM_ADD, [0, *move, *(MOTION_PROFILES[segment] if segment else (0, 0))])
+                 for move, segment in zip(moves, segments)]
+        if not self.send_cmds(cmds):
+            return False
+
+        last = [time.perf_counter()]
+        reached = [None]
+
+        def timed(k):
+            now = time.perf_counter()
+            self._record(segments[k], now - last[0])
+            last[0] = now
+            reached[0] = k
+            if progress:
+                progress(k)
+        try:
+            ok = self._run_program(speed, accel, timed, timeout)
+        except Cancelled:
+            # 固件停在最后回复进度的路径点上
+            self._commit(moves[reached[0]] if reached[0] is not None else None)
+            raise
+        self._commit(moves[-1] if ok else None)
+        return ok
+
+    def _run_program(self, speed, accel, on_progress, timeout):
+        """启动固件程序并等待完成，期间转发路径点进度；cancel_event 被设置后请求固件在下一个路径点停止"""
+        try:
+            with span("send_cmd", cmd=CMD_PROGRAM_RUN):
+                future = asyncio.run_coroutine_threadsafe(
+                    self.core.send(CMD_PROGRAM_RUN, [0, 0, 0, 0, 0, 0, speed, accel], timeout, on_progress), self._loop)
+                aborting = False
+                while not future.done():
+                    concurrent.futures.wait([future], PROGRAM_POLL)
+                    if not aborting and self.cancel_event is not None and self.cancel_event.is_set():
+                        self._loop.call_soon_threadsafe(self.core.abort_program)
+                        aborting = True
+                future.result()
+        except Cancelled:
+            self._notify_motion()
+            raise
+        except (TimeoutError, IOError) as e:
+            print(f"程序执行失败: {e}")
+            return False
+        self._notify_motion()
+        return True
+
+    def inverse_kinematics(self, x, y, prefer=kinematics.ELBOW_DOWN):
+        """计算逆运动学（返回角度），优先肘部向下，超出关节限位时使用另一构型"""
+        with span("inverse_kinematics"):
+            result = kinematics.inverse_kinematics(x, y, self.L1, self.L2)
+        if not result.reachable:
+            raise ValueError(f"目标点超出范围 (r={int((float(x) ** 2 + float(y) ** 2) ** 0.5)})")
+        theta1, theta2, valid = kinematics.select(result, prefer)
+        if not valid:
+            raise ValueError(f"目标点超出关节限位 ({x}, {y})")
+        return float(theta1), float(theta2)
+
+    def forward_kinematics(self, theta1, theta2):
+        """计算正运动学（返回末端 x, y）"""
+        x, y = kinematics.forward_kinematics(theta1, theta2, self.L1, self.L2)
+        return float(x), float(y)
+
+    def move_position(self, x, y, z=None, phi=None, gripper=None, speed=5000, accel=3000, segment=None):
+        """通过笛卡尔坐标运动（内部转换为关节角度），segment 见 move_joints"""
+        z = z if z is not None else self.current_z
+        phi = phi if phi is not None else self.current_phi
+        gripper = gripper if gripper is not None else self.current_gripper
+
+        # 逆运动学计算（转换x,y到theta1,theta2）
+        theta1, theta2 = self.inverse_kinematics(x, y)
+        return self.move_joints(theta1, theta2, phi, z, gripper, speed, accel, segment=segment)
+
+    def close(self):
+        """关闭连接"""
+        if self.core:
+            self._call(self.core.close())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self.core = None
+        if self.is_connected():
+            self.ser.close()
             print("连接已关闭")
\ No newline at end of file
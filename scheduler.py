@@ -0,0 +1,157 @@
+"""多物体清理的抓取顺序规划
+
+代价为关节空间的运动耗时：各关节的步数差按固件的梯形加减速（transit 运动段的速度与加速度）计算，
+取最慢的关节，再加上每条运动指令后固件的固定延时。每个物体的抓取-放置过程本身耗时与顺序无关，
+因此只需优化“上一个放置点 -> 下一个物体上方”的转移：物体不多时用状态压缩动态规划求精确解，
+多时用最近邻 + 两两交换改进。
+
+放完一个物体后如果还要抓下一个，且放置点不在相机视野内（在放置点就可以检测），
+就直接前往下一个物体，不再经过初始位置 (384.5, 0)。
+"""
+import itertools
+
+import numpy as np
+
+import kinematics
+from calib import get_mapper
+from scara_1 import MOTION_PROFILES, STEPS_PER_UNIT
+
+HOME_POSE = (384.5, 0.0, 100.0)  # 每次抓取放置后返回的初始位置
+SAFE_Z = 100.0  # 物体上方的安全高度
+MOVE_OVERHEAD = 0.4  # data[0]==2 每次运动后固件的 delay(100) + delay(300)
+EXACT_LIMIT = 9  # 物体数不超过该值时求精确解
+
+
+class CostModel:
+    """关节空间运动耗时模型，默认参数取自 MOTION_PROFILES["transit"]（规划的都是安全高度上的转移）"""
+
+    def __init__(self, accel=None, max_speed=None, overhead=MOVE_OVERHEAD):
+        transit_speed, transit_accel = MOTION_PROFILES["transit"]
+        accel = transit_accel if accel is None else accel
+        max_speed = transit_speed if max_speed is None else max_speed
+        self.accel = accel
+        self.max_speed = max_speed
+        self.overhead = overhead
+
+    def reachable(self, poses):
+        """各位姿是否可达"""
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+        return kinematics.select(kinematics.inverse_kinematics(poses[:, 0], poses[:, 1]))[2]
+
+    def joints(self, poses):
+        """笛卡尔位姿 [(x, y, z), ...] -> 电机步数 (n, 4)，不可达时抛出 ValueError"""
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+        theta1, theta2, valid = kinematics.select(kinematics.inverse_kinematics(poses[:, 0], poses[:, 1]))
+        if not valid.all():
+            raise ValueError(f"位姿 {poses[~valid].tolist()} 不可达")
+        angles = np.stack([theta1, theta2, np.zeros(len(poses)), poses[:, 2]], axis=1)
+        return angles * np.asarray(STEPS_PER_UNIT)
+
+    def _steps_time(self, steps):
+        steps = np.abs(steps)
+        ramp = self.max_speed ** 2 / (2 * self.accel)
+        short = 2 * np.sqrt(steps / self.accel)
+        long = 2 * self.max_speed / self.accel + (steps - 2 * ramp) / self.max_speed
+        return np.where(steps < 2 * ramp, short, long)
+
+    def matrix(self, src, dst):
+        """src 中每个位姿到 dst 中每个位姿的运动耗时，形状 (len(src), len(dst))"""
+        a, b = self.joints(src), self.joints(dst)
+        return self._steps_time(b[None, :, :] - a[:, None, :]).max(axis=-1) + self.overhead
+
+
+def drop_in_view(drop):
+    """放置点是否在相机视野内（在视野内时必须离开才能检测）"""
+    mapper = get_mapper()
+    u, v = mapper.to_pixel(drop[0], drop[1])
+    return 0 <= u[0] < mapper.size[0] and 0 <= v[0] < mapper.size[1]
+
+
+def _exact_order(start, transit, end):
+    """状态压缩动态规划：start[j] 起点到 j，transit[i][j] i 放置后到 j，end[i] i 放置后回初始位置"""
+    n = len(start)
+    full = (1 << n) - 1
+    cost = np.full((1 << n, n), np.inf)
+    prev = np.full((1 << n, n), -1, dtype=np.int64)
+    for j in range(n):
+        cost[1 << j, j] = start[j]
+    for mask in range(1, full + 1):
+        for j in range(n):
+            if not mask >> j & 1 or cost[mask, j] == np.inf:
+                continue
+            for k in range(n):
+                if mask >> k & 1:
+                    continue
+                c = cost[mask, j] + transit[j, k]
+                if c < cost[mask | 1 << k, k]:
+                    cost[mask | 1 << k, k] = c
+                    prev[mask | 1 << k, k] = j
+    last = int(np.argmin(cost[full] + end))
+    order, mask = [], full
+    while last >= 0:
+        order.append(last)
+        mask, last = mask & ~(1 << last), prev[mask, last]
+    return order[::-1]
+
+
+def _total(order, start, transit, end):
+    return start[order[0]] + sum(transit[i, j] for i, j in zip(order, order[1:])) + end[order[-1]]
+
+
+def _greedy_order(start, transit, end):
+    """最近邻 + 两两交换改进"""
+    remaining = set(range(len(start)))
+    order = [min(remaining, key=lambda j: start[j])]
+    remaining.discard(order[0])
+    while remaining:
+        order.append(min(remaining, key=lambda j: transit[order[-1], j]))
+        remaining.discard(order[-1])
+    best = _total(order, start, transit, end)
+    improved = True
+    while improved:
+        improved = False
+        for i, j in itertools.combinations(range(len(order)), 2):
+            order[i], order[j] = order[j], order[i]
+            total = _total(order, start, transit, end)
+            if total < best - 1e-9:
+                best, improved = total, True
+            else:
+                order[i], order[j] = order[j], order[i]
+    return order
+
+
+def plan(picks, drop_locations, start=HOME_POSE, model=None, pipelined=False):
+    """规划抓取顺序
+
+    picks: [(类别, x, y, ...), ...]（机械臂坐标，类别须在 drop_locations 中）
+    返回 [(pick, return_home), ...]，return_home 为放置后是否返回初始位置。
+    pipelined=True 时每次检测只执行第一个抓取，下一个物体来自新的检测结果，
+    此时仍按剩余物体决定是否跳过初始位置。
+    """
+    model = model or CostModel()
+    # 不可达的物体无法估算耗时，排在最后（抓取时会失败并按原逻辑处理）
+    ok = model.reachable([(p[1], p[2], SAFE_Z) for p in picks]) if picks else []
+    unreachable = [(p, True) for p, r in zip(picks, ok) if not r]
+    picks = [p for p, r in zip(picks, ok) if r]
+    if not picks:
+        return unreachable
+    above = [(p[1], p[2], SAFE_Z) for p in picks]
+    drops = [drop_locations[p[0]] for p in picks]
+    start_cost = model.matrix([start], above)[0]
+    end_cost = model.matrix(drops, [HOME_POSE])[:, 0]
+    direct = model.matrix(drops, above)
+    via_home = end_cost[:, None] + model.matrix([HOME_POSE], above)[0][None, :]
+    # 放置点在视野内时必须离开视野才能检测，流水线模式下只能经过初始位置
+    in_view = np.array([drop_in_view(d) for d in drops])
+    transit = np.where(in_view[:, None] & pipelined, via_home, np.minimum(direct, via_home))
+
+    if len(picks) <= EXACT_LIMIT:
+        order = _exact_order(start_cost, transit, end_cost)
+    else:
+        order = _greedy_order(start_cost, transit, end_cost)
+    result = []
+    for i, j in itertools.zip_longest(order, order[1:]):
+        return_home = j is None or bool(direct[i, j] >= via_home[i, j]) or bool(in_view[i] and pipelined)
+        result.append((picks[i], return_home))
+    return result + unreachable
+
@@ -0,0 +1,405 @@
+"""虚拟机械臂：在伪终端上按 v0_1.ino 的协议与时序模拟固件
+
+SCARAController、run_1.run、run_top.DualSerialHandler 只需把串口改为虚拟串口即可直接运行，
+不需要实体机械臂。模拟内容：
+    - ASCII 与二进制两种协议的解析与回复（ACK/NACK/DONE/进度）
+    - data[0]==1 记录路径点并回零，data[0]==2 运动，3/4/5 程序上传与执行，data[1]==1 循环回放
+    - 程序执行中在每个路径点之后检查中止字节 0x18
+    - AccelStepper 梯形速度曲线（最高速度 4000 步/秒，加速度取指令中的 data[8]）
+    - 固件中的 delay()（舵机等待、回零停顿等）与串口传输时间
+
+用法示例：
+    python sim_arm.py --rate 10 --link /tmp/scara_arm
+    # 另开终端：SCARAController("/tmp/scara_arm")，或把 devices.ARM_PORT 改为 /tmp/scara_arm
+"""
+import argparse
+import math
+import os
+import pty
+import select
+import threading
+import time
+import tty
+
+import scara_1
+from scara_1 import MAX_SPEED, STEPS_PER_UNIT
+
+# 与 v0_1.ino 对应的常量
+DEFAULT_ACCEL = 2000  # setup() 中 setAcceleration(2000)
+PROGRAM_CAPACITY = 100
+SERIAL_TIMEOUT = 1.0  # Arduino Stream 默认超时（readStringUntil / readBytes）
+
+# 回零：(限位开关处的步数, 寻找限位开关的速度, 回零后的位置)，按 homing() 中的顺序 z, phi, theta2, theta1
+HOMING = ((3, 18000, 1500, 10000), (2, -1662, 1100, 0), (1, -5850, 1300, 0), (0, -3955, 1200, 0))
+
+
+def move_time(steps, max_speed=MAX_SPEED, accel=DEFAULT_ACCEL):
+    """AccelStepper 梯形速度曲线走完 steps 步所需时间（秒）"""
+    steps = abs(steps)
+    if steps == 0:
+        return 0.0
+    ramp = max_speed ** 2 / (2 * accel)
+    if steps < 2 * ramp:
+        return 2 * math.sqrt(steps / accel)
+    return 2 * max_speed / accel + (steps - 2 * ramp) / max_speed
+
+
+def atol(text):
+    """与 Arduino atol 相同：跳过前导空白，解析开头的整数，无法解析时为 0"""
+    text = text.lstrip()
+    end = 1 if text[:1] in ("-", "+") else 0
+    while end < len(text) and text[end].isdigit():
+        end += 1
+    try:
+        return int(text[:end])
+    except ValueError:
+        return 0
+
+
+def _int16(value):
+    """固件 data[] 与路径点数组为 16 位 int，超出范围时按 AVR 的方式截断"""
+    return (int(value) + 0x8000) % 0x10000 - 0x8000
+
+
+class SimClock:
+    """模拟时钟：rate 为相对实时的加速倍数（inf 表示不等待），elapsed 为累计的模拟时间"""
+
+    def __init__(self, rate=1.0):
+        self.rate = rate
+        self.elapsed = 0.0
+
+    def sleep(self, seconds):
+        self.elapsed += seconds
+        if self.rate != math.inf:
+            time.sleep(seconds / self.rate)
+
+
+class VirtualArm(threading.Thread):
+    """伪终端另一端的虚拟固件，port 为可交给 SCARAController 的串口路径
+
+    on_gripper(gripper, joints) 在夹爪动作时回调，joints 为当前 (theta1, theta2, phi, z)，
+    可用于模拟桌面上的物体被夹走。
+    """
+
+    def __init__(self, rate=1.0, baudrate=115200, link=None, on_gripper=None):
+        super().__init__(daemon=True)
+        self.clock = SimClock(rate)
+        self.baudrate = baudrate
+        self.on_gripper = on_gripper
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self.link = link
+        if link:
+            if os.path.lexists(link):
+                os.remove(link)
+            os.symlink(self.port, link)
+        self._rx = bytearray()
+        self._running = True
+
+        # 固件状态
+        self.data = [0] * 10
+        self.theta1_array = [0] * PROGRAM_CAPACITY
+        self.theta2_array = [0] * PROGRAM_CAPACITY
+        self.phi_array = [0] * PROGRAM_CAPACITY
+        self.z_array = [0] * PROGRAM_CAPACITY
+        self.gripper_array = [0] * PROGRAM_CAPACITY
+        self.speed_array = [0] * PROGRAM_CAPACITY  # 以 100 为单位，0 表示不指定
+        self.accel_array = [0] * PROGRAM_CAPACITY
+        self.positions_counter = 0
+        self.current_gripper = 0
+        self.new_cmd_mark = False
+        self.binary_mode = False
+        self.frame_seq = 0
+        self.last_payload = None
+        self.positions = [0, 0, 0, 0]  # AccelStepper currentPosition()
+        self.max_speed = MAX_SPEED
+        self.accel = [DEFAULT_ACCEL] * 4
+        # 上电时步数计数为 0，但机械臂实际停在回零后的姿态（z 在 10000 步处），回零后偏差清零
+        self._offsets = [0, 0, 0, 10000]
+        self.commands = 0  # 已执行的指令数
+        self.aborted = 0  # 被中止的程序数
+        self.moving_time = 0.0  # 累计运动的模拟时间
+
+    # ---- 串口 ----
+
+    def _fill(self, timeout):
+        """等待并读取主机发来的数据，返回是否读到"""
+        if not select.select([self._master], [], [], timeout)[0]:
+            return False
+        try:
+            data = os.read(self._master, 4096)
+        except OSError:
+            return False
+        self._rx += data
+        return bool(data)
+
+    def _available(self):
+        return bool(self._rx) or self._fill(0)
+
+    def _read_bytes(self, n):
+        """Serial.readBytes：超时内读不够 n 个字节时返回已读到的"""
+        deadline = time.time() + SERIAL_TIMEOUT
+        while len(self._rx) < n and time.time() < deadline:
+            self._fill(deadline - time.time())
+        data = bytes(self._rx[:n])
+        del self._rx[:n]
+        self._wire(len(data))
+        return data
+
+    def _read_string_until(self, terminator=b"\n"):
+        """Serial.readStringUntil：读到结束符或超时"""
+        deadline = time.time() + SERIAL_TIMEOUT
+        while terminator not in self._rx and time.time() < deadline:
+            self._fill(deadline - time.time())
+        line, sep, rest = bytes(self._rx).partition(terminator)
+        self._rx = bytearray(rest)
+        self._wire(len(line) + len(sep))
+        return line.decode(errors="replace")
+
+    def _read_string(self):
+        """Serial.readString：一直读到 1 秒内没有新数据"""
+        while self._fill(SERIAL_TIMEOUT / self.clock.rate if self.clock.rate != math.inf else 0):
+            pass
+        self.clock.elapsed += SERIAL_TIMEOUT
+        content = self._rx.decode(errors="replace")
+        self._wire(len(self._rx))
+        self._rx.clear()
+        return content
+
+    def _write(self, data):
+        self._wire(len(data))
+        os.write(self._master, data)
+
+    def _wire(self, n):
+        """串口传输 n 个字节的时间（每字节 10 位）"""
+        if n:
+            self.clock.sleep(n * 10 / self.baudrate)
+
+    def _parse_ascii(self, content):
+        """与固件中 indexOf/substring/atol 的循环相同：字段不足时重复解析剩余的最后一段"""
+        for i in range(10):
+            index = content.find(",")
+            self.data[i] = _int16(atol(content if index < 0 else content[:index]))
+            content = content[index + 1:] if index >= 0 else content
+
+    def _send_frame(self, frame_type, seq, payload=b""):
+        self._write(scara_1.encode_frame(frame_type, seq, payload))
+
+    def _read_frame(self):
+        """对应 readFrame()"""
+        del self._rx[:1]
+        if self._read_bytes(1) != scara_1.FRAME_SYNC[1:]:
+            return
+        head = self._read_bytes(4)
+        if len(head) != 4:
+            return
+        version, frame_type, seq, length = head
+        body = self._read_bytes(length + 2) if length <= scara_1.MAX_PAYLOAD else b""
+        if len(body) != length + 2:
+            self._rx.clear()
+            self._send_frame(scara_1.FRAME_NACK, seq, bytes([2]))
+            return
+        payload, crc = body[:length], int.from_bytes(body[length:], "little")
+        if scara_1.crc16(head + payload) != crc:
+            self._send_frame(scara_1.FRAME_NACK, seq, bytes([1]))
+            return
+        if version != scara_1.PROTO_VERSION:
+            self._send_frame(scara_1.FRAME_NACK, seq, bytes([3]))
+            return
+        if frame_type != scara_1.FRAME_CMD or length != 19:
+            self._send_frame(scara_1.FRAME_NACK, seq, bytes([4]))
+            return
+        self.binary_mode = True
+        self._send_frame(scara_1.FRAME_ACK, seq)
+        if self.last_payload is not None and seq == self.frame_seq and payload == self.last_payload:
+            self._send_frame(scara_1.FRAME_DONE, seq)
+            return
+        self.frame_seq, self.last_payload = seq, payload
+        cmd_id, params = scara_1.decode_cmd(payload)
+        self.data = [cmd_id] + list(params)
+        self.new_cmd_mark = True
+
+    # ---- 运动 ----
+
+    def joints(self):
+        """当前实际关节位置 (theta1, theta2, phi, z)"""
+        return tuple((p + o) / k for p, o, k in zip(self.positions, self._offsets, STEPS_PER_UNIT))
+
+    def _set_accel(self, accel):
+        if accel > 0:  # AccelStepper::setAcceleration(0) 不生效
+            self.accel = [accel] * 4
+
+    def _apply_profile(self, speed, accel):
+        """对应 applyProfile()"""
+        if speed > 0:
+            self.max_speed = min(speed, MAX_SPEED)
+        self._set_accel(accel)
+
+    def _move_to(self, targets):
+        """四个电机同时 moveTo 并 run 到位"""
+        duration = max(move_time(t - p, self.max_speed, a) for t, p, a in zip(targets, self.positions, self.accel))
+        self.clock.sleep(duration)
+        self.moving_time += duration
+        self.positions = list(targets)
+
+    def _write_gripper(self, value):
+        self.current_gripper = value
+        if self.on_gripper:
+            self.on_gripper(value, self.joints())
+
+    def _homing(self):
+        for axis, switch, speed, home in HOMING:
+            physical = self.positions[axis] + self._offsets[axis]
+            seek = abs(switch - physical) / speed
+            self.clock.sleep(seek + 0.02)
+            self.moving_time += seek
+            self.positions[axis], self._offsets[axis] = switch, 0
+            target = list(self.positions)
+            target[axis] = home
+            self._move_to(target)
+
+    def _store_waypoint(self):
+        i = self.positions_counter
+        self.theta1_array[i] = _int16(self.data[2] * STEPS_PER_UNIT[0])
+        self.theta2_array[i] = _int16(self.data[3] * STEPS_PER_UNIT[1])
+        self.phi_array[i] = _int16(self.data[4] * STEPS_PER_UNIT[2])
+        self.z_array[i] = _int16(self.data[5] * STEPS_PER_UNIT[3])
+        self.gripper_array[i] = self.data[6]
+        stored = self.data[0] == 3
+        self.speed_array[i] = min(max(int(self.data[7] / 100), 0), 255) if stored else 0
+        self.accel_array[i] = min(max(int(self.data[8] / 100), 0), 255) if stored else 0
+        self.positions_counter += 1
+
+    def _waypoint(self, i):
+        return [self.theta1_array[i], self.theta2_array[i], self.phi_array[i], self.z_array[i]]
+
+    def _playback(self):
+        """对应 while (data[1] == 1) 循环回放"""
+        while self.data[1] == 1 and self._running:
+            self._set_accel(self.data[8])
+            for i in range(self.positions_counter):
+                if self.data[1] == 0:
+                    break
+                self._move_to(self._waypoint(i))
+                if i == 0:
+                    self._write_gripper(self.gripper_array[i])
+                elif self.gripper_array[i] != self.gripper_array[i - 1]:
+                    self._write_gripper(self.gripper_array[i])
+                    self.clock.sleep(0.8)
+                if self._available():
+                    self._parse_ascii(self._read_string())
+                    if self.data[1] == 0:
+                        break
+                    self._set_accel(self.data[8])
+            if not self.positions_counter:
+                self._fill(0.05)
+
+    def _run_program(self):
+        """对应 runProgram()，被中止时返回 False"""
+        for i in range(self.positions_counter):
+            self._apply_profile(self.speed_array[i] * 100 or self.data[7], self.accel_array[i] * 100 or self.data[8])
+            self._move_to(self._waypoint(i))
+            if self.gripper_array[i] != self.current_gripper:
+                self.clock.sleep(0.1)
+                self._write_gripper(self.gripper_array[i])
+                self.clock.sleep(0.3)
+            if self.binary_mode:
+                self._send_frame(scara_1.FRAME_PROGRESS, self.frame_seq, bytes([i & 0xFF]))
+            else:
+                self._write(f"WP {i}\r\n".encode())
+            if i < self.positions_counter - 1 and self._available() and self._rx[0] == scara_1.PROGRAM_ABORT[0]:
+                del self._rx[:1]
+                if self.binary_mode:
+                    self._send_frame(scara_1.FRAME_ABORTED, self.frame_seq, bytes([i & 0xFF]))
+                else:
+                    self._write(f"ABORT {i}\r\n".encode())
+                return False
+        return True
+
+    def _loop(self):
+        """对应 loop() 的一次执行"""
+        if not self._available():
+            self._fill(0.05)
+            return
+        if self._rx[0] == scara_1.PROGRAM_ABORT[0]:
+            del self._rx[:1]  # 程序结束后才到达的中止字节
+        elif self._rx[0] == scara_1.FRAME_SYNC[0]:
+            self._read_frame()
+        else:
+            self._parse_ascii(self._read_string_until())
+            self.binary_mode = False
+            self.new_cmd_mark = True
+        if self.new_cmd_mark:
+            if self.data[0] in (1, 3) and self.positions_counter < PROGRAM_CAPACITY:
+                self._store_waypoint()
+            if self.data[0] == 4:
+                self.positions_counter = 0
+        self._playback()
+        if self.data[0] == 1:
+            self._apply_profile(self.data[7], self.data[8])
+            self._homing()
+        if self.data[0] == 2:
+            self._apply_profile(self.data[7], self.data[8])
+            self._move_to([_int16(v * k) for v, k in zip(self.data[2:6], STEPS_PER_UNIT)])
+            self.clock.sleep(0.1)
+            self._write_gripper(self.data[6])
+            self.clock.sleep(0.3)
+        if self.data[0] == 5 and not self._run_program():
+            self.aborted += 1
+            self.new_cmd_mark = False
+            self.data[0] = 0
+        if self.new_cmd_mark:
+            self.commands += 1
+            if self.binary_mode:
+                self._send_frame(scara_1.FRAME_DONE, self.frame_seq)
+            else:
+                self._write(b"DONE\r\n")
+            self.new_cmd_mark = False
+            self.data[0] = 0
+
+    def run(self):
+        while self._running:
+            self._loop()
+
+    def stop(self):
+        self._running = False
+        if self.is_alive():
+            self.join()
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        if self.link and os.path.islink(self.link):
+            os.remove(self.link)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在伪终端上运行虚拟机械臂")
+    parser.add_argument("--rate", type=float, default=1.0, help="时钟加速倍数（inf 表示不等待）")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--link", help="为虚拟串口创建的符号链接路径，如 /tmp/scara_arm")
+    args = parser.parse_args()
+
+    with VirtualArm(args.rate, args.baudrate, args.link) as arm:
+        print(f"虚拟机械臂已启动: {args.link or arm.port}（{args.rate}x）")
+        try:
+            while True:
+                time.sleep(5)
+                theta1, theta2, phi, z = arm.joints()
+                print(f"指令 {arm.commands} 条，模拟时间 {arm.clock.elapsed:.1f}s，"
+                      f"关节 ({theta1:.1f}, {theta2:.1f}, {phi:.1f}, {z:.1f})，夹爪 {arm.current_gripper}")
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
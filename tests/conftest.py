@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 项目模块都在仓库根目录下（没有安装包），测试直接导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
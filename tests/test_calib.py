@@ -0,0 +1,68 @@
+"""像素坐标 -> 机械臂坐标：默认查找表与对应点拟合"""
+import numpy as np
+import pytest
+
+from calib import PixelMapper, fit_points
+from detect_new1 import FRAME_H, FRAME_W
+
+
+def legacy(u, v):
+    """原来硬编码在两处抓取流程里的线性公式"""
+    return int(0.357 * u - 104), int(374 - 0.357 * v)
+
+
+@pytest.fixture(scope="module")
+def mapper():
+    return PixelMapper()
+
+
+@pytest.mark.parametrize("u, v", [
+    (0, 0), (FRAME_W - 1, 0), (0, FRAME_H - 1), (FRAME_W - 1, FRAME_H - 1), (FRAME_W // 2, FRAME_H // 2),
+])
+def test_default_lut_matches_legacy_formula(mapper, u, v):
+    assert mapper(u, v) == legacy(u, v)
+
+
+def test_default_lut_matches_legacy_formula_everywhere(mapper):
+    u, v = np.meshgrid(np.arange(0, FRAME_W, 7), np.arange(0, FRAME_H, 5))
+    x, y = mapper.to_robot(u, v)
+    assert np.array_equal(x.astype(int), (0.357 * u - 104).astype(int))
+    assert np.array_equal(y.astype(int), (374 - 0.357 * v).astype(int))
+
+
+def test_out_of_frame_pixels_are_clamped(mapper):
+    assert mapper(-50, -50) == legacy(0, 0)
+    assert mapper(FRAME_W + 50, FRAME_H + 50) == legacy(FRAME_W - 1, FRAME_H - 1)
+
+
+def test_fit_points_recovers_affine_transform():
+    A = np.array([[0.31, 0.04, -95.0], [-0.03, -0.34, 381.0]])
+    rng = np.random.default_rng(0)
+    pixels = rng.uniform((0, 0), (FRAME_W, FRAME_H), (12, 2))
+    robot = pixels @ A[:, :2].T + A[:, 2]
+    fitted = fit_points(pixels, robot)
+    H = fitted.homography / fitted.homography[2, 2]
+    assert np.allclose(H[:2], A, atol=1e-6)
+    assert np.allclose(H[2], [0, 0, 1], atol=1e-9)
+    # 查找表在整数像素上与变换一致（float32 精度）
+    u, v = np.array([0, 640, 1279]), np.array([0, 360, 719])
+    x, y = fitted.to_robot(u, v)
+    expected = np.stack([u, v], axis=1) @ A[:, :2].T + A[:, 2]
+    assert np.allclose(np.stack([x, y], axis=1), expected, atol=1e-3)
+
+
+def test_fit_points_rejects_too_few_points():
+    with pytest.raises(ValueError):
+        fit_points([(0, 0), (1, 0), (0, 1)], [(0, 0), (1, 0), (0, 1)])
+
+
+def test_save_and_load_round_trip(tmp_path):
+    mapper = fit_points([(0, 0), (1279, 0), (0, 719), (1279, 719)],
+                        [(-100, 380), (350, 370), (-90, 120), (340, 110)])
+    path = str(tmp_path / "calib.npz")
+    mapper.save(path)
+    loaded = PixelMapper.load(path)
+    assert np.allclose(loaded.homography, mapper.homography)
+    assert loaded(640, 360) == mapper(640, 360)
+    u, v = loaded.to_pixel(*loaded.to_robot(640, 360))
+    assert np.allclose((u[0], v[0]), (640, 360), atol=0.05)
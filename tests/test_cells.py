@@ -0,0 +1,40 @@
+"""多工作单元：启动失败时不留下仍在运行的工作进程"""
+import time
+
+import pytest
+
+import cells
+
+
+def setup_cell(cell):
+    """工作进程中调用：不连接硬件、不预热检测器、不写飞行记录；名为 bad 的单元启动失败，slow 的单元迟迟不就绪"""
+    import devices
+    import recorder
+    devices.WARM_UP_DETECTOR = False
+    recorder.FLIGHT_RECORD = False
+    if cell.name == "bad":
+        raise RuntimeError("摄像头打不开")
+    if cell.name == "slow":
+        time.sleep(60)
+    return lambda: []
+
+
+def test_failed_cell_stops_started_workers(monkeypatch):
+    workers = {}
+    close = cells.CellPool.close
+
+    def recording_close(self):
+        workers.update(self._workers)
+        workers["ready"] = set(self._ready)
+        close(self)
+
+    monkeypatch.setattr(cells.CellPool, "close", recording_close)
+    pool = cells.CellPool([cells.Cell(name, "/nonexistent/arm") for name in ("good", "bad", "slow")], setup_cell)
+    t0 = time.perf_counter()
+    with pytest.raises(RuntimeError, match="bad"):
+        pool.start()
+    assert time.perf_counter() - t0 < 30  # 不等待 slow 单元的预热
+    assert workers.pop("ready") == {"good"}
+    assert sorted(workers) == ["bad", "good", "slow"]
+    assert not any(proc.is_alive() for proc, _, _ in workers.values())
+    assert pool._workers == {}
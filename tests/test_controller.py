@@ -0,0 +1,124 @@
+"""AsyncSCARAController 在虚拟机械臂（伪终端）上的确认、超时与重新同步"""
+import asyncio
+
+import pytest
+import serial
+
+import scara_1
+from scara_1 import CMD_MOVE, CMD_PING, FRAME_ACK, FRAME_DONE, AsyncSCARAController, FrameDecoder, encode_cmd
+from sim_arm import VirtualArm
+
+# 以 100 步/秒转动 10 度约需 4.4 秒模拟时间，按 4 倍速运行时仍长于 ACK 超时加全部重发的时间
+LONG_MOVE = [0, 10, 0, 0, 0, 0, 100, 2000]
+SHORT_MOVE = [0, 0, 0, 0, 0, 0, 4000, 2000]
+
+
+class LossyArm(VirtualArm):
+    """可以丢弃回复或整个指令帧的虚拟机械臂"""
+
+    def __init__(self, rate=4.0):
+        super().__init__(rate)
+        self.drop = []  # 依次要丢弃的回复类型
+        self.swallow = 0  # 要整个丢弃的指令帧数（固件没有收到）
+        self.moves = 0
+
+    def _send_frame(self, frame_type, seq, payload=b""):
+        if self.drop and self.drop[0] == frame_type:
+            self.drop.pop(0)
+            return
+        super()._send_frame(frame_type, seq, payload)
+
+    def _read_frame(self):
+        if self.swallow:
+            self.swallow -= 1
+            self._read_bytes(len(encode_cmd(0, CMD_PING, [0] * 9)))
+            return
+        super()._read_frame()
+        if self.new_cmd_mark and self.data[0] == CMD_MOVE:
+            self.moves += 1
+
+
+@pytest.fixture
+def arm():
+    with LossyArm() as arm:
+        yield arm
+
+
+def run(arm, body):
+    """在新的事件循环中连接虚拟机械臂并运行 body(core)"""
+    async def main():
+        ser = serial.Serial(arm.port, 115200, timeout=0.1)
+        core = AsyncSCARAController(ser)
+        await core.start()
+        try:
+            return await body(core)
+        finally:
+            await core.close()
+            ser.close()
+    return asyncio.run(main())
+
+
+def test_lost_ack_during_long_move_is_not_a_failure(arm):
+    arm.drop = [FRAME_ACK]
+
+    async def body(core):
+        ok = await core.send(CMD_MOVE, LONG_MOVE)
+        return ok, await core.send(CMD_MOVE, SHORT_MOVE), core.resends
+
+    ok, next_ok, resends = run(arm, body)
+    assert ok and next_ok
+    assert resends == 0  # 没有把同一帧堆到固件的接收缓冲区
+    assert arm.moves == 2  # 每条运动只执行一次
+
+
+def test_lost_command_frame_is_resent_after_probe(arm):
+    arm.swallow = 1
+
+    async def body(core):
+        return await core.send(CMD_MOVE, SHORT_MOVE), core.resends, core.resyncs
+
+    ok, resends, resyncs = run(arm, body)
+    assert ok
+    assert (resends, resyncs) == (1, 1)
+    assert arm.moves == 1
+
+
+def test_windowed_commands_survive_lost_ack(arm):
+    """窗口内的下一条指令已在接收缓冲区中时，丢失 ACK 也不会让指令重复执行或报错"""
+    arm.drop = [FRAME_ACK]
+
+    async def body(core):
+        futures = [core.submit(CMD_MOVE, move) for move in (LONG_MOVE, SHORT_MOVE, LONG_MOVE)]
+        return await asyncio.gather(*futures), core.resends
+
+    results, resends = run(arm, body)
+    assert results == [True, True, True]
+    assert resends == 0 and arm.moves == 3
+
+
+def test_done_timeout_resyncs_before_next_command(arm):
+    arm.drop = [FRAME_DONE]
+
+    async def body(core):
+        with pytest.raises(TimeoutError):
+            await core.send(CMD_MOVE, LONG_MOVE, timeout=0.5)
+        return await core.send(CMD_MOVE, SHORT_MOVE), core.resends, core.resyncs
+
+    ok, resends, resyncs = run(arm, body)
+    assert ok
+    assert (resends, resyncs) == (0, 1)
+    assert arm.moves == 2
+
+
+def test_firmware_ignores_a_resent_frame(arm):
+    """同一序号和内容的帧重发时固件只重新回复 ACK/DONE，不再执行"""
+    frame = encode_cmd(7, CMD_MOVE, SHORT_MOVE + [0])
+    decoder = FrameDecoder()
+    with serial.Serial(arm.port, 115200, timeout=2) as ser:
+        ser.write(frame + frame)
+        while sum(1 for f in decoder.frames if f[0] == FRAME_DONE) < 2:
+            data = ser.read(ser.in_waiting or 1)
+            assert data, "虚拟机械臂没有回复"
+            decoder.feed(data)
+    assert [(t, seq) for t, seq, _ in decoder.frames] == [(FRAME_ACK, 7), (FRAME_DONE, 7)] * 2
+    assert arm.moves == 1
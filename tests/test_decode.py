@@ -0,0 +1,52 @@
+"""向量化解码与逐行解码的等价性
+
+fixtures/decode_outputs.npz 为 320x320 输入、5 个类别的 YOLOv5 输出张量 (帧, 1, 6300, 10)，
+每帧有若干相互重叠的候选框（NMS 需要抑制）和低置信度背景行；
+用真实模型重新生成可用 benchmark._record_tensors（python benchmark.py decode --video ...）。
+"""
+import os
+
+import numpy as np
+import pytest
+
+from detect_new1 import Letterbox, decode, nms, postprocess, postprocess_reference
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+@pytest.fixture(scope="module")
+def tensors():
+    data = np.load(os.path.join(FIXTURES, "decode_outputs.npz"))
+    orig_w, orig_h = (int(v) for v in data["size"])
+    input_w, input_h = (int(v) for v in data["input_size"])
+    return data["outputs"], orig_w, orig_h, input_w, input_h
+
+
+def test_vectorized_matches_reference(tensors):
+    outputs, orig_w, orig_h, input_w, input_h = tensors
+    for out in outputs:
+        result = postprocess([out], orig_w, orig_h, input_w, input_h)
+        assert result  # 每帧都有通过阈值的物体
+        assert result == postprocess_reference([out], orig_w, orig_h, input_w, input_h)
+
+
+def test_nms_suppresses_overlapping_candidates(tensors):
+    outputs, orig_w, orig_h, input_w, input_h = tensors
+    boxes, confs, class_ids = decode([outputs[0]], orig_w, orig_h, input_w, input_h)
+    assert len(nms(boxes, confs, class_ids)) < len(boxes)
+
+
+def test_empty_and_degenerate_outputs():
+    assert postprocess([np.zeros((1, 100, 10), np.float32)], 640, 480) == []
+    boxes, confs, class_ids = decode([np.zeros((1, 100, 5), np.float32)], 640, 480)
+    assert boxes.shape == (0, 4) and len(confs) == 0 and len(class_ids) == 0
+
+
+def test_letterbox_maps_back_to_original_frame():
+    """等比缩放加灰边时，输入中心的框还原为原图中心"""
+    letterbox = Letterbox(320, 320)
+    letterbox(np.zeros((720, 1280, 3), np.uint8))
+    pred = np.zeros((1, 1, 10), np.float32)
+    pred[0, 0, :6] = [160, 160, 40, 20, 0.9, 0.9]
+    result = postprocess([pred], 1280, 720, 320, 320, letterbox=letterbox.params)
+    assert result == [["pen", 640, 360, 0.81]]
@@ -0,0 +1,134 @@
+"""Dispatcher 的优先级、重复指令、抢占与执行期间的状态查询（用假的 execute，不连接机械臂）"""
+import threading
+import time
+
+import pytest
+
+from dispatcher import Dispatcher
+
+PRIORITIES = {"reset": 0, "pick": 1, "drop": 1, "clean": 2}
+
+
+class FakeExecutor:
+    """记录执行顺序；"clean" 一直运行到被取消或被放行，模拟可在安全点退出的长任务"""
+
+    def __init__(self):
+        self.order = []
+        self.cancelled = []
+        self.running = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, job):
+        self.order.append(job.cmd)
+        if job.cmd == "clean":
+            self.running.set()
+            while not self.release.is_set():
+                if job.cancel_event.wait(0.01):
+                    self.cancelled.append(job.cmd)
+                    return
+        elif job.cmd == "fail":
+            raise RuntimeError("执行出错")
+
+
+@pytest.fixture
+def executor():
+    return FakeExecutor()
+
+
+@pytest.fixture
+def dispatcher(executor):
+    dispatcher = Dispatcher(executor, PRIORITIES, preempting={"reset"})
+    yield dispatcher
+    executor.release.set()
+    dispatcher.stop()
+
+
+def start_busy(dispatcher, executor):
+    """提交一个长任务并等到它开始执行，之后提交的指令都在排队"""
+    job = dispatcher.submit("clean")
+    assert executor.running.wait(5)
+    return job
+
+
+def test_priority_order(dispatcher, executor):
+    start_busy(dispatcher, executor)
+    for cmd in ("unknown", "drop", "pick"):
+        assert dispatcher.submit(cmd) is not None
+    executor.release.set()
+    assert dispatcher.wait_idle(5)
+    # 数值小的优先，同优先级按到达顺序，未登记的指令排在最后
+    assert executor.order == ["clean", "drop", "pick", "unknown"]
+    assert dispatcher.completed == 4 and dispatcher.cancelled == 0
+
+
+def test_duplicate_queued_or_running_is_dropped(dispatcher, executor):
+    start_busy(dispatcher, executor)
+    assert dispatcher.submit("clean") is None  # 与执行中的指令重复
+    assert dispatcher.submit("pick") is not None
+    assert dispatcher.submit("pick") is None  # 与排队中的指令重复
+    assert dispatcher.dropped == 2
+    executor.release.set()
+    assert dispatcher.wait_idle(5)
+    assert executor.order == ["clean", "pick"]
+
+
+def test_preempt_cancels_running_and_queued(dispatcher, executor):
+    running = start_busy(dispatcher, executor)
+    queued = [dispatcher.submit("pick"), dispatcher.submit("drop")]
+    reset = dispatcher.submit("reset")
+    assert dispatcher.wait_idle(5)
+    assert running.cancel_event.is_set()
+    assert all(job.cancel_event.is_set() and job.started is None for job in queued)
+    assert not reset.cancel_event.is_set()
+    assert executor.cancelled == ["clean"]
+    assert executor.order == ["clean", "reset"]
+    # 复位在长任务退出后立即开始
+    assert reset.started >= running.finished
+    assert dispatcher.cancelled == 3 and dispatcher.completed == 1
+
+
+def test_no_preempt_when_disabled(executor):
+    dispatcher = Dispatcher(executor, PRIORITIES, preempting={"reset"}, allow_preempt=False)
+    try:
+        running = start_busy(dispatcher, executor)
+        dispatcher.submit("pick")
+        dispatcher.submit("reset")
+        time.sleep(0.05)
+        assert not running.cancel_event.is_set()
+        assert dispatcher.status()["queue"] == ["reset", "pick"]
+        executor.release.set()
+        assert dispatcher.wait_idle(5)
+    finally:
+        dispatcher.stop()
+    assert executor.order == ["clean", "reset", "pick"]
+    assert dispatcher.cancelled == 0 and dispatcher.completed == 3
+
+
+def test_status_while_busy(dispatcher, executor):
+    start_busy(dispatcher, executor)
+    dispatcher.submit("drop")
+    dispatcher.submit("pick")
+    t0 = time.perf_counter()
+    status = dispatcher.status()
+    assert time.perf_counter() - t0 < 0.1  # 不等待正在执行的指令
+    assert status["running"] == "clean"
+    assert not status["cancelling"]
+    assert status["queue"] == ["drop", "pick"]
+    assert status["latency_ms"]["max"] >= 0
+
+    dispatcher.submit("reset")
+    status = dispatcher.status()
+    assert status["cancelling"] or status["running"] != "clean"
+    assert dispatcher.wait_idle(5)
+    status = dispatcher.status()
+    assert status["running"] is None and status["queue"] == []
+    assert len(dispatcher.latencies) == 2
+
+
+def test_error_in_execute_does_not_stop_dispatcher(dispatcher, executor):
+    dispatcher.submit("fail")
+    assert dispatcher.wait_idle(5)
+    dispatcher.submit("pick")
+    assert dispatcher.wait_idle(5)
+    assert executor.order == ["fail", "pick"]
+    assert dispatcher.completed == 2
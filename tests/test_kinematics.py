@@ -0,0 +1,50 @@
+"""批量逆解的构型选择（kinematics.select）"""
+import numpy as np
+import pytest
+
+import kinematics
+from kinematics import ELBOW_DOWN, ELBOW_UP, forward_kinematics, inverse_kinematics, select
+
+
+def test_prefers_elbow_down_when_both_valid():
+    result = inverse_kinematics(200, 100)
+    assert result.within_limits.all()
+    theta1, theta2, valid = select(result)
+    assert valid and theta2 >= 0
+    assert theta1 == result.theta1[ELBOW_DOWN] and theta2 == result.theta2[ELBOW_DOWN]
+    theta1, theta2, valid = select(result, prefer=ELBOW_UP)
+    assert valid and theta2 <= 0
+
+
+def test_falls_back_when_preferred_violates_limits():
+    """(0, -300) 肘部向下时大臂超出 -89° 限位，改用肘部向上"""
+    result = inverse_kinematics(0, -300)
+    assert not result.within_limits[ELBOW_DOWN] and result.within_limits[ELBOW_UP]
+    theta1, theta2, valid = select(result)
+    assert valid
+    assert theta1 == result.theta1[ELBOW_UP] and theta2 == result.theta2[ELBOW_UP]
+
+
+@pytest.mark.parametrize("x, y", [
+    (500, 0),  # 超出最大半径
+    (10, 10),  # 小于最小半径
+    (-50, -380),  # 可达但两种构型都超出限位
+])
+def test_invalid_points(x, y):
+    assert not select(inverse_kinematics(x, y))[2]
+
+
+def test_batch_matches_pointwise_and_round_trips():
+    xs, ys = np.meshgrid(np.linspace(-380, 380, 41), np.linspace(-380, 380, 41))
+    theta1, theta2, valid = select(inverse_kinematics(xs, ys))
+    assert valid.shape == xs.shape and valid.any() and not valid.all()
+    for i, j in zip(*np.nonzero(valid)):
+        point = select(inverse_kinematics(xs[i, j], ys[i, j]))
+        assert point[0] == theta1[i, j] and point[1] == theta2[i, j]
+    # 选出的角度都在限位内，正解回到原坐标
+    assert (theta1[valid] >= kinematics.THETA1_LIMITS[0]).all()
+    assert (theta1[valid] <= kinematics.THETA1_LIMITS[1]).all()
+    assert (np.abs(theta2[valid]) <= kinematics.THETA2_LIMITS[1]).all()
+    x, y = forward_kinematics(theta1[valid], theta2[valid])
+    np.testing.assert_allclose(x, xs[valid], atol=1e-6)
+    np.testing.assert_allclose(y, ys[valid], atol=1e-6)
@@ -0,0 +1,58 @@
+"""运动指令优化（scara_1.optimize_moves）"""
+from scara_1 import optimize_moves
+
+HOME = (0, 0, 0, 100, 0)
+
+
+def test_unknown_state_keeps_first_move():
+    moves = [(10, 20, 0, 100, 0), (10, 20, 0, 100, 0)]
+    out, owner = optimize_moves(moves, None)
+    assert out == [(10, 20, 0, 100, 0)]
+    assert owner == [0, 0]
+
+
+def test_move_equal_to_state_is_skipped():
+    out, owner = optimize_moves([HOME], HOME)
+    assert out == [] and owner == [-1]
+
+
+def test_gripper_only_change_merges_into_previous_move():
+    """移动到物体上方后原地张开夹爪：合并为一条（固件运动到位后才转舵机，顺序不变）"""
+    moves = [(10, 20, 0, 100, 0), (10, 20, 0, 100, 105)]
+    out, owner = optimize_moves(moves, HOME)
+    assert out == [(10, 20, 0, 100, 105)]
+    assert owner == [0, 0]
+
+
+def test_no_merge_when_previous_move_changes_gripper():
+    """前一条运动本身已改变夹爪时不能再并入（否则中间的夹爪动作会丢失）"""
+    moves = [(10, 20, 0, 0, 105), (10, 20, 0, 0, 0)]
+    out, owner = optimize_moves(moves, (10, 20, 0, 0, 0))
+    assert out == moves
+    assert owner == [0, 1]
+
+
+def test_pick_and_place_sequence():
+    moves = [
+        (10, 20, 0, 100, 0),  # 物体上方
+        (10, 20, 0, 100, 0),  # 张开夹爪（已张开）
+        (10, 20, 0, 0, 0),  # 下降
+        (10, 20, 0, 0, 105),  # 闭合
+        (10, 20, 0, 100, 105),  # 提升
+        (-30, 40, 0, 100, 105),  # 放置点上方
+        (-30, 40, 0, 50, 105),  # 下降
+        (-30, 40, 0, 50, 0),  # 松开
+        (0, 0, 0, 100, 0),  # 返回
+    ]
+    out, owner = optimize_moves(moves, HOME)
+    assert out == [
+        (10, 20, 0, 100, 0),
+        (10, 20, 0, 0, 105),
+        (10, 20, 0, 100, 105),
+        (-30, 40, 0, 100, 105),
+        (-30, 40, 0, 50, 0),
+        (0, 0, 0, 100, 0),
+    ]
+    assert owner == [0, 0, 1, 1, 2, 3, 4, 4, 5]
+    # 每条原指令都随不早于它之前指令的优化后指令完成
+    assert owner == sorted(owner)
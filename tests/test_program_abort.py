@@ -0,0 +1,109 @@
+"""固件程序执行中的取消：停在路径点上，之后的指令照常执行"""
+import threading
+
+import pytest
+
+import scara_1
+from dispatcher import Dispatcher
+from scara_1 import Cancelled, SCARAController
+from sim_arm import VirtualArm
+
+# 每个路径点只转动 theta1，关节位置可以唯一确定停在哪个路径点
+MOVES = [(10 * i, 0, 0, 100, 0) for i in range(1, 7)]
+SPEED = 1000
+
+
+@pytest.fixture(params=[scara_1.PROTO_BINARY, scara_1.PROTO_ASCII])
+def setup(request):
+    with VirtualArm(rate=8.0) as arm:
+        controller = SCARAController(arm.port, protocol=request.param)
+        controller.cancel_event = threading.Event()
+        try:
+            yield arm, controller
+        finally:
+            controller.close()
+
+
+def at_waypoint(arm, k):
+    return arm.joints()[0] == pytest.approx(MOVES[k][0], abs=0.05)
+
+
+def test_cancel_stops_at_waypoint(setup):
+    arm, controller = setup
+    reached = []
+
+    def progress(k):
+        reached.append(k)
+        if k == 1:
+            controller.cancel_event.set()
+
+    with pytest.raises(Cancelled):
+        controller.execute_joint_program(MOVES, speed=SPEED, on_progress=progress)
+    assert reached == list(range(len(reached)))
+    assert 1 <= reached[-1] < len(MOVES) - 1
+    assert at_waypoint(arm, reached[-1])
+    assert controller.state == MOVES[reached[-1]]
+    assert arm.aborted == 1
+
+    controller.cancel_event.clear()
+    assert controller.move_joints(0, 0, 0, 100, 0, speed=4000)
+    assert arm.joints()[0] == 0
+
+
+def test_program_without_cancel_completes(setup):
+    arm, controller = setup
+    reached = []
+    assert controller.execute_joint_program(MOVES, speed=SPEED, on_progress=reached.append)
+    assert reached == list(range(len(MOVES)))
+    assert at_waypoint(arm, len(MOVES) - 1)
+    assert controller.state == MOVES[-1]
+    assert arm.aborted == 0
+
+
+def test_late_abort_is_ignored(setup):
+    """程序执行完后才到达的中止字节被固件丢弃，不影响下一条指令"""
+    arm, controller = setup
+    assert controller.execute_joint_program(MOVES[:2], speed=4000)
+    controller._loop.call_soon_threadsafe(controller.core.abort_program)
+    assert controller.move_joints(0, 0, 0, 100, 0, speed=4000)
+    assert controller.execute_joint_program(MOVES[:2], speed=4000)
+    assert arm.aborted == 0
+
+
+def test_preempt_lands_at_waypoint_boundary():
+    """复位抢占正在执行的程序：程序停在一个路径点上，复位在程序结束前开始执行"""
+    with VirtualArm(rate=8.0) as arm:
+        controller = SCARAController(arm.port)
+        events = []
+        started = threading.Event()
+
+        def execute(job):
+            controller.cancel_event = job.cancel_event
+            if job.cmd == "clean":
+                try:
+                    controller.execute_joint_program(MOVES, speed=SPEED, on_progress=lambda k: (
+                        events.append(("progress", k)), started.set()))
+                except Cancelled:
+                    events.append(("cancelled", arm.joints()[0]))
+            else:
+                events.append(("reset", arm.joints()[0]))
+                controller.move_joints(0, 0, 0, 100, 0, speed=4000)
+
+        dispatcher = Dispatcher(execute, {"reset": 0, "clean": 1}, preempting={"reset"})
+        try:
+            dispatcher.submit("clean")
+            assert started.wait(10)
+            dispatcher.submit("reset")
+            assert dispatcher.wait_idle(30)
+        finally:
+            dispatcher.stop()
+            controller.close()
+
+    kinds = [kind for kind, _ in events]
+    assert kinds[-2:] == ["cancelled", "reset"]
+    last = max(k for kind, k in events if kind == "progress")
+    assert last < len(MOVES) - 1
+    # 取消时与复位开始时机械臂都停在最后一个回复进度的路径点上
+    assert events[-2][1] == pytest.approx(MOVES[last][0], abs=0.05)
+    assert events[-1][1] == events[-2][1]
+    assert dispatcher.cancelled == 1 and dispatcher.completed == 1
@@ -0,0 +1,67 @@
+"""二进制串口协议：CRC、帧打包与 FrameDecoder 拆帧"""
+import random
+
+import pytest
+
+from scara_1 import (FRAME_ACK, FRAME_CMD, FRAME_DONE, FRAME_PROGRESS, FRAME_SYNC, MAX_PAYLOAD,
+                     FrameDecoder, crc16, decode_cmd, encode_cmd, encode_frame)
+
+
+def test_crc16_ccitt_false_check_value():
+    assert crc16(b"123456789") == 0x29B1
+
+
+def test_cmd_round_trip():
+    params = [120, -45, 0, 50, 105, 0, 4000, 6000, 0]
+    decoder = FrameDecoder()
+    decoder.feed(encode_cmd(300, 2, params))
+    frame_type, seq, payload = decoder.frames.popleft()
+    assert (frame_type, seq) == (FRAME_CMD, 300 & 0xFF)
+    assert decode_cmd(payload) == (2, params)
+    assert decoder.errors == 0
+
+
+def test_split_across_reads():
+    data = encode_frame(FRAME_ACK, 1) + encode_frame(FRAME_PROGRESS, 2, b"\x03") + encode_frame(FRAME_DONE, 3)
+    decoder = FrameDecoder()
+    for b in data:
+        decoder.feed(bytes([b]))
+    assert list(decoder.frames) == [(FRAME_ACK, 1, b""), (FRAME_PROGRESS, 2, b"\x03"), (FRAME_DONE, 3, b"")]
+
+
+@pytest.mark.parametrize("junk", [b"WP 3\r\n", b"\xa5", b"\xa5\x5a\x01", b"\x00\xa5\xa5"])
+def test_resync_after_garbage(junk):
+    decoder = FrameDecoder()
+    decoder.feed(junk + encode_frame(FRAME_DONE, 7))
+    assert list(decoder.frames) == [(FRAME_DONE, 7, b"")]
+
+
+def test_corrupted_frame_rejected_and_next_recovered():
+    bad = bytearray(encode_frame(FRAME_PROGRESS, 4, b"\x05"))
+    bad[-3] ^= 0xFF  # 改坏数据
+    decoder = FrameDecoder()
+    decoder.feed(bytes(bad) + encode_frame(FRAME_ACK, 5))
+    assert list(decoder.frames) == [(FRAME_ACK, 5, b"")]
+    assert decoder.errors == 1
+
+
+def test_oversized_length_rejected():
+    header = FRAME_SYNC + bytes([1, FRAME_DONE, 0, MAX_PAYLOAD + 1])
+    decoder = FrameDecoder()
+    decoder.feed(header + encode_frame(FRAME_DONE, 9))
+    assert list(decoder.frames) == [(FRAME_DONE, 9, b"")]
+    assert decoder.errors >= 1
+
+
+def test_random_noise_between_frames():
+    rng = random.Random(0)
+    frames = [(FRAME_PROGRESS, i, bytes([i])) for i in range(50)]
+    stream = b""
+    for frame_type, seq, payload in frames:
+        # 噪声中不含同步头，避免偶然构成合法帧
+        stream += bytes(rng.choice(range(0x00, 0xa5)) for _ in range(rng.randint(0, 8)))
+        stream += encode_frame(frame_type, seq, payload)
+    decoder = FrameDecoder()
+    for i in range(0, len(stream), 13):
+        decoder.feed(stream[i:i + 13])
+    assert list(decoder.frames) == frames
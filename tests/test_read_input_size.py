@@ -0,0 +1,31 @@
+"""从ONNX模型读取输入尺寸"""
+import onnx
+import pytest
+from onnx import TensorProto, helper
+
+from detect_new1 import INPUT_H, INPUT_W, read_input_size
+
+
+def _model(path, shape):
+    x = helper.make_tensor_value_info("images", TensorProto.FLOAT, shape)
+    y = helper.make_tensor_value_info("output", TensorProto.FLOAT, shape)
+    graph = helper.make_graph([helper.make_node("Identity", ["images"], ["output"])], "g", [x], [y])
+    onnx.save(helper.make_model(graph), str(path))
+    return str(path)
+
+
+def test_static_size(tmp_path):
+    assert read_input_size(_model(tmp_path / "m.onnx", [1, 3, 320, 416])) == (416, 320)
+
+
+def test_dynamic_size_uses_default(tmp_path):
+    assert read_input_size(_model(tmp_path / "m.onnx", [1, 3, "h", "w"])) == (INPUT_W, INPUT_H)
+
+
+def test_unreadable_model_raises(tmp_path):
+    path = tmp_path / "broken.onnx"
+    path.write_bytes(b"not a model")
+    with pytest.raises(RuntimeError):
+        read_input_size(str(path))
+    with pytest.raises(RuntimeError):
+        read_input_size(str(tmp_path / "missing.onnx"))
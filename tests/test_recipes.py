@@ -0,0 +1,90 @@
+"""编译后的配方模板与原来两处手写的抓取放置流程一致"""
+import pytest
+
+from recipes import HOME_POSE, RECIPES, compile_recipes
+from scara_1 import SCARAController, optimize_moves
+
+# 原 run_1.DROP_LOCATIONS（自动清理），配方以它为准
+LEGACY_DROPS = {
+    "eraser": (115, -80, 50),
+    "pen": (115, -80, 50),
+    "sharpener": (115, -90, 50),
+    "paper": (-260, 180, 50),
+}
+OBJECTS = [(250, 100), (200, -150), (300, -50)]
+
+
+def legacy_run_1_steps(obj_x, obj_y, drop_x, drop_y, drop_z, return_home=True):
+    """原 run_1.pick_and_place_steps：(说明, x, y, z, phi, gripper, 运动段, 视野事件)"""
+    if not return_home:
+        return legacy_run_1_steps(obj_x, obj_y, drop_x, drop_y, drop_z)[:8] + [
+            ("步骤9：夹爪已张开（放置成功）", drop_x, drop_y, drop_z, 0, 0, "place", None)]
+    return [
+        ("步骤1：已移动到物体上方", obj_x, obj_y, 100, 0, 0, "transit", None),
+        ("步骤2：夹爪已张开", obj_x, obj_y, 100, 0, 0, "grasp", None),
+        ("步骤3：已下降到抓取高度", obj_x, obj_y, 0, 0, 0, "approach", None),
+        ("步骤4：夹爪已闭合（抓取成功）", obj_x, obj_y, 0, 0, 105, "grasp", None),
+        ("步骤5：已提升到安全高度", obj_x, obj_y, 100, 0, 105, "lift", None),
+        ("步骤6：已到达过渡点", None, None, None, None, None, None, None),
+        ("步骤7：已到达放置位置上方", drop_x, drop_y, 100, 0, 105, "transit", True),
+        ("步骤8：已下降到放置高度", drop_x, drop_y, drop_z, 0, 0, "place", None),
+        ("步骤9：夹爪已张开（放置成功）", drop_x, drop_y, drop_z, 0, 0, "place", False),
+        ("步骤10：已返回初始位置", *HOME_POSE, 0, 0, "transit", True),
+    ]
+
+
+def legacy_run_top_moves(obj_x, obj_y, drop_x, drop_y, drop_z):
+    """原 DualSerialHandler.pick_specific_object 的 move_position 序列（未给出的夹爪沿用上一步）"""
+    return [
+        (obj_x, obj_y, 100, 0, 0, "transit"),
+        (obj_x, obj_y, 100, 0, 0, "grasp"),
+        (obj_x, obj_y, 0, 0, 0, "approach"),
+        (obj_x, obj_y, 0, 0, 105, "grasp"),
+        (obj_x, obj_y, 100, 0, 105, "lift"),
+        (drop_x, drop_y, 100, 0, 105, "transit"),
+        (drop_x, drop_y, drop_z, 0, 105, "place"),
+        (drop_x, drop_y, drop_z, 0, 0, "place"),
+        (384.5, 0, 100, 0, 0, "transit"),
+    ]
+
+
+def joints(x, y, z, phi, gripper):
+    """与原来 move_position 相同的逆解与取整（不连接串口）"""
+    arm = SCARAController.__new__(SCARAController)
+    arm.L1, arm.L2 = 228.0, 156.5
+    theta1, theta2 = arm.inverse_kinematics(x, y)
+    return int(theta1), int(theta2), int(phi), int(z), int(gripper)
+
+
+@pytest.fixture(scope="module")
+def templates():
+    return compile_recipes()
+
+
+def test_recipes_use_the_auto_clean_drop_locations(templates):
+    assert {name: t.drop for name, t in templates.items()} == LEGACY_DROPS
+    assert set(RECIPES) == set(LEGACY_DROPS)
+
+
+@pytest.mark.parametrize("name", sorted(LEGACY_DROPS))
+@pytest.mark.parametrize("obj", OBJECTS)
+@pytest.mark.parametrize("return_home", [True, False])
+def test_template_matches_legacy_run_1_steps(templates, name, obj, return_home):
+    legacy = legacy_run_1_steps(*obj, *LEGACY_DROPS[name], return_home)
+    steps = templates[name].moves(*obj, return_home=return_home)
+    assert [(label, segment, clear) for label, _, segment, clear in steps] == \
+           [(s[0], s[6], s[7]) for s in legacy]
+    assert [move is None for _, move, _, _ in steps] == [s[1] is None for s in legacy]
+    new = [move for _, move, _, _ in steps if move is not None]
+    old = [joints(*s[1:6]) for s in legacy if s[1] is not None]
+    # 原流程在下降到放置高度时就张开夹爪，模板与 run_top 一样先下降再张开；固件在运动到位后才转动舵机，
+    # 合并只改变夹爪的运动后两者发送给固件的指令完全相同
+    assert optimize_moves(new)[0] == optimize_moves(old)[0]
+
+
+@pytest.mark.parametrize("name", sorted(LEGACY_DROPS))
+@pytest.mark.parametrize("obj", OBJECTS)
+def test_template_matches_legacy_run_top_moves(templates, name, obj):
+    new = [(move, segment) for _, move, segment, _ in templates[name].moves(*obj) if move is not None]
+    old = [(joints(*m[:5]), m[5]) for m in legacy_run_top_moves(*obj, *LEGACY_DROPS[name])]
+    assert new == old
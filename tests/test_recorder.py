@@ -0,0 +1,26 @@
+"""飞行记录：写入、读回与关闭后的回调"""
+from recorder import REC_DETECTION, REC_INPUT, FlightRecorder, RecordReader
+
+
+def test_records_round_trip(tmp_path):
+    path = tmp_path / "session.rec"
+    rec = FlightRecorder(str(path), frames=False)
+    rec.input("pick", keyword="抓取")
+    rec.detection(None, [{"cls": 0}])
+    rec.command(1, [10, 20], True, 0.0, 0.5, [])
+    rec.close()
+    with RecordReader(str(path)) as reader:
+        assert [r for _, r in reader.json_records(REC_INPUT)] == [{"cmd": "pick", "keyword": "抓取", "source": "uart"}]
+        assert [r["result"] for _, r in reader.json_records(REC_DETECTION)] == [[{"cls": 0}]]
+        (command,) = reader.commands()
+        assert command[1] == 1 and command[2]
+
+
+def test_callbacks_after_close_are_ignored(tmp_path):
+    """关闭后仍在运行的指令回调与输入不会抛出异常"""
+    rec = FlightRecorder(str(tmp_path / "session.rec"))
+    rec.close()
+    rec.input("pick")
+    rec.command(1, [1], True, 0.0, 0.5, [])
+    rec.detection(None, [])
+    rec.close()
@@ -0,0 +1,67 @@
+"""场景变化门控：噪声下命中缓存，放上或拿走小物体、整体换景时重新检测"""
+import cv2
+import numpy as np
+import pytest
+
+from detect_new1 import SceneGate
+
+RESULT = [["pen", 640, 360, 0.9]]
+
+
+@pytest.fixture
+def desk():
+    rng = np.random.default_rng(0)
+    return cv2.GaussianBlur(rng.integers(60, 200, (720, 1280, 3), dtype=np.uint8), (31, 31), 0)
+
+
+def _noisy(frame, seed=1, sigma=4):
+    rng = np.random.default_rng(seed)
+    return np.clip(frame + rng.normal(0, sigma, frame.shape), 0, 255).astype(np.uint8)
+
+
+def _gate(frame):
+    gate = SceneGate()
+    gate.store(gate.signature(frame), RESULT)
+    return gate
+
+
+def test_sensor_noise_hits_cache(desk):
+    gate = _gate(desk)
+    assert gate.lookup(gate.signature(_noisy(desk))) == RESULT
+
+
+@pytest.mark.parametrize("x, y, w, h", [
+    (600, 300, 180, 30),  # 横放的笔
+    (603, 302, 30, 180),  # 竖放的笔
+    (100, 600, 60, 40),  # 橡皮
+    (1000, 100, 25, 25),  # 更小的物体
+])
+def test_small_object_placed_misses_cache(desk, x, y, w, h):
+    gate = _gate(desk)
+    frame = _noisy(desk)
+    frame[y:y + h, x:x + w] = (30, 30, 200)
+    signature = gate.signature(frame)
+    # 整幅平均差远低于阈值，只有按分块比较才能发现
+    assert np.abs(signature - gate._signature).mean() < gate.threshold
+    assert gate.lookup(signature) is None
+
+
+def test_small_object_removed_misses_cache(desk):
+    frame = desk.copy()
+    frame[300:330, 600:780] = (30, 30, 200)
+    gate = _gate(frame)
+    assert gate.lookup(gate.signature(_noisy(desk))) is None
+
+
+def test_whole_scene_change_misses_cache(desk):
+    gate = _gate(desk)
+    assert gate.lookup(gate.signature(255 - desk)) is None
+
+
+def test_invalidate_and_max_age(desk):
+    gate = _gate(desk)
+    gate.invalidate()
+    assert gate.lookup(gate.signature(desk)) is None
+    gate = _gate(desk)
+    gate.max_age = -1
+    assert gate.lookup(gate.signature(desk)) is None
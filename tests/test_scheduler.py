@@ -0,0 +1,92 @@
+"""抓取顺序规划：精确解、贪心解与是否返回初始位置"""
+import itertools
+
+import numpy as np
+import pytest
+
+import scheduler
+from scheduler import HOME_POSE, _exact_order, _greedy_order, _total, plan
+
+
+def _instance(n, seed):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(1, 10, n), rng.uniform(1, 10, (n, n)), rng.uniform(1, 10, n)
+
+
+def _brute_force(start, transit, end):
+    return min(_total(list(p), start, transit, end) for p in itertools.permutations(range(len(start))))
+
+
+@pytest.mark.parametrize("n", range(1, 7))
+@pytest.mark.parametrize("seed", range(5))
+def test_exact_order_is_optimal(n, seed):
+    start, transit, end = _instance(n, seed)
+    order = _exact_order(start, transit, end)
+    assert sorted(order) == list(range(n))
+    assert _total(order, start, transit, end) == pytest.approx(_brute_force(start, transit, end))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_greedy_order_is_a_permutation_no_better_than_exact(seed):
+    start, transit, end = _instance(6, seed)
+    order = _greedy_order(start, transit, end)
+    assert sorted(order) == list(range(6))
+    assert _total(order, start, transit, end) >= _brute_force(start, transit, end) - 1e-9
+    # 两两交换后已是局部最优
+    best = _total(order, start, transit, end)
+    for i, j in itertools.combinations(range(6), 2):
+        swapped = list(order)
+        swapped[i], swapped[j] = swapped[j], swapped[i]
+        assert _total(swapped, start, transit, end) >= best - 1e-9
+
+
+# 机械臂坐标系中可达的抓取点，放置点为初始位置（不在相机视野内）或视野内的 (100, 200)
+POINTS = [(250, 100), (200, -150), (300, -50), (150, 250), (280, 150), (220, 0),
+          (320, 60), (180, -80), (260, -120), (240, 180), (300, 100)]
+DROPS = {"away": HOME_POSE, "in_view": (100.0, 200.0, 100.0)}
+
+
+def _picks(n, cls="away"):
+    return [(cls, x, y) for x, y in POINTS[:n]]
+
+
+def test_exact_below_limit_greedy_above(monkeypatch):
+    calls = []
+    for name in ("_exact_order", "_greedy_order"):
+        original = getattr(scheduler, name)
+        monkeypatch.setattr(scheduler, name,
+                            lambda *args, _name=name, _f=original: calls.append(_name) or _f(*args))
+    plan(_picks(scheduler.EXACT_LIMIT), DROPS)
+    plan(_picks(scheduler.EXACT_LIMIT + 1), DROPS)
+    assert calls == ["_exact_order", "_greedy_order"]
+
+
+def test_plan_keeps_every_pick_once():
+    picks = _picks(len(POINTS))
+    result = plan(picks, DROPS)
+    assert sorted(p for p, _ in result) == sorted(picks)
+
+
+def test_plan_returns_home_only_after_the_last_pick():
+    """放置点就是初始位置附近时，直接前往下一个物体更快"""
+    result = plan(_picks(4), DROPS)
+    assert [home for _, home in result] == [False, False, False, True]
+
+
+def test_single_pick_returns_home():
+    assert plan(_picks(1), DROPS) == [(("away", 250, 100), True)]
+    assert plan([], DROPS) == []
+
+
+def test_drop_in_view_returns_home_when_pipelined():
+    """流水线模式下放置点在视野内时必须离开视野才能检测"""
+    picks = _picks(3, "in_view")
+    assert all(home for _, home in plan(picks, DROPS, pipelined=True))
+    assert [home for _, home in plan(picks, DROPS, pipelined=False)] == [False, False, True]
+
+
+def test_unreachable_picks_go_last_and_return_home():
+    picks = [("away", 600, 0)] + _picks(2)
+    result = plan(picks, DROPS)
+    assert result[-1] == (("away", 600, 0), True)
+    assert sorted(p for p, _ in result[:2]) == sorted(_picks(2))
@@ -0,0 +1,55 @@
+"""分段计时：trace 环形缓冲区与直方图"""
+import os
+
+import pytest
+
+import tracing
+from tracing import span
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    tracing.reset()
+    yield
+    tracing.reset()
+
+
+def test_nested_spans_form_one_trace():
+    with span("command", cmd="b"):
+        with span("send_cmd", cmd=2):
+            pass
+    (trace,) = tracing.recent()
+    assert trace["name"] == "command"
+    assert [(s["name"], s["depth"]) for s in trace["spans"]] == [("command", 0), ("send_cmd", 1)]
+
+
+def test_untraced_spans_do_not_evict_traces():
+    """健康检查的空指令只记入直方图，不会把真正的指令挤出环形缓冲区"""
+    with span("command", cmd="b"):
+        pass
+    for _ in range(tracing.TRACE_BUFFER + 10):
+        with span("send_cmd", trace=False, cmd=0):
+            pass
+    assert [t["name"] for t in tracing.recent()] == ["command"]
+    counts = {key: count for key, (_, _, count) in tracing.snapshot().items()}
+    assert counts[("send_cmd", (("cmd", "0"),))] == tracing.TRACE_BUFFER + 10
+
+
+def test_render_prometheus_histogram():
+    tracing.observe("wait_done", 0.3, cmd=2)
+    text = tracing.render()
+    assert f'{tracing.METRIC}_bucket{{span="wait_done",cmd="2",le="0.5"}} 1' in text
+    assert f'{tracing.METRIC}_bucket{{span="wait_done",cmd="2",le="0.25"}} 0' in text
+    assert f'{tracing.METRIC}_count{{span="wait_done",cmd="2"}} 1' in text
+
+
+def test_dump_keeps_only_latest_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_DUMP_DIR", str(tmp_path))
+    monkeypatch.setattr(tracing, "TRACE_DUMP_KEEP", 3)
+    for i in range(5):
+        # 同一秒内的文件名相同，模拟不同时间的 dump
+        path = tracing.dump(traces=[{"name": str(i)}])
+        os.rename(path, tmp_path / f"traces-{i}.json")
+        os.utime(tmp_path / f"traces-{i}.json", (i, i))
+    tracing.dump(traces=[])
+    assert len(list(tmp_path.glob("traces-*.json"))) == 3
@@ -0,0 +1,84 @@
+"""WorldModel：检测结果关联、物体过期与抓取状态记录"""
+from tracker import DONE, FAILED, IGNORED, PENDING, WorldModel
+
+
+def _ids(world):
+    return {t.id: (t.cls, t.cx, t.cy) for t in world.tracks}
+
+
+def test_ids_persist_through_jitter():
+    world = WorldModel(match_dist=40)
+    world.update([["pen", 100, 100, 0.9], ["pen", 300, 100, 0.8], ["eraser", 100, 300, 0.7]])
+    first = {(cls, cx, cy): tid for tid, (cls, cx, cy) in _ids(world).items()}
+    # 每个物体抖动几个像素，检测顺序也打乱
+    world.update([["eraser", 104, 297, 0.7], ["pen", 305, 96, 0.8], ["pen", 97, 103, 0.9]])
+    assert len(world.tracks) == 3
+    assert _ids(world) == {
+        first[("pen", 100, 100)]: ("pen", 97, 103),
+        first[("pen", 300, 100)]: ("pen", 305, 96),
+        first[("eraser", 100, 300)]: ("eraser", 104, 297),
+    }
+
+
+def test_different_class_or_far_away_is_a_new_object():
+    world = WorldModel(match_dist=40)
+    world.update([["pen", 100, 100, 0.9]])
+    (pen,) = world.tracks
+    world.update([["eraser", 102, 100, 0.9], ["pen", 200, 100, 0.9]])
+    assert pen.misses == 1
+    assert sorted(t.id for t in world.tracks if t.misses == 0) == [2, 3]
+
+
+def test_tracks_expire_after_consecutive_misses():
+    world = WorldModel(max_misses=2)
+    world.update([["pen", 100, 100, 0.9]])
+    (pen,) = world.tracks
+    world.update([])
+    assert world.tracks == [pen] and pen.misses == 1
+    assert world.pending() == []  # 本次未检测到，不规划
+    world.update([["pen", 102, 101, 0.9]])
+    assert pen.misses == 0 and world.pending() == [pen]  # 一次漏检不会换编号
+    world.update([])
+    world.update([])
+    assert world.tracks == [] and world.history == [pen]
+
+
+def test_failed_target_is_not_repicked_right_away():
+    world = WorldModel(max_attempts=2, retry_delay=1)
+    world.update([["pen", 100, 100, 0.9], ["eraser", 300, 100, 0.9]])
+    pen = next(t for t in world.tracks if t.cls == "pen")
+    world.mark_failed(pen)
+    assert pen.status == PENDING and pen.attempts == 1
+    world.update([["pen", 101, 100, 0.9], ["eraser", 300, 100, 0.9]])
+    assert [t.cls for t in world.pending()] == ["eraser"]
+    world.update([["pen", 101, 100, 0.9], ["eraser", 300, 100, 0.9]])
+    assert pen in world.pending()
+    world.mark_failed(pen)
+    assert pen.status == FAILED
+    for _ in range(3):
+        world.update([["pen", 101, 100, 0.9]])
+        assert world.pending() == []
+
+
+def test_done_object_seen_again_is_retried_until_max_attempts():
+    world = WorldModel(max_attempts=2)
+    world.update([["pen", 100, 100, 0.9]])
+    (pen,) = world.tracks
+    world.mark_done(pen)
+    assert world.pending() == []
+    world.update([["pen", 100, 100, 0.9]])  # 放置后仍在原处：实际没有抓走
+    assert pen.status == PENDING and world.pending() == [pen]
+    world.mark_done(pen)
+    world.update([["pen", 100, 100, 0.9]])
+    assert pen.status == FAILED
+
+
+def test_summary_counts_current_and_expired_tracks():
+    world = WorldModel(max_misses=1)
+    world.update([["pen", 100, 100, 0.9], ["eraser", 300, 100, 0.9], ["scale", 500, 100, 0.9]])
+    pen, eraser, scale = sorted(world.tracks, key=lambda t: t.cx)
+    world.mark_done(pen)
+    world.mark_ignored(scale)
+    world.update([["eraser", 300, 100, 0.9], ["scale", 500, 100, 0.9]])
+    assert world.history == [pen]
+    assert world.summary() == {DONE: 1, PENDING: 1, IGNORED: 1}
@@ -0,0 +1,62 @@
+"""工作空间地图：吸附后的点一定可达且留有余量"""
+import numpy as np
+import pytest
+
+import kinematics
+from workspace import SNAP_LIMIT, Workspace, build
+
+
+@pytest.fixture(scope="module")
+def ws():
+    return Workspace(*build())
+
+
+@pytest.fixture(scope="module")
+def points():
+    reach = kinematics.L1 + kinematics.L2
+    return np.random.default_rng(0).uniform(-reach - 20, reach + 20, (5000, 2))
+
+
+def _select(xy):
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    return kinematics.select(kinematics.inverse_kinematics(xy[:, 0], xy[:, 1]))
+
+
+def test_snapped_points_are_reachable_with_margin(ws, points):
+    half = ws.res / 2
+    offsets = np.array([(dx, dy) for dx in (-half, 0, half) for dy in (-half, 0, half)])
+    snapped = 0
+    for x, y in points:
+        s = ws.snap(x, y)
+        if s is None:
+            continue
+        snapped += 1
+        assert np.hypot(s[0] - x, s[1] - y) <= SNAP_LIMIT
+        # 吸附点所在的整格都可达：逆解误差或标定的小偏差不会让它落到工作空间外
+        theta1, theta2, valid = _select(np.asarray(s) + offsets)
+        assert valid.all(), (x, y, s)
+        lo1, hi1 = kinematics.THETA1_LIMITS
+        lo2, hi2 = kinematics.THETA2_LIMITS
+        assert ((theta1 > lo1) & (theta1 < hi1) & (theta2 > lo2) & (theta2 < hi2)).all(), (x, y, s)
+    assert snapped > len(points) // 4
+
+
+def test_points_well_inside_are_not_moved(ws, points):
+    grid = np.arange(-2, 3) * ws.res
+    around = np.array([(dx, dy) for dx in grid for dy in grid])
+    for x, y in points:
+        if _select((x, y) + around)[2].all():
+            assert ws.snap(x, y) == (x, y)
+
+
+def test_points_far_outside_are_rejected(ws):
+    reach = kinematics.L1 + kinematics.L2
+    assert ws.snap(reach + SNAP_LIMIT + 5, 0) is None
+    assert ws.snap(0, 0) is None  # 底座处，距可达区域超过吸附距离
+    assert ws.snap(10 * reach, 0) is None  # 超出网格
+
+
+def test_slightly_outside_snaps_inward(ws):
+    reach = kinematics.L1 + kinematics.L2
+    x, y = ws.snap(reach + 1, 0)
+    assert np.hypot(x, y) < reach and _select((x, y))[2].all()
@@ -0,0 +1,200 @@
+"""轻量级分段计时：span 与内存直方图
+
+用 span("名称") 包住一段代码即可计时，耗时按名称（及可选标签）累计到直方图，
+render() 输出 Prometheus 文本格式，由 LLM_talk_AGENT 的 /metrics 提供。
+同一线程内嵌套的 span 组成一条 trace（如一条指令中的检测、逆解、串口指令与各抓取步骤），
+最外层 span 结束时放入环形缓冲区，保留最近 TRACE_BUFFER 条，供 /traces 或 dump() 事后分析。
+不在 span 中的耗时（如串口事件循环中的等待）可用 observe() 直接记入直方图。
+
+每个 span 只做两次 perf_counter 和一次加锁累加，开销为微秒级（python benchmark.py tracing）。
+"""
+import bisect
+import collections
+import functools
+import glob
+import json
+import os
+import threading
+import time
+
+TRACING = True  # False 时 span 不计时，直接执行
+TRACE_BUFFER = 200  # 保留的最近 trace 条数
+MAX_SPANS = 1000  # 一条 trace 最多记录的 span 数（自动清理一次会产生很多串口指令）
+TRACE_DUMP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces")  # dump() 的默认目录
+TRACE_DUMP_KEEP = 20  # 默认目录中最多保留的 dump 文件数，超出时删除最旧的
+METRIC = "scara_span_seconds"
+
+# 直方图桶上限（秒），覆盖逆解的几十微秒到语音识别、自动清理的几十秒
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # 最后一格为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+_lock = threading.Lock()
+_histograms = {}  # (名称, ((标签, 值), ...)) -> Histogram
+_traces = collections.deque(maxlen=TRACE_BUFFER)
+_local = threading.local()
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def observe(name, seconds, **labels):
+    """直接记录一次耗时（不进入 trace）"""
+    if not TRACING:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = Histogram()
+        hist.observe(seconds)
+
+
+class span:
+    """计时上下文，也可作装饰器：with span("send_cmd", cmd=2): ... / @span("baidu_stt")
+
+    标签（关键字参数）会成为直方图的标签，取值种类应有限；只需写入 trace 的信息用 note()。
+    trace=False 时只记入直方图，不进入 trace（如健康检查的空指令，避免把真正的指令挤出环形缓冲区）。
+    """
+
+    def __init__(self, name, trace=True, **labels):
+        self.name = name
+        self.labels = labels
+        self.traced = trace
+        self.record = None
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(self.name, self.traced, **self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        if not TRACING:
+            return self
+        if not self.traced:
+            self.start = time.perf_counter()
+            return self
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        now = time.perf_counter()
+        if stack:
+            trace = stack[0].trace
+        else:
+            trace = {"name": self.name, "time": time.time(), "t0": now, "spans": [], "dropped": 0}
+        self.trace = trace
+        if len(trace["spans"]) < MAX_SPANS:
+            self.record = {"name": self.name, "start": round(now - trace["t0"], 6),
+                           "depth": len(stack), **self.labels}
+            trace["spans"].append(self.record)
+        else:
+            trace["dropped"] += 1
+        self.start = now
+        stack.append(self)
+        return self
+
+    def note(self, **info):
+        """给本次 span 附加只写入 trace 的信息（如坐标、错误）"""
+        if self.record is not None:
+            self.record.update(info)
+
+    def __exit__(self, exc_type, exc, tb):
+        if not hasattr(self, "start"):  # 进入时未开启计时
+            return False
+        seconds = time.perf_counter() - self.start
+        if not self.traced:
+            observe(self.name, seconds, **self.labels)
+            return False
+        stack = _local.stack
+        stack.pop()
+        if self.record is not None:
+            self.record["duration"] = round(seconds, 6)
+            if exc_type is not None:
+                self.record["error"] = exc_type.__name__
+        observe(self.name, seconds, **self.labels)
+        if not stack:
+            trace = self.trace
+            trace["duration"] = round(seconds, 6)
+            del trace["t0"]
+            with _lock:
+                _traces.append(trace)
+        return False
+
+
+def snapshot():
+    """当前全部直方图 {(名称, 标签): (各桶计数, 总和, 次数)}，可跨进程传递后交给 render()"""
+    with _lock:
+        return {key: (list(h.counts), h.sum, h.count) for key, h in _histograms.items()}
+
+
+def recent(n=None):
+    """最近的 n 条 trace（默认全部），从旧到新"""
+    with _lock:
+        traces = list(_traces)
+    return traces if n is None else traces[-n:]
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _traces.clear()
+
+
+def render(snapshots=None):
+    """Prometheus 文本格式
+
+    snapshots: [(额外标签, snapshot()), ...]，用于合并多个工作进程的直方图；默认只输出本进程的。
+    """
+    snapshots = snapshots if snapshots is not None else [({}, snapshot())]
+    lines = [f"# HELP {METRIC} Duration of traced pipeline stages.", f"# TYPE {METRIC} histogram"]
+    for extra, snap in snapshots:
+        for (name, labels), (counts, total, count) in sorted(snap.items()):
+            pairs = [("span", name), *_labels(extra), *labels]
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+            seen = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), counts):
+                seen += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{METRIC}_bucket{{{base},le="{le}"}} {seen}')
+            lines.append(f"{METRIC}_sum{{{base}}} {total!r}")
+            lines.append(f"{METRIC}_count{{{base}}} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def dump(path=None, traces=None):
+    """把最近的 trace 写入 JSON 文件，返回文件路径（出错后的事后分析）
+
+    未给出路径时写入 TRACE_DUMP_DIR，并只保留最新的 TRACE_DUMP_KEEP 个文件。
+    """
+    rotate = path is None
+    if rotate:
+        os.makedirs(TRACE_DUMP_DIR, exist_ok=True)
+        path = os.path.join(TRACE_DUMP_DIR, f"traces-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(recent() if traces is None else traces, f, ensure_ascii=False, indent=1)
+    if rotate:
+        old = sorted(glob.glob(os.path.join(TRACE_DUMP_DIR, "traces-*.json")), key=os.path.getmtime)
+        for stale in old[:-TRACE_DUMP_KEEP]:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return path
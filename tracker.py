@@ -0,0 +1,102 @@
+import math
+import threading
+
+PENDING = "pending"  # 待抓取
+DONE = "done"  # 已放置
+FAILED = "failed"  # 多次抓取失败，放弃
+IGNORED = "ignored"  # 无放置位置的类别，不处理
+
+
+class Track:
+    """桌面上的一个物体（带稳定编号）"""
+
+    def __init__(self, track_id, cls, cx, cy, conf):
+        self.id = track_id
+        self.cls = cls
+        self.cx, self.cy = cx, cy
+        self.conf = conf
+        self.status = PENDING
+        self.attempts = 0  # 抓取尝试次数
+        self.misses = 0  # 连续未检测到的次数
+        self.retry_after = 0  # 抓取失败后，第几次检测之后才重新抓取
+
+    def __repr__(self):
+        return f"Track({self.id}, {self.cls}, ({self.cx}, {self.cy}), {self.status}, 尝试{self.attempts}次)"
+
+
+class WorldModel:
+    """基于质心距离的多目标跟踪 + 桌面状态记录
+
+    每次检测结果按类别和质心距离关联到已有物体，物体编号在多次检测间保持不变，
+    并记录每个物体的抓取次数与状态，清理循环据此跳过已处理的物体。
+    抓取失败的物体在之后 retry_delay 次检测中暂不重新抓取，先处理其他物体并等画面稳定。
+    """
+
+    def __init__(self, match_dist=40, max_attempts=2, max_misses=2, retry_delay=1):
+        self.match_dist = match_dist  # 关联的最大像素距离
+        self.max_attempts = max_attempts
+        self.max_misses = max_misses  # 连续多少次未检测到后删除
+        self.retry_delay = retry_delay
+        self.updates = 0  # 已处理的检测次数
+        self.tracks = []
+        self.history = []  # 已从桌面消失的物体
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def update(self, detections):
+        """用一次完整检测结果 [[类别, cx, cy, conf], ...] 更新桌面状态"""
+        with self._lock:
+            self.updates += 1
+            unmatched = list(self.tracks)
+            for cls, cx, cy, conf in sorted(detections, key=lambda d: -d[3]):
+                track = min(
+                    (t for t in unmatched if t.cls == cls
+                     and math.hypot(t.cx - cx, t.cy - cy) <= self.match_dist),
+                    key=lambda t: math.hypot(t.cx - cx, t.cy - cy), default=None)
+                if track is None:
+                    track = Track(self._next_id, cls, cx, cy, conf)
+                    self._next_id += 1
+                    self.tracks.append(track)
+                else:
+                    unmatched.remove(track)
+                    track.cx, track.cy, track.conf = cx, cy, conf
+                    if track.status == DONE:
+                        # 已放置的物体又出现在原处，说明实际没有抓走
+                        track.status = PENDING if track.attempts < self.max_attempts else FAILED
+                track.misses = 0
+
+            for track in unmatched:
+                track.misses += 1
+            self.history.extend(t for t in self.tracks if t.misses >= self.max_misses)
+            self.tracks = [t for t in self.tracks if t.misses < self.max_misses]
+
+    def pending(self):
+        """本次检测中看到的、待抓取的物体"""
+        with self._lock:
+            return [t for t in self.tracks
+                    if t.status == PENDING and t.misses == 0 and self.updates > t.retry_after]
+
+    def mark_done(self, track):
+        with self._lock:
+            track.attempts += 1
+            track.status = DONE
+
+    def mark_failed(self, track):
+        """记录一次失败的抓取，超过最大次数后放弃该物体"""
+        with self._lock:
+            track.attempts += 1
+            track.retry_after = self.updates + self.retry_delay
+            if track.attempts >= self.max_attempts:
+                track.status = FAILED
+
+    def mark_ignored(self, track):
+        with self._lock:
+            track.status = IGNORED
+
+    def summary(self):
+        """各状态的物体数量"""
+        with self._lock:
+            counts = {}
+            for t in self.tracks + self.history:
+                counts[t.status] = counts.get(t.status, 0) + 1
+            return counts
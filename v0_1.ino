@@ -7,6 +7,27 @@
 #define limitSwitch3 9
 #define limitSwitch4 A3
 
+// 二进制帧（与 scara_1.py 对应）：
+//   A5 5A | 版本 | 类型 | 序号 | 长度 | 数据 | CRC16(小端，CRC-16/CCITT-FALSE，覆盖版本到数据末尾)
+// 首字节不是 0xA5 时按原来的逗号分隔文本解析，并用文本回复
+// 单字节 0x18 用于中止正在执行的程序（不是帧，也不回复 ACK）
+#define FRAME_SYNC1 0xA5
+#define FRAME_SYNC2 0x5A
+#define PROTO_VERSION 1
+#define FRAME_CMD 0x01
+#define FRAME_ACK 0x81
+#define FRAME_NACK 0x82
+#define FRAME_DONE 0x83
+#define FRAME_PROGRESS 0x84
+#define FRAME_ABORTED 0x85
+#define PROGRAM_ABORT 0x18
+#define NACK_CRC 1
+#define NACK_LENGTH 2
+#define NACK_VERSION 3
+#define NACK_TYPE 4
+#define MAX_PAYLOAD 32
+#define CMD_PAYLOAD_LEN 19
+
 AccelStepper stepper1(1, 2, 5); 
 AccelStepper stepper2(1, 3, 6);
 AccelStepper stepper3(1, 4, 7);
@@ -34,9 +55,17 @@ int theta2Array[100];
 int phiArray[100];
 int zArray[100];
 int gripperArray[100];
+byte speedArray[100];  // 路径点的速度/加速度，以 100 为单位，0 表示不指定
+byte accelArray[100];
 int positionsCounter = 0;
+int currentGripper = 0;
 
 bool new_cmd_mark = false;
+bool binaryMode = false;  // 最近一条指令是否为二进制帧，决定回复格式
+byte frameBuf[4 + MAX_PAYLOAD + 2];
+byte lastPayload[CMD_PAYLOAD_LEN];
+byte frameSeq = 0;
+bool haveLastFrame = false;
 
 void setup() {
   Serial.begin(115200);
@@ -55,27 +84,54 @@ void setup() {
   gripperServo.attach(A0, 600, 2500);
   data[6] = 0;
   gripperServo.write(data[6]);
+  currentGripper = data[6];
   delay(1000);
   data[5] = 100;
 //  homing();
 }
 void loop() {
-  if (Serial.available()) {
+  // 程序结束后才到达的中止字节直接丢弃
+  if (Serial.available() && Serial.peek() == PROGRAM_ABORT) {
+    Serial.read();
+  }
+  else if (Serial.available() && Serial.peek() == FRAME_SYNC1) {
+    readFrame();
+  }
+  else if (Serial.available()) {
     content = Serial.readStringUntil('\n');
     for (int i = 0; i < 10; i++) {
       int index = content.indexOf(","); 
       data[i] = atol(content.substring(0, index).c_str()); 
       content = content.substring(index + 1); 
     }
+    binaryMode = false;
     new_cmd_mark = true;
+  }
+  if (new_cmd_mark == true) {
     if (data[0] == 1) {
       theta1Array[positionsCounter] = data[2] * theta1AngleToSteps; 
       theta2Array[positionsCounter] = data[3] * theta2AngleToSteps;
       phiArray[positionsCounter] = data[4] * phiAngleToSteps;
       zArray[positionsCounter] = data[5] * zDistanceToSteps;
       gripperArray[positionsCounter] = data[6];
+      speedArray[positionsCounter] = 0;
+      accelArray[positionsCounter] = 0;
+      positionsCounter++;
+    }
+    // 3: 追加路径点（不回零）  4: 清空路径点
+    if (data[0] == 3 && positionsCounter < 100) {
+      theta1Array[positionsCounter] = data[2] * theta1AngleToSteps;
+      theta2Array[positionsCounter] = data[3] * theta2AngleToSteps;
+      phiArray[positionsCounter] = data[4] * phiAngleToSteps;
+      zArray[positionsCounter] = data[5] * zDistanceToSteps;
+      gripperArray[positionsCounter] = data[6];
+      speedArray[positionsCounter] = constrain(data[7] / 100, 0, 255);
+      accelArray[positionsCounter] = constrain(data[8] / 100, 0, 255);
       positionsCounter++;
     }
+    if (data[0] == 4) {
+      positionsCounter = 0;
+    }
   }
   while (data[1] == 1) {
     stepper1.setSpeed(data[7]);
@@ -105,9 +161,11 @@ void loop() {
       }
       if (i == 0) {
         gripperServo.write(gripperArray[i]);
+        currentGripper = gripperArray[i];
       }
       else if (gripperArray[i] != gripperArray[i - 1]) {
         gripperServo.write(gripperArray[i]);
+        currentGripper = gripperArray[i];
         delay(800); 
       }
       if (Serial.available()) {
@@ -132,6 +190,7 @@ void loop() {
     }
   }
   if(data[0]==1){
+    applyProfile(data[7], data[8]);  // 恢复最高速度，回零时 setSpeed 受 maxSpeed 限制
     homing();
   }
   if(data[0]==2){
@@ -139,14 +198,7 @@ void loop() {
     stepper2Position = data[3] * theta2AngleToSteps;
     stepper3Position = data[4] * phiAngleToSteps;
     stepper4Position = data[5] * zDistanceToSteps;
-    stepper1.setSpeed(data[7]);
-    stepper2.setSpeed(data[7]);
-    stepper3.setSpeed(data[7]);
-    stepper4.setSpeed(data[7]);
-    stepper1.setAcceleration(data[8]);
-    stepper2.setAcceleration(data[8]);
-    stepper3.setAcceleration(data[8]);
-    stepper4.setAcceleration(data[8]);
+    applyProfile(data[7], data[8]);
     stepper1.moveTo(stepper1Position);
     stepper2.moveTo(stepper2Position);
     stepper3.moveTo(stepper3Position);
@@ -162,14 +214,158 @@ void loop() {
     }
     delay(100);
     gripperServo.write(data[6]);
+    currentGripper = data[6];
     delay(300);
   }
+  if(data[0]==5){
+    if (!runProgram()) {
+      // 程序被中止，已回复中止帧，不再回复 DONE
+      new_cmd_mark = false;
+      data[0] = 0;
+    }
+  }
   if(new_cmd_mark == true){
-    Serial.println("DONE");
+    if (binaryMode) {
+      sendFrame(FRAME_DONE, frameSeq, NULL, 0);
+    }
+    else {
+      Serial.println("DONE");
+    }
     new_cmd_mark = false;
     data[0]=0;
   }
 }
+// 依次执行一遍缓冲区中的路径点，只在夹爪状态变化时等待舵机，每到达一个路径点回复 "WP i"
+// 每个路径点之后检查串口，收到中止字节时停在该路径点，回复 "ABORT i" 并返回 false
+bool runProgram() {
+  for (int i = 0; i < positionsCounter; i++) {
+    // 路径点自带的速度/加速度（以 100 步/秒为单位），为 0 时使用启动指令中的 data[7]/data[8]
+    applyProfile(speedArray[i] ? speedArray[i] * 100 : data[7], accelArray[i] ? accelArray[i] * 100 : data[8]);
+    stepper1.moveTo(theta1Array[i]);
+    stepper2.moveTo(theta2Array[i]);
+    stepper3.moveTo(phiArray[i]);
+    stepper4.moveTo(zArray[i]);
+    while (stepper1.currentPosition() != theta1Array[i] ||
+    stepper2.currentPosition() != theta2Array[i] ||
+    stepper3.currentPosition() != phiArray[i] ||
+    stepper4.currentPosition() != zArray[i]) {
+      stepper1.run();
+      stepper2.run();
+      stepper3.run();
+      stepper4.run();
+    }
+    if (gripperArray[i] != currentGripper) {
+      delay(100);
+      gripperServo.write(gripperArray[i]);
+      currentGripper = gripperArray[i];
+      delay(300);
+    }
+    if (binaryMode) {
+      byte index = i;
+      sendFrame(FRAME_PROGRESS, frameSeq, &index, 1);
+    }
+    else {
+      Serial.print("WP ");
+      Serial.println(i);
+    }
+    if (i < positionsCounter - 1 && Serial.available() && Serial.peek() == PROGRAM_ABORT) {
+      Serial.read();
+      if (binaryMode) {
+        byte index = i;
+        sendFrame(FRAME_ABORTED, frameSeq, &index, 1);
+      }
+      else {
+        Serial.print("ABORT ");
+        Serial.println(i);
+      }
+      return false;
+    }
+  }
+  return true;
+}
+// 设置四个电机的最高速度与加速度（0 表示不变），最高速度不超过 4000 步/秒
+void applyProfile(int speed, int accel) {
+  if (speed > 0) {
+    speed = min(speed, 4000);
+    stepper1.setMaxSpeed(speed);
+    stepper2.setMaxSpeed(speed);
+    stepper3.setMaxSpeed(speed);
+    stepper4.setMaxSpeed(speed);
+  }
+  if (accel > 0) {
+    stepper1.setAcceleration(accel);
+    stepper2.setAcceleration(accel);
+    stepper3.setAcceleration(accel);
+    stepper4.setAcceleration(accel);
+  }
+}
+uint16_t crc16(uint16_t crc, const byte *buf, int len) {
+  for (int i = 0; i < len; i++) {
+    crc ^= (uint16_t)buf[i] << 8;
+    for (int b = 0; b < 8; b++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+void sendFrame(byte type, byte seq, const byte *payload, byte len) {
+  byte head[6] = {FRAME_SYNC1, FRAME_SYNC2, PROTO_VERSION, type, seq, len};
+  uint16_t crc = crc16(crc16(0xFFFF, head + 2, 4), payload, len);
+  Serial.write(head, 6);
+  if (len > 0) {
+    Serial.write(payload, len);
+  }
+  Serial.write(crc & 0xFF);
+  Serial.write(crc >> 8);
+}
+void sendNack(byte seq, byte reason) {
+  sendFrame(FRAME_NACK, seq, &reason, 1);
+}
+// 读取并校验一个二进制指令帧，通过后回复 ACK 并填入 data[]；
+// 与上一帧序号和内容都相同时视为重发（上位机没收到 ACK），只重新回复不再执行
+void readFrame() {
+  Serial.read();
+  if (Serial.readBytes(frameBuf, 1) != 1 || frameBuf[0] != FRAME_SYNC2) {
+    return;
+  }
+  if (Serial.readBytes(frameBuf, 4) != 4) {
+    return;
+  }
+  byte seq = frameBuf[2];
+  byte len = frameBuf[3];
+  if (len > MAX_PAYLOAD || Serial.readBytes(frameBuf + 4, len + 2) != len + 2) {
+    serialFlush();
+    sendNack(seq, NACK_LENGTH);
+    return;
+  }
+  uint16_t crc = frameBuf[4 + len] | ((uint16_t)frameBuf[5 + len] << 8);
+  if (crc16(0xFFFF, frameBuf, 4 + len) != crc) {
+    sendNack(seq, NACK_CRC);
+    return;
+  }
+  if (frameBuf[0] != PROTO_VERSION) {
+    sendNack(seq, NACK_VERSION);
+    return;
+  }
+  if (frameBuf[1] != FRAME_CMD || len != CMD_PAYLOAD_LEN) {
+    sendNack(seq, NACK_TYPE);
+    return;
+  }
+  binaryMode = true;
+  sendFrame(FRAME_ACK, seq, NULL, 0);
+  if (haveLastFrame && seq == frameSeq && memcmp(lastPayload, frameBuf + 4, CMD_PAYLOAD_LEN) == 0) {
+    sendFrame(FRAME_DONE, seq, NULL, 0);
+    return;
+  }
+  frameSeq = seq;
+  memcpy(lastPayload, frameBuf + 4, CMD_PAYLOAD_LEN);
+  haveLastFrame = true;
+  data[0] = frameBuf[4];
+  for (int i = 0; i < 9; i++) {
+    data[i + 1] = (int)(frameBuf[5 + 2 * i] | ((uint16_t)frameBuf[6 + 2 * i] << 8));
+  }
+  new_cmd_mark = true;
+}
 void serialFlush() {
   while (Serial.available() > 0) {  
     Serial.read();         
@@ -0,0 +1,205 @@
+"""桌面工作空间可达性地图
+
+离线把桌面平面划分为网格（默认 2mm），按大臂/小臂长度与关节限位计算每格能否抓取，
+按标定结果标记是否在相机视野内，并为每格预先算好“最近的可抓取格”，保存为 .npy。
+运行时以内存映射方式加载，检测结果在发送任何指令前只需一次查表即可判断是否可达，
+或吸附到附近最近的可抓取点。可选再保存每格的逆解角度（IK 种子网格）。
+
+为保证查表结果可靠，可达区域向内收缩一格：被判为可达的格子整格都在工作空间内。
+
+用法示例：
+    # 生成地图（修改臂长、关节限位或重新标定后需重新生成）
+    python workspace.py build --res 2 --seeds
+    # 查询某点
+    python workspace.py check 150 250
+"""
+import argparse
+import json
+import os
+import threading
+
+import cv2
+import numpy as np
+
+import kinematics
+from calib import get_mapper
+
+WORKSPACE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workspace.npy")  # 地图文件路径
+GRID_RES = 2.0  # 网格边长（毫米）
+SNAP_LIMIT = 15.0  # 最多吸附的距离（毫米），超过则视为不可达
+
+REACHABLE = 1  # 两种肘部构型中至少一种满足关节限位
+IN_VIEW = 2  # 在相机视野内
+
+
+def _paths(path):
+    """地图文件 -> (地图, 参数, IK 种子) 三个文件路径"""
+    base = os.path.splitext(path)[0]
+    return path, base + ".json", base + "_ik.npy"
+
+
+def _params(res, l1, l2):
+    """决定地图是否过期的全部参数"""
+    return {
+        "res": res, "l1": l1, "l2": l2,
+        "theta1_limits": list(kinematics.THETA1_LIMITS),
+        "theta2_limits": list(kinematics.THETA2_LIMITS),
+        "homography": np.round(get_mapper().homography, 9).tolist(),
+    }
+
+
+def build(res=GRID_RES, l1=kinematics.L1, l2=kinematics.L2, seeds=False):
+    """计算地图，返回 (grid, params, ik)
+
+    grid 形状 (h, w, 3) int16：[标志位, 最近可抓取格的行, 列]（没有可抓取格时为 -1）；
+    ik 为每格的 (theta1, theta2)，不可达处为 NaN，seeds=False 时为 None。
+    """
+    reach = l1 + l2
+    n = int(np.ceil(reach / res))
+    coords = (np.arange(-n, n + 1) * res).astype(np.float64)
+    x, y = np.meshgrid(coords, coords)  # 行对应 y，列对应 x
+    theta1, theta2, valid = kinematics.select(kinematics.inverse_kinematics(x, y, l1, l2))
+    # 向内收缩一格，保证判为可达的格子整格可达
+    valid = cv2.erode(valid.astype(np.uint8), np.ones((3, 3), np.uint8), borderValue=0).astype(bool)
+
+    mapper = get_mapper()
+    u, v = mapper.to_pixel(x, y)
+    in_view = ((u >= 0) & (u < mapper.size[0]) & (v >= 0) & (v < mapper.size[1])).reshape(x.shape)
+
+    grid = np.full(x.shape + (3,), -1, dtype=np.int16)
+    grid[..., 0] = valid * REACHABLE | in_view * IN_VIEW
+    if valid.any():
+        # 距离变换的标签即最近可达格的编号
+        _, labels = cv2.distanceTransformWithLabels(
+            (~valid).astype(np.uint8), cv2.DIST_L2, cv2.DIST_MASK_5, labelType=cv2.DIST_LABEL_PIXEL)
+        rows, cols = np.nonzero(valid)
+        lookup = np.zeros((labels.max() + 1, 2), dtype=np.int16)
+        lookup[labels[rows, cols]] = np.stack([rows, cols], axis=1)
+        grid[..., 1:] = lookup[labels]
+
+    ik = None
+    if seeds:
+        ik = np.stack([theta1, theta2], axis=-1).astype(np.float32)
+        ik[~valid] = np.nan
+    return grid, _params(res, l1, l2), ik
+
+
+def save(path, grid, params, ik=None):
+    grid_path, params_path, ik_path = _paths(path)
+    np.save(grid_path, grid)
+    with open(params_path, "w") as f:
+        json.dump(params, f)
+    if ik is not None:
+        np.save(ik_path, ik)
+    elif os.path.exists(ik_path):
+        os.remove(ik_path)
+
+
+class Workspace:
+    """可达性地图查询，所有查询都是 O(1) 查表"""
+
+    def __init__(self, grid, params, ik=None):
+        self.grid = grid
+        self.ik = ik
+        self.res = params["res"]
+        self.n = (grid.shape[0] - 1) // 2  # 原点所在的行/列
+
+    @classmethod
+    def load(cls, path=WORKSPACE_PATH, l1=kinematics.L1, l2=kinematics.L2):
+        """以内存映射方式加载；文件不存在或参数已变化时在内存中重新计算"""
+        grid_path, params_path, ik_path = _paths(path)
+        if os.path.exists(grid_path) and os.path.exists(params_path):
+            with open(params_path) as f:
+                params = json.load(f)
+            if params == _params(params["res"], l1, l2):
+                ik = np.load(ik_path, mmap_mode="r") if os.path.exists(ik_path) else None
+                return cls(np.load(grid_path, mmap_mode="r"), params, ik)
+            print(f"工作空间地图 {grid_path} 已过期（臂长、关节限位或标定已变化），请重新生成")
+        return cls(*build(res=GRID_RES, l1=l1, l2=l2))
+
+    def _cell(self, x, y):
+        """坐标 -> 网格 (行, 列)，超出网格时返回 None"""
+        row = int(round(float(y) / self.res)) + self.n
+        col = int(round(float(x) / self.res)) + self.n
+        if 0 <= row < self.grid.shape[0] and 0 <= col < self.grid.shape[1]:
+            return row, col
+        return None
+
+    def flags(self, x, y):
+        cell = self._cell(x, y)
+        return int(self.grid[cell][0]) if cell else 0
+
+    def reachable(self, x, y):
+        """该点能否抓取"""
+        return bool(self.flags(x, y) & REACHABLE)
+
+    def in_view(self, x, y):
+        """该点是否在相机视野内"""
+        return bool(self.flags(x, y) & IN_VIEW)
+
+    def snap(self, x, y, limit=SNAP_LIMIT):
+        """返回 (x, y)：可达时原样返回，否则吸附到 limit 毫米内最近的可抓取点；都不满足时返回 None"""
+        cell = self._cell(x, y)
+        if cell is None:
+            return None
+        flags, row, col = (int(v) for v in self.grid[cell])
+        if flags & REACHABLE:
+            return x, y
+        if row < 0:
+            return None
+        sx, sy = (col - self.n) * self.res, (row - self.n) * self.res
+        if np.hypot(sx - x, sy - y) > limit:
+            return None
+        return sx, sy
+
+    def seed(self, x, y):
+        """该点所在格的逆解角度 (theta1, theta2)；没有 IK 种子网格或不可达时返回 None"""
+        cell = self._cell(x, y)
+        if self.ik is None or cell is None or np.isnan(self.ik[cell][0]):
+            return None
+        return tuple(float(a) for a in self.ik[cell])
+
+
+_workspace = None
+_workspace_lock = threading.Lock()
+
+
+def get_workspace():
+    """进程内共享的工作空间地图"""
+    global _workspace
+    with _workspace_lock:
+        if _workspace is None:
+            _workspace = Workspace.load(WORKSPACE_PATH)
+        return _workspace
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工作空间可达性地图")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("build", help="生成地图")
+    p.add_argument("--res", type=float, default=GRID_RES, help="网格边长（毫米）")
+    p.add_argument("--seeds", action="store_true", help="同时保存 IK 种子网格")
+    p.add_argument("--out", default=WORKSPACE_PATH)
+
+    p = sub.add_parser("check", help="查询某点")
+    p.add_argument("x", type=float)
+    p.add_argument("y", type=float)
+
+    args = parser.parse_args()
+    if args.cmd == "build":
+        grid, params, ik = build(args.res, seeds=args.seeds)
+        save(args.out, grid, params, ik)
+        flags = grid[..., 0]
+        area = args.res ** 2 / 100
+        print(f"地图已保存: {args.out}（{grid.shape[1]}x{grid.shape[0]} 格）")
+        print(f"可达面积 {(flags & REACHABLE).astype(bool).sum() * area:.0f}cm²，"
+              f"其中视野内 {((flags & (REACHABLE | IN_VIEW)) == (REACHABLE | IN_VIEW)).sum() * area:.0f}cm²")
+    else:
+        ws = get_workspace()
+        print(f"可达: {ws.reachable(args.x, args.y)}，视野内: {ws.in_view(args.x, args.y)}，"
+              f"吸附: {ws.snap(args.x, args.y)}，IK 种子: {ws.seed(args.x, args.y)}")
+
+
+if __name__ == "__main__":
+    main()